@@ -21,4 +21,10 @@ export const config = {
   gemini: {
     apiKey: process.env.GEMINI_API_KEY || '',
   },
+  recommendationEngine: {
+    pythonPath: process.env.PYTHON_PATH || 'python3',
+    workerPoolSize: parseInt(process.env.PROMPT_WORKER_POOL_SIZE || '2', 10),
+    requestTimeoutMs: parseInt(process.env.PROMPT_WORKER_TIMEOUT_MS || '5000', 10),
+    batchSize: parseInt(process.env.PROMPT_WORKER_BATCH_SIZE || '1000', 10),
+  },
 } as const;
@@ -1,9 +1,143 @@
-import { spawnSync } from 'child_process';
+import { spawn, ChildProcessWithoutNullStreams } from 'child_process';
+import { Socket } from 'net';
 import path from 'path';
-import type { EnrichedSegment, GeminiPrompt } from '../types/gemini-prompt';
+import readline from 'readline';
+import { config } from '../config';
+import type { EnrichedSegment, GeminiPrompt, PromptResult } from '../types/gemini-prompt';
+
+interface WorkerResponse extends PromptResult {
+  id: number | null;
+  results?: PromptResult[];
+}
+
+interface PendingRequest {
+  id: number;
+  message: string;
+  resolve: (response: WorkerResponse) => void;
+  reject: (error: Error) => void;
+  timer?: NodeJS.Timeout;
+}
+
+/**
+ * Long-lived `generate_prompt.py --serve` process speaking NDJSON over stdio.
+ * Requests are written one at a time and the rest wait here, so a request's timeout
+ * only covers the worker computing it, not time spent queued behind other requests.
+ */
+class PromptWorker {
+  private process: ChildProcessWithoutNullStreams;
+  private queue: PendingRequest[] = [];
+  private current: PendingRequest | null = null;
+  private nextId = 0;
+  private stderr = '';
+  private closing = false;
+  alive = true;
+
+  constructor(scriptPath: string) {
+    this.process = spawn(config.recommendationEngine.pythonPath, [scriptPath, '--serve']);
+
+    // Idle workers must not keep the Node process alive; pending request timers do that
+    this.process.unref();
+    for (const stream of [this.process.stdin, this.process.stdout, this.process.stderr]) {
+      (stream as unknown as Socket).unref();
+    }
+
+    readline.createInterface({ input: this.process.stdout }).on('line', line => this.handleLine(line));
+    this.process.stderr.on('data', chunk => {
+      this.stderr += chunk.toString();
+    });
+    // A worker that died between requests fails the next write with EPIPE, which must not crash the server
+    this.process.stdin.on('error', error => this.fail(new Error(`Failed to write to Python worker: ${error.message}`)));
+    this.process.on('error', error => this.fail(new Error(`Failed to spawn Python process: ${error.message}`)));
+    this.process.on('exit', code => this.fail(new Error(`Python worker exited with code ${code}: ${this.stderr}`)));
+  }
+
+  get load(): number {
+    return this.queue.length + (this.current ? 1 : 0);
+  }
+
+  request(payload: object): Promise<WorkerResponse> {
+    const id = this.nextId++;
+
+    return new Promise((resolve, reject) => {
+      if (!this.alive) {
+        reject(new Error('Python worker is not running'));
+        return;
+      }
+      this.queue.push({ id, message: JSON.stringify({ id, ...payload }) + '\n', resolve, reject });
+      this.sendNext();
+    });
+  }
+
+  close(): void {
+    // Requests already queued still run; stdin is ended once the queue drains
+    this.alive = false;
+    this.closing = true;
+    this.sendNext();
+  }
+
+  private sendNext(): void {
+    if (this.current) {
+      return;
+    }
+    const request = this.queue.shift();
+    if (!request) {
+      if (this.closing) {
+        this.process.stdin.end();
+      }
+      return;
+    }
+
+    request.timer = setTimeout(() => {
+      // The worker is still computing the stuck request, so it must not be handed more work
+      this.fail(new Error(`Python worker timed out after ${config.recommendationEngine.requestTimeoutMs}ms`));
+      this.process.kill();
+    }, config.recommendationEngine.requestTimeoutMs);
+
+    this.current = request;
+    this.process.stdin.write(request.message);
+  }
+
+  private handleLine(line: string): void {
+    let response: WorkerResponse;
+    try {
+      response = JSON.parse(line);
+    } catch (error) {
+      this.fail(new Error(`Failed to parse prompt: ${error}`));
+      return;
+    }
+
+    // Every request carries an id, so a null id can only come from a malformed request
+    if (response.id === null) {
+      return;
+    }
+
+    const request = this.current;
+    if (!request || response.id !== request.id) {
+      return;
+    }
+
+    this.current = null;
+    clearTimeout(request.timer);
+
+    request.resolve(response);
+    this.sendNext();
+  }
+
+  private fail(error: Error): void {
+    this.alive = false;
+    const requests = this.current ? [this.current, ...this.queue] : this.queue;
+    for (const request of requests) {
+      clearTimeout(request.timer);
+      request.reject(error);
+    }
+    this.current = null;
+    this.queue = [];
+  }
+}
 
 export class RecommendationEngineService {
   private pythonScriptPath: string;
+  private workers: PromptWorker[] = [];
 
   constructor() {
     this.pythonScriptPath = path.join(
@@ -15,35 +149,78 @@ export class RecommendationEngineService {
     );
   }
 
-  generatePrompt(segment: EnrichedSegment, isEmailCampaign: boolean = false): GeminiPrompt {
-    const input = {
-      segment,
-      is_email_campaign: isEmailCampaign
-    };
+  /**
+   * Pick the least busy worker, replacing any that have died and growing the pool up to its size limit
+   */
+  private acquireWorker(): PromptWorker {
+    this.workers = this.workers.filter(worker => worker.alive);
 
-    const result = spawnSync('python3', [this.pythonScriptPath], {
-      input: JSON.stringify(input),
-      encoding: 'utf-8',
-      timeout: 5000
-    });
+    const idle = this.workers.find(worker => worker.load === 0);
+    if (idle) {
+      return idle;
+    }
 
-    if (result.error) {
-      throw new Error(`Failed to spawn Python process: ${result.error.message}`);
+    if (this.workers.length < Math.max(1, config.recommendationEngine.workerPoolSize)) {
+      const worker = new PromptWorker(this.pythonScriptPath);
+      this.workers.push(worker);
+      return worker;
     }
 
-    if (result.status !== 0) {
-      throw new Error(`Python script failed: ${result.stderr}`);
+    return this.workers.reduce((least, worker) => (worker.load < least.load ? worker : least));
+  }
+
+  async generatePrompt(segment: EnrichedSegment, isEmailCampaign: boolean = false): Promise<GeminiPrompt> {
+    const response = await this.acquireWorker().request({ segment, is_email_campaign: isEmailCampaign });
+
+    if (response.error) {
+      throw new Error(`Python script failed: ${response.error}`);
     }
 
-    try {
-      return JSON.parse(result.stdout) as GeminiPrompt;
-    } catch (error) {
-      throw new Error(`Failed to parse prompt: ${error}`);
+    return response.prompt as GeminiPrompt;
+  }
+
+  /**
+   * Validate and score segments in batch requests of at most batchSize segments, spread over the pool;
+   * row errors are returned instead of thrown
+   */
+  async generatePromptResults(segments: EnrichedSegment[], isEmailCampaign: boolean = false): Promise<PromptResult[]> {
+    // Each request's timeout starts when its worker takes it, so a large batch is split into chunks
+    // that each fit in it; chunks beyond the pool size wait in their worker's queue
+    const batchSize = Math.max(1, config.recommendationEngine.batchSize);
+    const chunks: EnrichedSegment[][] = [];
+    for (let start = 0; start < segments.length; start += batchSize) {
+      chunks.push(segments.slice(start, start + batchSize));
     }
+
+    const responses = await Promise.all(
+      chunks.map(chunk => this.acquireWorker().request({ segments: chunk, is_email_campaign: isEmailCampaign }))
+    );
+
+    return responses.flatMap(response => {
+      if (response.error) {
+        throw new Error(`Python script failed: ${response.error}`);
+      }
+      return response.results ?? [];
+    });
+  }
+
+  async generatePrompts(segments: EnrichedSegment[], isEmailCampaign: boolean = false): Promise<GeminiPrompt[]> {
+    const results = await this.generatePromptResults(segments, isEmailCampaign);
+
+    return results.map((result, index) => {
+      if (result.error) {
+        throw new Error(`Python script failed for segment ${index}: ${result.error}`);
+      }
+      return result.prompt as GeminiPrompt;
+    });
   }
 
-  generatePrompts(segments: EnrichedSegment[], isEmailCampaign: boolean = false): GeminiPrompt[] {
-    return segments.map(segment => this.generatePrompt(segment, isEmailCampaign));
+  /**
+   * Shut down all prompt workers
+   */
+  close(): void {
+    this.workers.forEach(worker => worker.close());
+    this.workers = [];
   }
 }
 
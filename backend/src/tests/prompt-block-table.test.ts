@@ -0,0 +1,103 @@
+import { execFileSync } from 'child_process';
+import fs from 'fs';
+import path from 'path';
+import { config } from '../config';
+import { recommendationEngineService } from '../services/recommendation-engine.service';
+import type { EnrichedSegment } from '../types/gemini-prompt';
+
+const viyaDir = path.join(__dirname, '..', '..', 'viya');
+
+const promptBlocks = JSON.parse(
+  fs.readFileSync(path.join(viyaDir, 'prompt_blocks.json'), 'utf-8')
+);
+
+// Expected block keys straight from generate_prompt.py's scalar rule chain, so the lookup table is
+// checked against the Python rules themselves rather than a copy of them
+const ruleChainScript = `
+import json, sys
+from generate_prompt import categorize_score, match_prompt_block, rank_value_drivers
+
+for segment in json.load(sys.stdin):
+    print(match_prompt_block(categorize_score(segment['price_sensitivity']),
+                             categorize_score(segment['brand_loyalty']),
+                             categorize_score(segment['engagement_propensity']),
+                             rank_value_drivers(segment)[0]))
+`;
+
+function expectedBlockKeys(segments: EnrichedSegment[]): string[] {
+  const output = execFileSync(config.recommendationEngine.pythonPath, ['-c', ruleChainScript], {
+    cwd: viyaDir,
+    input: JSON.stringify(segments)
+  });
+  return output.toString().trim().split('\n');
+}
+
+async function testPromptBlockTable() {
+  console.log('Testing prompt block lookup table against the rule chain\n');
+
+  // Scores on and around each category threshold, plus value profiles with ties
+  const scores = [0.1, 0.34, 0.35, 0.5, 0.51, 0.9];
+  const valueProfiles = [
+    [0.4, 0.2, 0.2, 0.2],
+    [0.2, 0.4, 0.2, 0.2],
+    [0.2, 0.2, 0.4, 0.2],
+    [0.2, 0.2, 0.2, 0.4],
+    [0.3, 0.3, 0.2, 0.2],
+    [0.25, 0.25, 0.25, 0.25]
+  ];
+
+  const segments: EnrichedSegment[] = [];
+  for (const price of scores) {
+    for (const loyalty of scores) {
+      for (const engagement of scores) {
+        for (const [family, eco, convenience, quality] of valueProfiles) {
+          segments.push({
+            language: 'en',
+            parent_age: 30,
+            parent_gender: 'F',
+            baby_count: 1,
+            engagement_propensity: engagement,
+            price_sensitivity: price,
+            brand_loyalty: loyalty,
+            contact_frequency_tolerance: 0.5,
+            content_engagement_rate: 0.5,
+            channel_perf_email: 0.3,
+            channel_perf_push: 0.5,
+            channel_perf_inapp: 0.4,
+            values_family: family,
+            values_eco_conscious: eco,
+            values_convenience: convenience,
+            values_quality: quality
+          });
+        }
+      }
+    }
+  }
+
+  try {
+    const prompts = await recommendationEngineService.generatePrompts(segments);
+    const expectedKeys = expectedBlockKeys(segments);
+
+    let mismatches = 0;
+    prompts.forEach((prompt, index) => {
+      const expected = promptBlocks.behavioral_combinations[expectedKeys[index]];
+      if (prompt.audience_profile.behavioral_summary !== expected.behavioral_summary) {
+        mismatches++;
+        console.log(`✗ Segment ${index}: expected ${expectedKeys[index]}`);
+      }
+    });
+
+    console.log(`Checked ${prompts.length} segments, ${mismatches} mismatches`);
+
+    if (mismatches > 0) {
+      process.exit(1);
+    }
+
+    console.log('\nTest passed!');
+  } catch (error) {
+    console.error('Test failed:', error);
+    process.exit(1);
+  }
+}
+
+testPromptBlockTable();
@@ -50,3 +50,8 @@ export interface GeminiPrompt {
   audience_profile: AudienceProfile;
   content_guidance: ContentGuidance;
 }
+
+export interface PromptResult {
+  prompt?: GeminiPrompt;
+  error?: string;
+}
@@ -1,3 +1,3 @@
-from .core_campaign_metrics import ViyaCampaignAnalytics
+from .core_campaign_metrics import CampaignAnalyticsBackend, ViyaCampaignAnalytics, create_analytics
 
-__all__ = ['ViyaCampaignAnalytics']
+__all__ = ['CampaignAnalyticsBackend', 'ViyaCampaignAnalytics', 'create_analytics']
@@ -1,10 +1,65 @@
 import os
+from dotenv import load_dotenv
+
+load_dotenv()
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 DATA_DIR_INPUT = os.path.join(BASE_DIR, 'data', 'input')
 DATA_DIR_GENERATED = os.path.join(BASE_DIR, 'data', 'generated')
 DATA_DIR_OUTPUT = os.path.join(BASE_DIR, 'data', 'output')
 
+# 'cas' runs the pipeline on SAS Viya; 'local' runs it in-process with NumPy/pandas;
+# 'sqlite' runs the unchanged FedSQL against an embedded SQLite stand-in
+ANALYTICS_BACKEND = os.getenv('ANALYTICS_BACKEND', 'cas')
+
+CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'junction2025')
+
+# OAuth tokens are cached per remote and client id until TOKEN_REFRESH_MARGIN seconds before expiry;
+# set VIYA_TOKEN_CACHE to an empty string to disable the cache
+TOKEN_CACHE_FILE = os.path.expanduser(os.getenv('VIYA_TOKEN_CACHE', os.path.join(CACHE_DIR, 'viya_tokens.json')))
+TOKEN_REFRESH_MARGIN = 60
+
+# Input CSVs are promoted into this caslib, labelled with their SHA-256, and only re-uploaded when
+# the file changes; set CAS_TABLE_CASLIB to an empty string to always upload into the session
+CAS_TABLE_CASLIB = os.getenv('CAS_TABLE_CASLIB', 'CASUSER')
+FINGERPRINT_CACHE_FILE = os.path.join(CACHE_DIR, 'file_fingerprints.json')
+
+# Campaign results are streamed into CAS in chunks of this many rows; 0 parses the whole file client-side
+RESULTS_UPLOAD_CHUNK_ROWS = int(os.getenv('RESULTS_UPLOAD_CHUNK_ROWS', 1_000_000))
+
+# CAS result tables are fetched and exported in pages of this many rows
+CAS_FETCH_PAGE_ROWS = int(os.getenv('CAS_FETCH_PAGE_ROWS', 250_000))
+
+# Fetched CAS tables up to this many rows are kept client-side for the rest of the session
+TABLE_CACHE_MAX_ROWS = int(os.getenv('TABLE_CACHE_MAX_ROWS', 1_000_000))
+
+# Result tables fetched and written at once by export stages; 1 exports them one by one
+EXPORT_CONCURRENCY = int(os.getenv('EXPORT_CONCURRENCY', 4))
+
+# Independent analyses run at once on separate CAS sessions; 1 runs them one by one
+ANALYSIS_CONCURRENCY = int(os.getenv('ANALYSIS_CONCURRENCY', 4))
+
+# Incremental runs upload and join only the rows appended to the results file since the last run and
+# fold them into benchmark sums kept in CAS_TABLE_CASLIB; the first run, or any run without a caslib,
+# rebuilds in full
+INCREMENTAL_METRICS = os.getenv('INCREMENTAL_METRICS', '').lower() in ('1', 'true', 'yes')
+
+# Segment attributes are learned from each segment's most recently sent campaigns; incremental runs
+# keep the per-segment windows (locally in ROLLING_WINDOW_STATE_FILE, suffixed per results file, in CAS
+# as the promoted segment_window) and only add newly sent campaigns
+ROLLING_WINDOW_CAMPAIGNS = 100
+ROLLING_WINDOW_STATE_FILE = os.path.join(CACHE_DIR, 'segment_windows.npz')
+
+# The online learner halves the weight of a segment's earlier results every LEARNER_HALF_LIFE_CAMPAIGNS
+# new results for that segment, and snapshots the enriched segments every LEARNER_SNAPSHOT_SECONDS
+LEARNER_HALF_LIFE_CAMPAIGNS = 50
+LEARNER_SNAPSHOT_SECONDS = 10
+
+# Files in data/output are written and read as 'csv' or 'parquet' (typed, compressed, columnar;
+# needs pyarrow). `python -m backend.viya.table_io` exports CSV copies of Parquet outputs
+OUTPUT_FORMAT = os.getenv('OUTPUT_FORMAT', 'csv')
+PARQUET_COMPRESSION = os.getenv('PARQUET_COMPRESSION', 'zstd')
+
 SEGMENTS_INPUT_FILE = 'user_segments.csv'
 SEGMENTS_OUTPUT_FILE = 'user_segments_enriched.csv'
 CAMPAIGNS_FILE = 'campaigns.csv'
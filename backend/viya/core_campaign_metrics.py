@@ -1,11 +1,17 @@
-import swat
-import requests
-import os
-from dotenv import load_dotenv
+import argparse
+from abc import ABC, abstractmethod
+from .session import connect_cas
+from .table_io import output_path, write_table, write_table_pages
+from .table_loader import (
+    load_csv_table, stream_csv_table, drop_table, table_exists, table_rows, table_label, replace_table,
+    fetch_table, iter_table_pages, clear_table_cache, file_watermark, appended_offset
+)
 from .config import (
+    ANALYTICS_BACKEND,
     DATA_DIR_INPUT, DATA_DIR_GENERATED, DATA_DIR_OUTPUT,
     SEGMENTS_INPUT_FILE, SEGMENTS_OUTPUT_FILE,
     CAMPAIGNS_FILE, RESULTS_FILE, METRICS_FILE,
+    CAS_TABLE_CASLIB, RESULTS_UPLOAD_CHUNK_ROWS, INCREMENTAL_METRICS, ROLLING_WINDOW_CAMPAIGNS,
     DEFAULT_ENGAGEMENT, DEFAULT_CONVERSION,
     ENGAGEMENT_MIN, ENGAGEMENT_SCALE,
     PRICE_SENSITIVITY_HIGH, PRICE_SENSITIVITY_MED, PRICE_SENSITIVITY_LOW,
@@ -13,75 +19,161 @@ from .config import (
     CHANNEL_SCALE
 )
 
-load_dotenv()
+INCREMENTAL_TABLES = ['campaign_results', 'benchmarks', 'campaign_results_vs_benchmark', 'benchmark_stats']
+
+# Columns of the ranked results kept in the promoted segment_window between incremental runs
+WINDOW_COLUMNS = '''
+    "segment_id", "campaign_id", "send_sequence", "campaign_type", "channel", "value_theme",
+    "engagement_rate", "conversion_rate"
+'''
+
+CAMPAIGN_RESULTS_COLUMNS = '''
+    r."campaign_id", r."segment_id", r."impressions", r."clicks", r."conversions",
+    c."campaign_type", c."channel", c."message_sentiment", c."value_theme",
+    s."language", s."price_sensitivity", s."brand_loyalty", s."engagement_propensity",
+    s."channel_perf_email", s."channel_perf_push", s."channel_perf_inapp",
+    s."values_family", s."values_eco_conscious", s."values_convenience", s."values_quality",
+    CAST(r."clicks" AS DOUBLE) / r."impressions" AS engagement_rate,
+    CAST(r."conversions" AS DOUBLE) / r."impressions" AS conversion_rate,
+    CASE WHEN c."channel" = 'email' THEN s."channel_perf_email"
+         WHEN c."channel" = 'push' THEN s."channel_perf_push"
+         ELSE s."channel_perf_inapp" END AS channel_match_score,
+    CAST(SCAN(r."campaign_id", -1, '_') AS DOUBLE) AS send_sequence
+'''
+
+# Per (language, campaign_type) aggregates from which benchmarks can be recomputed exactly
+BENCHMARK_STATS_COLUMNS = '''
+    "language", "campaign_type",
+    COUNT(*) AS row_count,
+    COUNT("conversion_rate") AS conversion_count,
+    SUM("conversion_rate") AS conversion_sum,
+    SUM("conversion_rate" * "conversion_rate") AS conversion_sq_sum,
+    COUNT("engagement_rate") AS engagement_count,
+    SUM("engagement_rate") AS engagement_sum
+'''
+
+
+def export_learned_segments(learned, path=output_path(f'{DATA_DIR_OUTPUT}/{SEGMENTS_OUTPUT_FILE}')):
+    """Clip learned attributes to their allowed ranges and write them as the enriched segments table."""
+    learned.columns = learned.columns.str.lower()
+
+    learned['engagement_propensity'] = learned['engagement_propensity'].clip(0.2, 0.9)
+    learned['channel_perf_email'] = learned['channel_perf_email'].clip(0, 1.0)
+    learned['channel_perf_push'] = learned['channel_perf_push'].clip(0, 1.0)
+    learned['channel_perf_inapp'] = learned['channel_perf_inapp'].clip(0, 1.0)
+    learned['contact_frequency_tolerance'] = learned['contact_frequency_tolerance'].clip(0.1, 1.0)
+    learned['content_engagement_rate'] = learned['content_engagement_rate'].clip(0.1, 1.0)
+
+    write_table(learned, path)
+    print(f"Exported {len(learned)} segments to {path}\n")
+    return learned
+
+
+class CampaignAnalyticsBackend(ABC):
+    """
+    Pipeline phases shared by every analytics backend.
+
+    Backends compute the campaign_segment_metrics and segments_learned tables;
+    exports only need fetch_table to return them as DataFrames, or iter_table to page
+    through them. A backend missing a phase cannot be instantiated.
+    """
+
+    @abstractmethod
+    def load_data(self):
+        pass
 
+    @abstractmethod
+    def calculate_metrics(self, incremental=False):
+        pass
 
-class ViyaCampaignAnalytics:
-    def __init__(self):
-        self.conn = None
-        self._connect()
+    @abstractmethod
+    def build_campaign_metrics(self):
+        pass
 
-    def _connect(self):
-        remote = os.getenv('VIYA_REMOTE', 'https://viya-i107icluw3.engage.sas.com')
-        hostname = os.getenv('VIYA_HOSTNAME')
-        client_id = os.getenv('VIYA_CLIENT_ID')
-        client_secret = os.getenv('VIYA_CLIENT_SECRET')
-
-        if not all([hostname, client_id, client_secret]):
-            raise ValueError("Missing required environment variables: VIYA_HOSTNAME, VIYA_CLIENT_ID, VIYA_CLIENT_SECRET")
-
-        print("Authenticating with Viya...")
-        response = requests.post(
-            f'{remote}/SASLogon/oauth/token',
-            data='grant_type=client_credentials',
-            headers={'Content-Type': 'application/x-www-form-urlencoded'},
-            auth=(client_id, client_secret)
-        )
+    @abstractmethod
+    def derive_segment_attributes(self):
+        pass
+
+    @abstractmethod
+    def fetch_table(self, name, columns=None):
+        pass
+
+    def iter_table(self, name, columns=None):
+        yield self.fetch_table(name, columns)
+
+    def close(self):
+        pass
 
-        if not response.ok:
-            raise ConnectionError(f"Auth failed: {response.text}")
+    def export_segments(self):
+        print("Exporting updated segments...")
+        learned = export_learned_segments(self.fetch_table('segments_learned'))
+
+        print("Summary:")
+        print(learned[['engagement_propensity', 'price_sensitivity', 'brand_loyalty']].describe())
+        return learned
+
+    def export_campaign_metrics(self):
+        print("Exporting campaign metrics...")
+        path = output_path(f'{DATA_DIR_OUTPUT}/{METRICS_FILE}')
+        rows = write_table_pages(self.iter_table('campaign_segment_metrics'), path)
+        print(f"Exported {rows} campaign-segment metrics to {path}\n")
 
-        token = response.json()['access_token']
-        print("✓ Authenticated")
 
-        cas_url = f"https://{hostname}/cas-shared-default-http/"
-        print(f"Connecting to CAS: {cas_url}")
-        self.conn = swat.CAS(cas_url, password=token, ssl_ca_list=False)
-        self.conn.loadactionset('fedsql')
-        self.conn.loadactionset('datastep')
-        print(f"✓ Connected. Session: {self.conn.sessionid}\n")
+class ViyaCampaignAnalytics(CampaignAnalyticsBackend):
+    def __init__(self, conn=None):
+        self.conn = conn
+        self.incremental = False
+        self.appended_after = None
+        if self.conn is None:
+            self._connect()
+
+    def _connect(self):
+        self.conn = connect_cas(('fedsql', 'datastep'))
 
     def load_data(self):
+        """Load segments and campaigns; calculate_metrics loads the campaign results it needs."""
         print("Loading data into CAS...")
-        self.conn.read_csv(f'{DATA_DIR_OUTPUT}/{SEGMENTS_OUTPUT_FILE}',
-                          casout={'name': 'segments', 'replace': True})
-        self.conn.read_csv(f'{DATA_DIR_GENERATED}/{CAMPAIGNS_FILE}',
-                          casout={'name': 'campaigns', 'replace': True})
-        self.conn.read_csv(f'{DATA_DIR_GENERATED}/{RESULTS_FILE}',
-                          casout={'name': 'campaign_results_raw', 'replace': True})
+        load_csv_table(self.conn, output_path(f'{DATA_DIR_OUTPUT}/{SEGMENTS_OUTPUT_FILE}'), 'segments')
+        load_csv_table(self.conn, f'{DATA_DIR_GENERATED}/{CAMPAIGNS_FILE}', 'campaigns')
         print("Data loaded\n")
 
-    def calculate_metrics(self):
+    def calculate_metrics(self, incremental=INCREMENTAL_METRICS):
+        results_path = f'{DATA_DIR_GENERATED}/{RESULTS_FILE}'
+        self.incremental = incremental and bool(CAS_TABLE_CASLIB)
+        self.appended_after = None
+        if incremental:
+            if not CAS_TABLE_CASLIB:
+                print("Incremental metrics need CAS_TABLE_CASLIB, running a full rebuild...")
+            elif not all(table_exists(self.conn, name) for name in INCREMENTAL_TABLES):
+                print("No incremental state yet, running a full rebuild...")
+            else:
+                offset = appended_offset(results_path, table_label(self.conn, 'campaign_results'))
+                if offset is not None:
+                    self._update_metrics(results_path, offset)
+                    return
+                print(f"{RESULTS_FILE} was rewritten since the last run, running a full rebuild...")
+
+        # Clear state from earlier incremental runs so it cannot go stale behind a full rebuild
+        for name in INCREMENTAL_TABLES + ['segment_window']:
+            drop_table(self.conn, name)
+
+        # Results must not be appended while metrics are calculated; the watermark stands for this load
+        watermark = file_watermark(results_path)
+        load_csv_table(self.conn, results_path, 'campaign_results_raw', chunksize=RESULTS_UPLOAD_CHUNK_ROWS)
+
         print("Calculating engagement metrics...")
-        self.conn.fedsql.execdirect(query='''
+        self.conn.fedsql.execdirect(query=f'''
             CREATE TABLE campaign_results AS
-            SELECT
-                r."campaign_id", r."segment_id", r."impressions", r."clicks", r."conversions",
-                c."campaign_type", c."channel", c."message_sentiment", c."value_theme",
-                s."language", s."price_sensitivity", s."brand_loyalty", s."engagement_propensity",
-                s."channel_perf_email", s."channel_perf_push", s."channel_perf_inapp",
-                s."values_family", s."values_eco_conscious", s."values_convenience", s."values_quality",
-                CAST(r."clicks" AS DOUBLE) / r."impressions" AS engagement_rate,
-                CAST(r."conversions" AS DOUBLE) / r."impressions" AS conversion_rate,
-                CASE WHEN c."channel" = 'email' THEN s."channel_perf_email"
-                     WHEN c."channel" = 'push' THEN s."channel_perf_push"
-                     ELSE s."channel_perf_inapp" END AS channel_match_score
+            SELECT {CAMPAIGN_RESULTS_COLUMNS}
             FROM campaign_results_raw r
             JOIN campaigns c ON r."campaign_id" = c."campaign_id"
             JOIN segments s ON r."segment_id" = s."segment_id"
         ''')
 
         print("Calculating benchmarks...")
+        # Not read from attribute_cube: the cube is built from campaign_metrics, which needs these
+        # benchmarks first, and has no language dimension. Incremental runs keep the same count, sum
+        # and sum-of-squares rollup per language x campaign_type in benchmark_stats instead.
         self.conn.fedsql.execdirect(query='''
             CREATE TABLE benchmarks AS
             SELECT "language", "campaign_type",
@@ -102,36 +194,151 @@ class ViyaCampaignAnalytics:
             FROM campaign_results r
             LEFT JOIN benchmarks b ON r."language" = b."language" AND r."campaign_type" = b."campaign_type"
         ''')
+
+        if incremental and CAS_TABLE_CASLIB:
+            self._save_metrics_state(watermark)
         print("Metrics calculated\n")
 
+    def _save_metrics_state(self, watermark):
+        print("Saving incremental state...")
+        self.conn.fedsql.execdirect(query=f'''
+            CREATE TABLE benchmark_stats AS
+            SELECT {BENCHMARK_STATS_COLUMNS}
+            FROM campaign_results
+            GROUP BY "language", "campaign_type"
+        ''')
+        # The results file watermark travels with the table it describes
+        self.conn.table.altertable(name='campaign_results', label=watermark)
+        for name in INCREMENTAL_TABLES:
+            self.conn.table.promote(name=name, targetlib=CAS_TABLE_CASLIB)
+
+    def _update_metrics(self, results_path, offset):
+        """
+        Fold the result rows appended to results_path after byte offset into the promoted metrics tables.
+
+        Only those rows are uploaded and joined, and they are appended to campaign_results.
+        Benchmarks are recomputed from per-group counts, sums and sums of squares, so their
+        means and STDDEV equal a full rebuild. The new rows' vs-benchmark join is appended too;
+        earlier vs-benchmark rows keep the baseline current when they were appended, and
+        build_campaign_metrics joins the current benchmarks. Rows already processed keep the
+        segment attributes they were joined with. campaign_results' label holds the watermark;
+        the new rows stay in campaign_results_new for derive_segment_attributes.
+        """
+        watermark = file_watermark(results_path)
+        stop = int(watermark.split(':')[0])
+        if stop == offset:
+            print("No new campaign results, metrics are current\n")
+            return
+
+        print("Loading appended campaign results...")
+        stream_csv_table(self.conn, results_path, 'campaign_results_raw_new', RESULTS_UPLOAD_CHUNK_ROWS,
+                         start=offset, stop=stop)
+
+        print("Calculating engagement metrics for new results...")
+        self.conn.fedsql.execdirect(query=f'''
+            CREATE TABLE campaign_results_new AS
+            SELECT {CAMPAIGN_RESULTS_COLUMNS}
+            FROM campaign_results_raw_new r
+            JOIN campaigns c ON r."campaign_id" = c."campaign_id"
+            JOIN segments s ON r."segment_id" = s."segment_id"
+        ''')
+        print(f"{table_rows(self.conn, 'campaign_results_new'):,} new result rows")
+
+        print("Updating benchmarks...")
+        self.conn.fedsql.execdirect(query=f'''
+            CREATE TABLE benchmark_stats_next AS
+            SELECT "language", "campaign_type",
+                   SUM(row_count) AS row_count,
+                   SUM(conversion_count) AS conversion_count,
+                   SUM(conversion_sum) AS conversion_sum,
+                   SUM(conversion_sq_sum) AS conversion_sq_sum,
+                   SUM(engagement_count) AS engagement_count,
+                   SUM(engagement_sum) AS engagement_sum
+            FROM (
+                SELECT * FROM benchmark_stats
+                UNION ALL
+                SELECT {BENCHMARK_STATS_COLUMNS}
+                FROM campaign_results_new
+                GROUP BY "language", "campaign_type"
+            ) s
+            GROUP BY "language", "campaign_type"
+        ''')
+
+        self.conn.fedsql.execdirect(query='''
+            CREATE TABLE benchmarks_next AS
+            SELECT "language", "campaign_type", baseline_conversion, baseline_engagement,
+                   CASE WHEN conversion_var > 0 THEN SQRT(conversion_var)
+                        WHEN conversion_var IS NOT NULL THEN 0 END AS conversion_std
+            FROM (
+                SELECT "language", "campaign_type", row_count,
+                       conversion_sum / NULLIF(conversion_count, 0) AS baseline_conversion,
+                       engagement_sum / NULLIF(engagement_count, 0) AS baseline_engagement,
+                       CASE WHEN conversion_count > 1
+                            THEN (conversion_sq_sum - conversion_sum * conversion_sum / conversion_count)
+                                 / (conversion_count - 1) END AS conversion_var
+                FROM benchmark_stats_next
+            ) s
+            WHERE row_count >= 5
+        ''')
+
+        print("Appending performance vs benchmark...")
+        self.conn.fedsql.execdirect(query='''
+            CREATE TABLE campaign_results_vs_benchmark_new AS
+            SELECT r.*,
+                   b.baseline_conversion, b.baseline_engagement,
+                   r."conversion_rate" / NULLIF(b.baseline_conversion, 0) AS sales_vs_benchmark
+            FROM campaign_results_new r
+            LEFT JOIN benchmarks_next b ON r."language" = b."language" AND r."campaign_type" = b."campaign_type"
+        ''')
+
+        self.conn.datastep.runcode(code='data campaign_results(append=yes); set campaign_results_new; run;')
+        self.conn.datastep.runcode(
+            code='data campaign_results_vs_benchmark(append=yes); set campaign_results_vs_benchmark_new; run;'
+        )
+        self.appended_after = table_label(self.conn, 'campaign_results')
+        self.conn.table.altertable(name='campaign_results', caslib=CAS_TABLE_CASLIB, label=watermark)
+
+        for name in ['benchmark_stats', 'benchmarks']:
+            replace_table(self.conn, f'{name}_next', name)
+        for name in ['campaign_results_raw_new', 'campaign_results_vs_benchmark_new']:
+            self.conn.table.droptable(name=name, quiet=True)
+        print("Metrics updated\n")
+
     def build_campaign_metrics(self):
         print("Building campaign metrics per segment...")
+        # Joined against the current benchmarks, which incremental runs move for every row of a group
         self.conn.fedsql.execdirect(query='''
             CREATE TABLE campaign_segment_metrics AS
-            SELECT "campaign_id", "segment_id",
-                   "impressions", "clicks", "conversions",
-                   "engagement_rate", "conversion_rate",
-                   baseline_engagement, baseline_conversion,
-                   sales_vs_benchmark
-            FROM campaign_results_vs_benchmark
+            SELECT r."campaign_id", r."segment_id",
+                   r."impressions", r."clicks", r."conversions",
+                   r."engagement_rate", r."conversion_rate",
+                   b.baseline_engagement, b.baseline_conversion,
+                   r."conversion_rate" / NULLIF(b.baseline_conversion, 0) AS sales_vs_benchmark
+            FROM campaign_results r
+            LEFT JOIN benchmarks b ON r."language" = b."language" AND r."campaign_type" = b."campaign_type"
         ''')
         print("Campaign metrics built\n")
 
     def derive_segment_attributes(self):
         print("Deriving segment attributes from campaign performance...")
-        print("Using rolling window of last 100 campaigns per segment...")
+        print(f"Using rolling window of last {ROLLING_WINDOW_CAMPAIGNS} campaigns per segment...")
 
+        source = self._window_source()
+
+        # send_sequence numbers campaigns in send order, so the newest campaigns rank first
         print("Filtering to recent campaigns using CAS data step...")
-        self.conn.datastep.runcode(code='''
+        self.conn.datastep.runcode(code=f'''
             data campaign_results_ranked;
-                set campaign_results_vs_benchmark;
-                by segment_id campaign_id;
+                set {source};
+                by segment_id descending send_sequence;
                 retain campaign_rank;
                 if first.segment_id then campaign_rank = 1;
                 else campaign_rank + 1;
-                if campaign_rank <= 100;
+                if campaign_rank <= {ROLLING_WINDOW_CAMPAIGNS};
             run;
         ''')
+        if self.incremental:
+            self._save_segment_window(source)
 
         self.conn.fedsql.execdirect(query=f'''
             CREATE TABLE segment_patterns AS
@@ -190,43 +397,86 @@ class ViyaCampaignAnalytics:
 
         print("Segment attributes derived\n")
 
-    def export_segments(self):
-        print("Exporting updated segments...")
-        learned = self.conn.CASTable('segments_learned').to_frame()
-
-        learned.columns = learned.columns.str.lower()
-
-        learned['engagement_propensity'] = learned['engagement_propensity'].clip(0.2, 0.9)
-        learned['channel_perf_email'] = learned['channel_perf_email'].clip(0, 1.0)
-        learned['channel_perf_push'] = learned['channel_perf_push'].clip(0, 1.0)
-        learned['channel_perf_inapp'] = learned['channel_perf_inapp'].clip(0, 1.0)
-        learned['contact_frequency_tolerance'] = learned['contact_frequency_tolerance'].clip(0.1, 1.0)
-        learned['content_engagement_rate'] = learned['content_engagement_rate'].clip(0.1, 1.0)
-
-        output_path = f'{DATA_DIR_OUTPUT}/{SEGMENTS_OUTPUT_FILE}'
-        learned.to_csv(output_path, index=False)
-        print(f"Exported {len(learned)} segments to {output_path}\n")
-
-        print("Summary:")
-        print(learned[['engagement_propensity', 'price_sensitivity', 'brand_loyalty']].describe())
-
-    def export_campaign_metrics(self):
-        print("Exporting campaign metrics...")
-        metrics = self.conn.CASTable('campaign_segment_metrics').to_frame()
-        metrics.columns = metrics.columns.str.lower()
-        output_path = f'{DATA_DIR_OUTPUT}/{METRICS_FILE}'
-        metrics.to_csv(output_path, index=False)
-        print(f"Exported {len(metrics)} campaign-segment metrics to {output_path}\n")
+    def _window_source(self):
+        """
+        Table to rank the rolling window from.
+
+        Incremental runs keep each segment's last ROLLING_WINDOW_CAMPAIGNS results in the
+        promoted segment_window, labelled with the campaign_results watermark it covers. When
+        that is the current watermark the window is reused as is; when it is the watermark the
+        latest update started from, only the appended rows are ranked together with it.
+        Otherwise all results are ranked.
+        """
+        if not self.incremental or not table_exists(self.conn, 'segment_window'):
+            return 'campaign_results_vs_benchmark'
+
+        window_label = table_label(self.conn, 'segment_window')
+        if window_label == table_label(self.conn, 'campaign_results'):
+            print("Segment windows are current")
+            return 'segment_window'
+        if self.appended_after is None or window_label != self.appended_after:
+            return 'campaign_results_vs_benchmark'
+
+        print("Adding appended results to saved segment windows...")
+        self.conn.fedsql.execdirect(query=f'''
+            CREATE TABLE segment_window_input AS
+            SELECT {WINDOW_COLUMNS} FROM segment_window
+            UNION ALL
+            SELECT {WINDOW_COLUMNS} FROM campaign_results_new
+        ''')
+        return 'segment_window_input'
+
+    def _save_segment_window(self, source):
+        """Promote the ranked window as segment_window for the next incremental run."""
+        if source != 'segment_window':
+            self.conn.fedsql.execdirect(query=f'''
+                CREATE TABLE segment_window_next AS
+                SELECT {WINDOW_COLUMNS} FROM campaign_results_ranked
+            ''')
+            replace_table(self.conn, 'segment_window_next', 'segment_window')
+            self.conn.table.altertable(name='segment_window', caslib=CAS_TABLE_CASLIB,
+                                       label=table_label(self.conn, 'campaign_results'))
+        for name in ['campaign_results_new', 'segment_window_input']:
+            self.conn.table.droptable(name=name, quiet=True)
+
+    def fetch_table(self, name, columns=None):
+        return fetch_table(self.conn, name, columns)
+
+    def iter_table(self, name, columns=None):
+        return iter_table_pages(self.conn, name, columns)
 
     def close(self):
+        clear_table_cache(self.conn)
         self.conn.close()
 
 
+def create_analytics(backend=None):
+    """Create the analytics backend named by backend, defaulting to config.ANALYTICS_BACKEND."""
+    backend = backend or ANALYTICS_BACKEND
+    if backend == 'cas':
+        return ViyaCampaignAnalytics()
+    if backend == 'local':
+        from .local_engine import LocalCampaignAnalytics
+        return LocalCampaignAnalytics()
+    if backend == 'sqlite':
+        from .sqlite_cas import SQLiteCASConnection
+        return ViyaCampaignAnalytics(conn=SQLiteCASConnection())
+    raise ValueError(f"Unknown analytics backend: {backend} (expected 'cas', 'local' or 'sqlite')")
+
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Campaign metrics and segment attribute learning")
+    parser.add_argument('--backend', choices=['cas', 'local', 'sqlite'], default=ANALYTICS_BACKEND,
+                        help="Run against SAS Viya CAS, the in-process NumPy/pandas engine, "
+                             "or the FedSQL queries on embedded SQLite")
+    parser.add_argument('--incremental', action='store_true', default=INCREMENTAL_METRICS,
+                        help="Only upload and join results appended since an earlier run")
+    args = parser.parse_args()
+
     try:
-        analytics = ViyaCampaignAnalytics()
+        analytics = create_analytics(args.backend)
         analytics.load_data()
-        analytics.calculate_metrics()
+        analytics.calculate_metrics(incremental=args.incremental)
         analytics.build_campaign_metrics()
         analytics.derive_segment_attributes()
         analytics.export_segments()
@@ -235,4 +485,5 @@ if __name__ == "__main__":
         print("\nComplete")
     except Exception as e:
         print(f"Error: {e}")
-        print("\nSet env vars: VIYA_HOSTNAME, VIYA_CLIENT_ID, VIYA_CLIENT_SECRET")
+        if args.backend == 'cas':
+            print("\nSet env vars: VIYA_HOSTNAME, VIYA_CLIENT_ID, VIYA_CLIENT_SECRET")
@@ -1,79 +1,77 @@
-import swat
-import requests
-import os
-from dotenv import load_dotenv
 import pandas as pd
-
-load_dotenv()
+from .session import connect_cas
+from .table_loader import load_csv_table, fetch_table, export_tables, clear_table_cache
+from .table_io import output_path
+from .scheduler import run_analyses
+from .rollup_cube import AttributeCube, grouping_set_key, cube_pivot_mean
 
 
 class CrossCampaignAnalytics:
-    def __init__(self):
-        self.conn = None
-        self._connect()
+    # Analysis: (tables it reads, tables it creates), scheduled by run_analyses; attribute_cube
+    # comes from AttributeCube
+    ANALYSES = {
+        'analyze_campaign_type_affinity': (['attribute_cube'], ['campaign_type_affinity']),
+        'analyze_educational_priming': (['campaign_metrics', 'campaigns'],
+                                        ['educational_priming', 'priming_effect_summary']),
+        'analyze_value_alignment': (['campaign_metrics', 'campaigns', 'segments'],
+                                    ['value_theme_alignment', 'value_alignment_impact']),
+        'analyze_channel_versatility': (['campaign_metrics', 'campaigns'], ['channel_versatility']),
+    }
+
+    # Exported table: what its rows count
+    EXPORTS = {
+        'campaign_type_affinity': 'segments',
+        'educational_priming': 'segments',
+        'priming_effect_summary': 'exposure levels',
+        'value_theme_alignment': 'segments',
+        'value_alignment_impact': 'dominant values',
+        'channel_versatility': 'segments',
+    }
+
+    def __init__(self, conn=None):
+        self.conn = conn
+        if self.conn is None:
+            self._connect()
 
     def _connect(self):
-        remote = os.getenv('VIYA_REMOTE', 'https://viya-i107icluw3.engage.sas.com')
-        hostname = os.getenv('VIYA_HOSTNAME')
-        client_id = os.getenv('VIYA_CLIENT_ID')
-        client_secret = os.getenv('VIYA_CLIENT_SECRET')
-
-        if not all([hostname, client_id, client_secret]):
-            raise ValueError("Missing required environment variables: VIYA_HOSTNAME, VIYA_CLIENT_ID, VIYA_CLIENT_SECRET")
-
-        print("Authenticating with Viya...")
-        response = requests.post(
-            f'{remote}/SASLogon/oauth/token',
-            data='grant_type=client_credentials',
-            headers={'Content-Type': 'application/x-www-form-urlencoded'},
-            auth=(client_id, client_secret)
-        )
-
-        if not response.ok:
-            raise ConnectionError(f"Auth failed: {response.text}")
-
-        token = response.json()['access_token']
-        print("✓ Authenticated")
-
-        cas_url = f"https://{hostname}/cas-shared-default-http/"
-        print(f"Connecting to CAS: {cas_url}")
-        self.conn = swat.CAS(cas_url, password=token, ssl_ca_list=False)
-        self.conn.loadactionset('fedsql')
-        print(f"✓ Connected. Session: {self.conn.sessionid}\n")
+        self.conn = connect_cas(('fedsql',))
 
     def load_data(self):
         print("Loading data into CAS...")
-        self.conn.read_csv('data/output/campaign_metrics.csv',
-                          casout={'name': 'campaign_metrics', 'replace': True})
-        self.conn.read_csv('data/generated/campaigns.csv',
-                          casout={'name': 'campaigns', 'replace': True})
-        self.conn.read_csv('data/output/user_segments_enriched.csv',
-                          casout={'name': 'segments', 'replace': True})
+        load_csv_table(self.conn, output_path('data/output/campaign_metrics.csv'), 'campaign_metrics')
+        load_csv_table(self.conn, 'data/generated/campaigns.csv', 'campaigns')
+        load_csv_table(self.conn, output_path('data/output/user_segments_enriched.csv'), 'segments')
         print("Data loaded\n")
 
     def analyze_campaign_type_affinity(self):
         print("Analyzing campaign type affinity...")
-        self.conn.fedsql.execdirect(query='''
+        self.conn.fedsql.execdirect(query=f'''
             CREATE TABLE campaign_type_affinity AS
             SELECT
-                m.segment_id,
-                AVG(CASE WHEN c.campaign_type = 'educational' THEN m.conversion_rate END) AS edu_conversion,
-                AVG(CASE WHEN c.campaign_type = 'educational' THEN m.engagement_rate END) AS edu_engagement,
-                AVG(CASE WHEN c.campaign_type = 'premium' THEN m.conversion_rate END) AS premium_conversion,
-                AVG(CASE WHEN c.campaign_type = 'discount' THEN m.conversion_rate END) AS discount_conversion,
+                segment_id,
+                edu_conversion,
+                edu_engagement,
+                premium_conversion,
+                discount_conversion,
                 -- Pattern classification
                 CASE
-                    WHEN AVG(CASE WHEN c.campaign_type = 'educational' THEN m.engagement_rate END) > 0.10
-                     AND AVG(CASE WHEN c.campaign_type = 'premium' THEN m.conversion_rate END) > 0.025
+                    WHEN edu_engagement > 0.10 AND premium_conversion > 0.025
                     THEN 'edu_premium_affinity'
-                    WHEN AVG(CASE WHEN c.campaign_type = 'discount' THEN m.conversion_rate END) >
-                         AVG(CASE WHEN c.campaign_type = 'premium' THEN m.conversion_rate END) * 1.3
+                    WHEN discount_conversion > premium_conversion * 1.3
                     THEN 'discount_preference'
                     ELSE 'balanced'
                 END AS response_pattern
-            FROM campaign_metrics m
-            JOIN campaigns c ON m.campaign_id = c.campaign_id
-            GROUP BY m.segment_id
+            FROM (
+                SELECT
+                    segment_id,
+                    {cube_pivot_mean('conversion', 'campaign_type', 'educational')} AS edu_conversion,
+                    {cube_pivot_mean('engagement', 'campaign_type', 'educational')} AS edu_engagement,
+                    {cube_pivot_mean('conversion', 'campaign_type', 'premium')} AS premium_conversion,
+                    {cube_pivot_mean('conversion', 'campaign_type', 'discount')} AS discount_conversion
+                FROM attribute_cube
+                WHERE grouping_set = '{grouping_set_key('segment_id', 'campaign_type')}'
+                GROUP BY segment_id
+            ) a
         ''')
         print("Campaign type affinity analyzed\n")
 
@@ -203,46 +201,21 @@ class CrossCampaignAnalytics:
 
         print("Channel versatility analyzed\n")
 
-    def export_results(self):
+    def export_results(self, outputs=None):
         print("Exporting Phase 2 results...")
 
-        affinity = self.conn.CASTable('campaign_type_affinity').to_frame()
-        affinity.columns = affinity.columns.str.lower()
-        affinity.to_csv('data/output/campaign_type_affinity.csv', index=False)
-        print(f"✓ Exported campaign_type_affinity.csv ({len(affinity)} segments)")
-
-        priming = self.conn.CASTable('educational_priming').to_frame()
-        priming.columns = priming.columns.str.lower()
-        priming.to_csv('data/output/educational_priming.csv', index=False)
-        print(f"✓ Exported educational_priming.csv ({len(priming)} segments)")
-
-        priming_summary = self.conn.CASTable('priming_effect_summary').to_frame()
-        priming_summary.columns = priming_summary.columns.str.lower()
-        priming_summary.to_csv('data/output/priming_effect_summary.csv', index=False)
-        print(f"✓ Exported priming_effect_summary.csv")
-
-        value_alignment = self.conn.CASTable('value_theme_alignment').to_frame()
-        value_alignment.columns = value_alignment.columns.str.lower()
-        value_alignment.to_csv('data/output/value_theme_alignment.csv', index=False)
-        print(f"✓ Exported value_theme_alignment.csv ({len(value_alignment)} segments)")
-
-        alignment_impact = self.conn.CASTable('value_alignment_impact').to_frame()
-        alignment_impact.columns = alignment_impact.columns.str.lower()
-        alignment_impact.to_csv('data/output/value_alignment_impact.csv', index=False)
-        print(f"✓ Exported value_alignment_impact.csv")
-
-        versatility = self.conn.CASTable('channel_versatility').to_frame()
-        versatility.columns = versatility.columns.str.lower()
-        versatility.to_csv('data/output/channel_versatility.csv', index=False)
-        print(f"✓ Exported channel_versatility.csv ({len(versatility)} segments)\n")
+        tables = [table for table in self.EXPORTS if outputs is None or table in outputs]
+        rows = export_tables(self.conn, {table: output_path(f'data/output/{table}.csv') for table in tables})
+        for table in tables:
+            print(f"✓ Exported {table} ({rows[table]} {self.EXPORTS[table]})")
+        print()
 
     def print_insights(self):
         print("=" * 60)
         print("PHASE 2 INSIGHTS - Cross-Campaign Patterns")
         print("=" * 60)
 
-        affinity = self.conn.CASTable('campaign_type_affinity').to_frame()
-        affinity.columns = affinity.columns.str.lower()
+        affinity = fetch_table(self.conn, 'campaign_type_affinity')
 
         print("\n1. CAMPAIGN TYPE AFFINITY PATTERNS:")
         pattern_counts = affinity['response_pattern'].value_counts()
@@ -256,8 +229,7 @@ class CrossCampaignAnalytics:
             print(f"   - Avg educational engagement: {edu_premium['edu_engagement'].mean():.2%}")
             print(f"   - Avg premium conversion: {edu_premium['premium_conversion'].mean():.2%}")
 
-        priming_summary = self.conn.CASTable('priming_effect_summary').to_frame()
-        priming_summary.columns = priming_summary.columns.str.lower()
+        priming_summary = fetch_table(self.conn, 'priming_effect_summary')
 
         print("\n2. EDUCATIONAL PRIMING EFFECT:")
         for _, row in priming_summary.iterrows():
@@ -270,8 +242,7 @@ class CrossCampaignAnalytics:
                     lift = (row['avg_later_premium_conv'] / baseline['avg_later_premium_conv'].iloc[0] - 1) * 100
                     print(f"   - Priming lift vs low exposure: +{lift:.1f}%")
 
-        alignment_impact = self.conn.CASTable('value_alignment_impact').to_frame()
-        alignment_impact.columns = alignment_impact.columns.str.lower()
+        alignment_impact = fetch_table(self.conn, 'value_alignment_impact')
 
         print("\n3. VALUE THEME ALIGNMENT IMPACT:")
         for _, row in alignment_impact.iterrows():
@@ -281,8 +252,7 @@ class CrossCampaignAnalytics:
             print(f"   - Baseline: {row['baseline_conversion']:.2%}")
             print(f"   - Alignment lift: {lift:+.1f}%")
 
-        versatility = self.conn.CASTable('channel_versatility').to_frame()
-        versatility.columns = versatility.columns.str.lower()
+        versatility = fetch_table(self.conn, 'channel_versatility')
 
         print("\n4. CHANNEL VERSATILITY:")
         strategy_counts = versatility['channel_strategy'].value_counts()
@@ -293,6 +263,7 @@ class CrossCampaignAnalytics:
         print("\n" + "=" * 60)
 
     def close(self):
+        clear_table_cache(self.conn)
         self.conn.close()
 
 
@@ -300,10 +271,7 @@ if __name__ == "__main__":
     try:
         analytics = CrossCampaignAnalytics()
         analytics.load_data()
-        analytics.analyze_campaign_type_affinity()
-        analytics.analyze_educational_priming()
-        analytics.analyze_value_alignment()
-        analytics.analyze_channel_versatility()
+        run_analyses([AttributeCube(analytics.conn), analytics])
         analytics.export_results()
         analytics.print_insights()
         analytics.close()
@@ -1,13 +1,42 @@
+import itertools
 import json
 import sys
 import os
 
+import numpy as np
+
 script_dir = os.path.dirname(os.path.abspath(__file__))
 prompt_blocks_path = os.path.join(script_dir, 'prompt_blocks.json')
 
 with open(prompt_blocks_path, 'r') as f:
     PROMPT_BLOCKS = json.load(f)
 
+REQUIRED_FIELDS = [
+    'language', 'parent_age', 'parent_gender', 'baby_count',
+    'engagement_propensity', 'price_sensitivity', 'brand_loyalty',
+    'contact_frequency_tolerance', 'content_engagement_rate',
+    'channel_perf_email', 'channel_perf_push', 'channel_perf_inapp',
+    'values_family', 'values_eco_conscious', 'values_convenience', 'values_quality'
+]
+
+NUMERIC_FIELDS = [
+    'engagement_propensity', 'price_sensitivity', 'brand_loyalty',
+    'contact_frequency_tolerance', 'content_engagement_rate',
+    'channel_perf_email', 'channel_perf_push', 'channel_perf_inapp',
+    'values_family', 'values_eco_conscious', 'values_convenience', 'values_quality'
+]
+
+VALUE_DRIVERS = ['family_orientation', 'eco_consciousness', 'convenience_preference', 'quality_focus']
+
+SCORE_CATEGORIES = ['low', 'medium', 'high']
+
+VALUE_NAMES = {
+    'family_orientation': 'family moments and bonding experiences',
+    'eco_consciousness': 'environmental impact and sustainability',
+    'convenience_preference': 'time-saving and easy solutions',
+    'quality_focus': 'premium quality and reliability'
+}
+
 
 def categorize_score(score):
     if score > 0.5:
@@ -51,34 +80,69 @@ def calculate_timing(frequency_tolerance):
         return 14
 
 
-def find_best_prompt_block(segment):
-    price_cat = categorize_score(segment['price_sensitivity'])
-    loyalty_cat = categorize_score(segment['brand_loyalty'])
-    engagement_cat = categorize_score(segment['engagement_propensity'])
-    primary_value, _ = rank_value_drivers(segment)
-
-    blocks = PROMPT_BLOCKS["behavioral_combinations"]
-
+def match_prompt_block(price_cat, loyalty_cat, engagement_cat, primary_value):
     if price_cat == "high" and primary_value == "family_orientation":
-        return blocks["price_driven_family_focused"]
+        return "price_driven_family_focused"
     elif loyalty_cat == "high" and primary_value == "quality_focus":
-        return blocks["quality_focused_loyal"]
+        return "quality_focused_loyal"
     elif engagement_cat == "low" and primary_value == "convenience_preference":
-        return blocks["convenience_seeker_low_engagement"]
+        return "convenience_seeker_low_engagement"
     elif engagement_cat == "high" and primary_value == "eco_consciousness":
-        return blocks["eco_conscious_engaged"]
+        return "eco_conscious_engaged"
     elif price_cat == "high" and primary_value == "convenience_preference":
-        return blocks["price_driven_convenience_seeker"]
+        return "price_driven_convenience_seeker"
     elif loyalty_cat == "high" and primary_value == "eco_consciousness":
-        return blocks["quality_focused_eco_conscious"]
+        return "quality_focused_eco_conscious"
     elif engagement_cat == "high" and primary_value == "family_orientation":
-        return blocks["engaged_family_focused"]
+        return "engaged_family_focused"
     elif engagement_cat == "low" and primary_value == "quality_focus":
-        return blocks["low_engagement_quality_seeker"]
+        return "low_engagement_quality_seeker"
     elif price_cat == "medium" and engagement_cat == "medium":
-        return blocks["balanced_moderate"]
+        return "balanced_moderate"
     else:
-        return blocks["default_balanced"]
+        return "default_balanced"
+
+
+def compile_prompt_block_table():
+    # The rule chain only sees three score categories and the primary value driver, so every
+    # possible outcome fits in a 3 x 3 x 3 x 4 table indexed by (price, loyalty, engagement, primary)
+    blocks = PROMPT_BLOCKS["behavioral_combinations"]
+    block_keys = list(blocks)
+    table = np.empty((len(SCORE_CATEGORIES),) * 3 + (len(VALUE_DRIVERS),), dtype=np.intp)
+    for index in itertools.product(range(len(SCORE_CATEGORIES)), range(len(SCORE_CATEGORIES)),
+                                   range(len(SCORE_CATEGORIES)), range(len(VALUE_DRIVERS))):
+        price_cat, loyalty_cat, engagement_cat = (SCORE_CATEGORIES[i] for i in index[:3])
+        key = match_prompt_block(price_cat, loyalty_cat, engagement_cat, VALUE_DRIVERS[index[3]])
+        table[index] = block_keys.index(key)
+    return block_keys, table
+
+
+# Single compiled copy of the rule chain; recommendation_engine imports it too
+PROMPT_BLOCK_KEYS, PROMPT_BLOCK_TABLE = compile_prompt_block_table()
+PROMPT_BLOCK_LIST = [PROMPT_BLOCKS["behavioral_combinations"][key] for key in PROMPT_BLOCK_KEYS]
+SCORE_CATEGORY_INDEX = {category: i for i, category in enumerate(SCORE_CATEGORIES)}
+
+
+def category_indices(scores):
+    # Vectorized categorize_score, returning indices into SCORE_CATEGORIES
+    return np.where(scores > 0.5, 2, np.where(scores < 0.35, 0, 1))
+
+
+def primary_value_index(segment):
+    scores = [segment['values_family'], segment['values_eco_conscious'],
+              segment['values_convenience'], segment['values_quality']]
+    # index() returns the first of equal scores, matching rank_value_drivers' stable sort
+    return scores.index(max(scores))
+
+
+def find_best_prompt_block(segment):
+    index = PROMPT_BLOCK_TABLE[
+        SCORE_CATEGORY_INDEX[categorize_score(segment['price_sensitivity'])],
+        SCORE_CATEGORY_INDEX[categorize_score(segment['brand_loyalty'])],
+        SCORE_CATEGORY_INDEX[categorize_score(segment['engagement_propensity'])],
+        primary_value_index(segment)
+    ]
+    return PROMPT_BLOCK_LIST[index]
 
 
 def generate_prompt(segment, is_email_campaign=False):
@@ -87,13 +151,10 @@ def generate_prompt(segment, is_email_campaign=False):
     prompt_block = find_best_prompt_block(segment)
     primary_value, secondary_value = rank_value_drivers(segment)
 
-    value_names = {
-        'family_orientation': 'family moments and bonding experiences',
-        'eco_consciousness': 'environmental impact and sustainability',
-        'convenience_preference': 'time-saving and easy solutions',
-        'quality_focus': 'premium quality and reliability'
-    }
+    return build_prompt(channel, constraints, timing, prompt_block, primary_value, secondary_value)
 
+
+def build_prompt(channel, constraints, timing, prompt_block, primary_value, secondary_value):
     return {
         "delivery_settings": {
             "channel": channel,
@@ -102,8 +163,8 @@ def generate_prompt(segment, is_email_campaign=False):
         },
         "audience_profile": {
             "behavioral_summary": prompt_block["behavioral_summary"],
-            "primary_value_driver": value_names[primary_value],
-            "secondary_value_driver": value_names[secondary_value],
+            "primary_value_driver": VALUE_NAMES[primary_value],
+            "secondary_value_driver": VALUE_NAMES[secondary_value],
             "motivational_triggers": prompt_block["motivational_triggers"]
         },
         "content_guidance": {
@@ -116,26 +177,11 @@ def generate_prompt(segment, is_email_campaign=False):
 
 
 def validate_segment(segment):
-    required_fields = [
-        'language', 'parent_age', 'parent_gender', 'baby_count',
-        'engagement_propensity', 'price_sensitivity', 'brand_loyalty',
-        'contact_frequency_tolerance', 'content_engagement_rate',
-        'channel_perf_email', 'channel_perf_push', 'channel_perf_inapp',
-        'values_family', 'values_eco_conscious', 'values_convenience', 'values_quality'
-    ]
-
-    missing_fields = [field for field in required_fields if field not in segment]
+    missing_fields = [field for field in REQUIRED_FIELDS if field not in segment]
     if missing_fields:
         raise ValueError(f"Missing required fields: {', '.join(missing_fields)}")
 
-    numeric_fields = [
-        'engagement_propensity', 'price_sensitivity', 'brand_loyalty',
-        'contact_frequency_tolerance', 'content_engagement_rate',
-        'channel_perf_email', 'channel_perf_push', 'channel_perf_inapp',
-        'values_family', 'values_eco_conscious', 'values_convenience', 'values_quality'
-    ]
-
-    for field in numeric_fields:
+    for field in NUMERIC_FIELDS:
         if segment[field] is None:
             raise ValueError(f"Field '{field}' cannot be null")
         if not isinstance(segment[field], (int, float)):
@@ -144,29 +190,168 @@ def validate_segment(segment):
             raise ValueError(f"Field '{field}' must be between 0 and 1, got {segment[field]}")
 
 
-if __name__ == "__main__":
+def _segment_matrix(segments):
+    # Rows with missing fields or non-numeric values stay NaN and fail the range check
+    matrix = np.full((len(segments), len(NUMERIC_FIELDS)), np.nan)
+    for i, segment in enumerate(segments):
+        if not isinstance(segment, dict) or not all(field in segment for field in REQUIRED_FIELDS):
+            continue
+        row = [segment[field] for field in NUMERIC_FIELDS]
+        if all(isinstance(value, (int, float)) for value in row):
+            matrix[i] = row
+    return matrix
+
+
+def generate_prompts(segments, is_email_campaign=False):
+    # One {"prompt": ...} or {"error": ...} entry per input segment, in input order
+    matrix = _segment_matrix(segments)
+    valid = ((matrix >= 0) & (matrix <= 1)).all(axis=1)
+    column = {field: matrix[valid, i] for i, field in enumerate(NUMERIC_FIELDS)}
+
+    values = np.column_stack([column['values_family'], column['values_eco_conscious'],
+                              column['values_convenience'], column['values_quality']])
+    # Stable sort on the negated scores keeps rank_value_drivers' tie-breaking (first driver wins)
+    ranked = np.argsort(-values, axis=1, kind='stable')
+    drivers = np.array(VALUE_DRIVERS)
+    primary_values = drivers[ranked[:, 0]]
+    secondary_values = drivers[ranked[:, 1]]
+
+    if is_email_campaign:
+        channels = np.full(len(values), "email")
+    else:
+        channels = np.where(column['channel_perf_push'] > column['channel_perf_inapp'],
+                            "push_notification", "in_app_message")
+
+    tolerance = column['contact_frequency_tolerance']
+    timings = np.select([tolerance >= 0.5, tolerance >= 0.35], [7, 10], 14)
+
+    block_indices = PROMPT_BLOCK_TABLE[
+        category_indices(column['price_sensitivity']),
+        category_indices(column['brand_loyalty']),
+        category_indices(column['engagement_propensity']),
+        ranked[:, 0]
+    ]
+    prompt_blocks = [PROMPT_BLOCK_LIST[i] for i in block_indices]
+
+    scored = zip(channels, timings, prompt_blocks, primary_values, secondary_values)
+    results = []
+    for segment, is_valid in zip(segments, valid):
+        if not is_valid:
+            try:
+                if not isinstance(segment, dict):
+                    raise ValueError("Segment must be a JSON object")
+                validate_segment(segment)
+                raise ValueError("Segment failed validation")
+            except Exception as e:
+                results.append({"error": format_error(e)})
+            continue
+
+        channel, timing, prompt_block, primary_value, secondary_value = next(scored)
+        channel = str(channel)
+        constraints = PROMPT_BLOCKS["channel_constraints"][channel]
+        results.append({"prompt": build_prompt(channel, constraints, int(timing), prompt_block,
+                                               str(primary_value), str(secondary_value))})
+    return results
+
+
+def format_error(error):
+    if isinstance(error, json.JSONDecodeError):
+        return f"Invalid JSON: {str(error)}"
+    if isinstance(error, ValueError):
+        return f"Validation error: {str(error)}"
+    return f"Unexpected error: {str(error)}"
+
+
+def handle_request(input_json):
+    if 'segments' in input_json:
+        segments = input_json['segments']
+        if not isinstance(segments, list):
+            raise ValueError("'segments' must be an array")
+        return {"results": generate_prompts(segments, input_json.get('is_email_campaign', False))}
+
+    segment_data = input_json.get('segment', input_json)
+    is_email_campaign = input_json.get('is_email_campaign', False)
+
+    validate_segment(segment_data)
+    return generate_prompt(segment_data, is_email_campaign)
+
+
+def handle_line(line):
+    request_id = None
+    try:
+        input_json = json.loads(line)
+        if isinstance(input_json, dict):
+            request_id = input_json.get('id')
+        else:
+            raise ValueError("Request must be a JSON object")
+        if 'segments' in input_json:
+            return {"id": request_id, **handle_request(input_json)}
+        return {"id": request_id, "prompt": handle_request(input_json)}
+    except Exception as e:
+        return {"id": request_id, "error": format_error(e)}
+
+
+def serve_stream(reader, writer):
+    for line in reader:
+        line = line.strip()
+        if not line:
+            continue
+        writer.write(json.dumps(handle_line(line)) + "\n")
+        writer.flush()
+
+
+def serve_socket(socket_path):
+    import socket
+    import threading
+
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(socket_path)
+    server.listen()
+
+    def handle_connection(conn):
+        with conn, conn.makefile('r', encoding='utf-8') as reader, \
+                conn.makefile('w', encoding='utf-8') as writer:
+            serve_stream(reader, writer)
+
+    try:
+        while True:
+            conn, _ = server.accept()
+            threading.Thread(target=handle_connection, args=(conn,), daemon=True).start()
+    finally:
+        server.close()
+        os.unlink(socket_path)
+
+
+def run_once():
     try:
         input_data = sys.stdin.read().strip()
         if not input_data:
             raise ValueError("No input data provided")
 
         input_json = json.loads(input_data)
-
-        segment_data = input_json.get('segment', input_json)
-        is_email_campaign = input_json.get('is_email_campaign', False)
-
-        validate_segment(segment_data)
-        prompt = generate_prompt(segment_data, is_email_campaign)
+        prompt = handle_request(input_json)
         print(json.dumps(prompt, indent=2))
-    except json.JSONDecodeError as e:
-        error_response = {"error": f"Invalid JSON: {str(e)}"}
-        print(json.dumps(error_response), file=sys.stderr)
-        sys.exit(1)
-    except ValueError as e:
-        error_response = {"error": f"Validation error: {str(e)}"}
-        print(json.dumps(error_response), file=sys.stderr)
-        sys.exit(1)
     except Exception as e:
-        error_response = {"error": f"Unexpected error: {str(e)}"}
+        error_response = {"error": format_error(e)}
         print(json.dumps(error_response), file=sys.stderr)
         sys.exit(1)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Generate Gemini prompts for enriched segments")
+    parser.add_argument('--serve', action='store_true',
+                        help="Run as a long-lived worker reading NDJSON requests and writing NDJSON responses")
+    parser.add_argument('--socket', help="Serve on this Unix socket path instead of stdin/stdout")
+    args = parser.parse_args()
+
+    if args.socket:
+        serve_socket(args.socket)
+    elif args.serve:
+        serve_stream(sys.stdin, sys.stdout)
+    else:
+        run_once()
@@ -0,0 +1,260 @@
+import hashlib
+import os
+import numpy as np
+import pandas as pd
+from .core_campaign_metrics import CampaignAnalyticsBackend
+from .rolling_window import SegmentRollingWindow, campaign_sequence
+from .table_loader import file_watermark, appended_offset, csv_rows
+from .table_io import output_path, read_table
+from .config import (
+    DATA_DIR_GENERATED, DATA_DIR_OUTPUT,
+    ROLLING_WINDOW_CAMPAIGNS, ROLLING_WINDOW_STATE_FILE,
+    SEGMENTS_OUTPUT_FILE, CAMPAIGNS_FILE, RESULTS_FILE,
+    DEFAULT_ENGAGEMENT, DEFAULT_CONVERSION,
+    ENGAGEMENT_MIN, ENGAGEMENT_SCALE,
+    PRICE_SENSITIVITY_HIGH, PRICE_SENSITIVITY_MED, PRICE_SENSITIVITY_LOW,
+    BRAND_LOYALTY_HIGH, BRAND_LOYALTY_LOW,
+    CHANNEL_SCALE
+)
+
+BENCHMARK_MIN_ROWS = 5
+
+CAMPAIGN_COLUMNS = ['campaign_type', 'channel', 'message_sentiment', 'value_theme']
+SEGMENT_COLUMNS = ['language', 'price_sensitivity', 'brand_loyalty', 'engagement_propensity',
+                   'channel_perf_email', 'channel_perf_push', 'channel_perf_inapp',
+                   'values_family', 'values_eco_conscious', 'values_convenience', 'values_quality']
+METRIC_COLUMNS = ['campaign_id', 'segment_id', 'impressions', 'clicks', 'conversions',
+                  'engagement_rate', 'conversion_rate', 'baseline_engagement', 'baseline_conversion',
+                  'sales_vs_benchmark']
+
+
+def window_state_file(results_path):
+    """ROLLING_WINDOW_STATE_FILE for the results file at results_path, so each file keeps its own windows."""
+    root, extension = os.path.splitext(ROLLING_WINDOW_STATE_FILE)
+    key = hashlib.sha256(os.path.abspath(results_path).encode()).hexdigest()[:16]
+    return f'{root}_{key}{extension}'
+
+
+def _hash_join(left_keys, right_keys):
+    """Row positions in right_keys for each left key (-1 when absent); right_keys must be unique."""
+    return pd.Index(right_keys).get_indexer(left_keys)
+
+
+def _take(values, positions):
+    """Gather values by join positions, filling unmatched rows with NaN like a LEFT JOIN."""
+    out = np.full(len(positions), np.nan)
+    matched = positions >= 0
+    out[matched] = np.asarray(values, dtype=float)[positions[matched]]
+    return out
+
+
+def learn_segment_attributes(segments, patterns):
+    """
+    Map segment_patterns onto the learned segment attributes, as in the segments_learned query.
+
+    Segments without patterns, and NaN aggregates, fall back to the default rates.
+    """
+    pattern_pos = _hash_join(segments['segment_id'], patterns['segment_id'])
+
+    def coalesce(column, default):
+        values = _take(patterns[column], pattern_pos)
+        return np.where(np.isnan(values), default, values)
+
+    avg_engagement = coalesce('avg_engagement', DEFAULT_ENGAGEMENT)
+    discount = coalesce('discount_response', DEFAULT_CONVERSION)
+    premium = coalesce('premium_response', DEFAULT_CONVERSION)
+    email = coalesce('email_perf', DEFAULT_ENGAGEMENT)
+    push = coalesce('push_perf', DEFAULT_ENGAGEMENT)
+    inapp = coalesce('inapp_perf', DEFAULT_ENGAGEMENT)
+    family = coalesce('family_resp', DEFAULT_CONVERSION)
+    eco = coalesce('eco_resp', DEFAULT_CONVERSION)
+    convenience = coalesce('conv_resp', DEFAULT_CONVERSION)
+    quality = coalesce('qual_resp', DEFAULT_CONVERSION)
+
+    engagement_propensity = (avg_engagement - ENGAGEMENT_MIN) / ENGAGEMENT_SCALE
+    channel_total = email + push + inapp
+    value_total = family + eco + convenience + quality
+
+    learned = segments[['segment_id', 'language', 'parent_age', 'parent_gender', 'baby_count']].copy()
+    learned['engagement_propensity'] = engagement_propensity
+    learned['price_sensitivity'] = np.select(
+        [discount > premium * 1.3, discount < premium * 0.7],
+        [PRICE_SENSITIVITY_HIGH, PRICE_SENSITIVITY_LOW],
+        PRICE_SENSITIVITY_MED
+    )
+    learned['brand_loyalty'] = np.where(premium > discount, BRAND_LOYALTY_HIGH, BRAND_LOYALTY_LOW)
+    learned['channel_perf_email'] = email / channel_total * CHANNEL_SCALE
+    learned['channel_perf_push'] = push / channel_total * CHANNEL_SCALE
+    learned['channel_perf_inapp'] = inapp / channel_total * CHANNEL_SCALE
+    learned['values_family'] = family / value_total
+    learned['values_eco_conscious'] = eco / value_total
+    learned['values_convenience'] = convenience / value_total
+    learned['values_quality'] = quality / value_total
+    learned['contact_frequency_tolerance'] = engagement_propensity * 0.8
+    learned['content_engagement_rate'] = engagement_propensity * 0.9
+    return learned
+
+
+class LocalCampaignAnalytics(CampaignAnalyticsBackend):
+    """
+    In-process NumPy/pandas implementation of the core campaign metrics pipeline.
+
+    Mirrors the FedSQL and data step phases of ViyaCampaignAnalytics table for table,
+    so small markets and CI runs need no CAS session or network access.
+    """
+
+    def __init__(self):
+        self.tables = {}
+        self.incremental = False
+        self.inputs = {}
+        self.watermarks = {}
+        self.result_rows = None
+        print("✓ Using local analytics engine\n")
+
+    def load_data(self):
+        print("Loading data into local engine...")
+        self.tables['segments'] = read_table(output_path(f'{DATA_DIR_OUTPUT}/{SEGMENTS_OUTPUT_FILE}'))
+        # Input files the segment windows are built from, which only grow by appended rows
+        self.inputs = {'results': f'{DATA_DIR_GENERATED}/{RESULTS_FILE}',
+                       'campaigns': f'{DATA_DIR_GENERATED}/{CAMPAIGNS_FILE}'}
+        self.watermarks = {name: file_watermark(path) for name, path in self.inputs.items()}
+        self.tables['campaigns'] = pd.read_csv(self.inputs['campaigns'])
+        # Rows appended after the watermark are left for the next run
+        results_size = int(self.watermarks['results'].split(':')[0])
+        self.tables['campaign_results_raw'] = pd.read_csv(self.inputs['results'],
+                                                          nrows=csv_rows(self.inputs['results'], results_size))
+        print("Data loaded\n")
+
+    def calculate_metrics(self, incremental=False):
+        self.incremental = incremental
+        if incremental:
+            print("Rebuilding metrics in full; segment windows are updated incrementally...")
+        print("Calculating engagement metrics...")
+        raw = self.tables['campaign_results_raw']
+        campaigns = self.tables['campaigns']
+        segments = self.tables['segments']
+
+        campaign_pos = _hash_join(raw['campaign_id'], campaigns['campaign_id'])
+        segment_pos = _hash_join(raw['segment_id'], segments['segment_id'])
+        matched = (campaign_pos >= 0) & (segment_pos >= 0)
+        campaign_pos, segment_pos = campaign_pos[matched], segment_pos[matched]
+        self.result_rows = np.flatnonzero(matched)
+
+        results = raw.loc[matched, ['campaign_id', 'segment_id', 'impressions', 'clicks', 'conversions']]
+        results = results.reset_index(drop=True)
+        for column in CAMPAIGN_COLUMNS:
+            results[column] = campaigns[column].to_numpy()[campaign_pos]
+        for column in SEGMENT_COLUMNS:
+            results[column] = segments[column].to_numpy()[segment_pos]
+
+        impressions = results['impressions'].to_numpy(dtype=float)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            results['engagement_rate'] = results['clicks'].to_numpy(dtype=float) / impressions
+            results['conversion_rate'] = results['conversions'].to_numpy(dtype=float) / impressions
+        channel = results['channel'].to_numpy()
+        results['channel_match_score'] = np.select(
+            [channel == 'email', channel == 'push'],
+            [results['channel_perf_email'], results['channel_perf_push']],
+            results['channel_perf_inapp']
+        )
+        results['send_sequence'] = campaign_sequence(results['campaign_id'])
+        self.tables['campaign_results'] = results
+
+        print("Calculating benchmarks...")
+        grouped = results.groupby(['language', 'campaign_type'], dropna=False)
+        benchmarks = grouped.agg(
+            baseline_conversion=('conversion_rate', 'mean'),
+            baseline_engagement=('engagement_rate', 'mean'),
+            conversion_std=('conversion_rate', 'std'),
+            row_count=('conversion_rate', 'size')
+        )
+        benchmarks = benchmarks[benchmarks['row_count'] >= BENCHMARK_MIN_ROWS].drop(columns='row_count')
+        self.tables['benchmarks'] = benchmarks.reset_index()
+
+        print("Calculating performance vs benchmark...")
+        benchmark_keys = benchmarks.index[benchmarks.index.to_frame().notna().all(axis=1).to_numpy()]
+        benchmark_pos = _hash_join(
+            pd.MultiIndex.from_frame(results[['language', 'campaign_type']]),
+            benchmark_keys
+        )
+        benchmarks = benchmarks.loc[benchmark_keys]
+        vs_benchmark = results.copy()
+        vs_benchmark['baseline_conversion'] = _take(benchmarks['baseline_conversion'], benchmark_pos)
+        vs_benchmark['baseline_engagement'] = _take(benchmarks['baseline_engagement'], benchmark_pos)
+        baseline = vs_benchmark['baseline_conversion'].to_numpy()
+        with np.errstate(invalid='ignore', divide='ignore'):
+            vs_benchmark['sales_vs_benchmark'] = np.where(
+                baseline != 0, vs_benchmark['conversion_rate'].to_numpy() / baseline, np.nan
+            )
+        self.tables['campaign_results_vs_benchmark'] = vs_benchmark
+        print("Metrics calculated\n")
+
+    def build_campaign_metrics(self):
+        print("Building campaign metrics per segment...")
+        self.tables['campaign_segment_metrics'] = \
+            self.tables['campaign_results_vs_benchmark'][METRIC_COLUMNS].copy()
+        print("Campaign metrics built\n")
+
+    def derive_segment_attributes(self):
+        print("Deriving segment attributes from campaign performance...")
+        print(f"Using rolling window of last {ROLLING_WINDOW_CAMPAIGNS} campaigns per segment...")
+
+        patterns = self._segment_window().patterns()
+        self.tables['segment_patterns'] = patterns
+
+        self.tables['segments_learned'] = learn_segment_attributes(self.tables['segments'], patterns)
+
+        print("Segment attributes derived\n")
+
+    def _segment_window(self):
+        """
+        Rolling windows over campaign_results_vs_benchmark.
+
+        Incremental runs save the windows to a state file per results file, with the watermarks
+        of the results and campaigns files they cover. The next run adds only the results
+        appended since, provided both files were only appended to and the new results are all
+        of campaigns sent after the newest in the windows; otherwise the windows are rebuilt.
+        """
+        results = self.tables['campaign_results_vs_benchmark']
+        state_file = window_state_file(self.inputs['results'])
+        window = self._saved_window(state_file, results) if self.incremental else None
+        if window is None:
+            window = SegmentRollingWindow(ROLLING_WINDOW_CAMPAIGNS)
+            window.extend(results)
+        window.source = dict(self.watermarks)
+
+        if self.incremental:
+            os.makedirs(os.path.dirname(state_file), exist_ok=True)
+            window.save(state_file)
+        return window
+
+    def _saved_window(self, state_file, results):
+        """The saved windows with the appended results added, or None when they must be rebuilt."""
+        if not os.path.exists(state_file):
+            return None
+        window = SegmentRollingWindow.load(state_file)
+        if window is None or window.capacity != ROLLING_WINDOW_CAMPAIGNS or window.last_sequence is None:
+            print("Saved segment windows are out of date, rebuilding...")
+            return None
+
+        offsets = {name: appended_offset(path, window.source.get(name)) for name, path in self.inputs.items()}
+        if None in offsets.values():
+            print(f"{RESULTS_FILE} or {CAMPAIGNS_FILE} was rewritten since the segment windows were saved, "
+                  "rebuilding...")
+            return None
+
+        appended = results[self.result_rows >= csv_rows(self.inputs['results'], offsets['results'])]
+        if (appended['send_sequence'] <= window.last_sequence).any():
+            print("Appended results include campaigns already in the segment windows, rebuilding...")
+            return None
+
+        if appended.empty:
+            print("Segment windows are current")
+        else:
+            print(f"Adding campaigns sent after #{window.last_sequence:.0f} to saved segment windows...")
+            window.extend(appended)
+        return window
+
+    def fetch_table(self, name, columns=None):
+        table = self.tables[name]
+        return (table[columns] if columns else table).copy()
@@ -0,0 +1,210 @@
+import argparse
+import io
+import signal
+import time
+import numpy as np
+import pandas as pd
+from .core_campaign_metrics import export_learned_segments
+from .local_engine import learn_segment_attributes
+from .table_io import output_path, read_table
+from .rolling_window import PATTERN_MEANS, PATTERN_MAXES, PATTERN_COLUMNS, pattern_contributions
+from .config import (
+    DATA_DIR_GENERATED, DATA_DIR_OUTPUT,
+    SEGMENTS_OUTPUT_FILE, CAMPAIGNS_FILE, RESULTS_FILE,
+    LEARNER_HALF_LIFE_CAMPAIGNS, LEARNER_SNAPSHOT_SECONDS
+)
+
+CAMPAIGN_COLUMNS = ['campaign_type', 'channel', 'value_theme']
+READ_BLOCK_SIZE = 8 * 1024 * 1024
+
+
+def follow_csv(path, poll_interval=1.0):
+    """
+    Yield the rows of a CSV file as DataFrames, then keep yielding rows appended to it, like tail -f.
+
+    Only complete lines are parsed, so a row still being written waits for the next poll.
+    When nothing new has arrived an empty frame is yielded every poll_interval seconds.
+    """
+    with open(path, 'rb') as f:
+        header = f.readline()
+        columns = header.decode().strip().split(',')
+        pending = b''
+        while True:
+            block = f.read(READ_BLOCK_SIZE)
+            if not block:
+                yield pd.DataFrame(columns=columns)
+                time.sleep(poll_interval)
+                continue
+
+            pending += block
+            end = pending.rfind(b'\n') + 1
+            if end:
+                yield pd.read_csv(io.BytesIO(header + pending[:end]))
+                pending = pending[end:]
+
+
+def read_csv_blocks(path, chunksize=1_000_000):
+    """Yield the rows of a CSV file once, chunksize rows at a time."""
+    yield from pd.read_csv(path, chunksize=chunksize)
+
+
+def request_snapshots_on(signum=signal.SIGUSR1):
+    """Handle signum by requesting a snapshot; returns a snapshot_requested callable for run()."""
+    requested = []
+    signal.signal(signum, lambda received, frame: requested.append(received))
+
+    def snapshot_requested():
+        pending = bool(requested)
+        requested.clear()
+        return pending
+
+    return snapshot_requested
+
+
+class OnlineSegmentLearner:
+    """
+    Streaming counterpart of derive_segment_attributes.
+
+    Holds exponentially decayed versions of the segment_patterns aggregates in NumPy arrays
+    indexed by segment position. Each new result for a segment scales that segment's earlier
+    weight by decay = 0.5 ** (1 / half_life), so recent campaigns dominate without a window.
+    A batch update gives the same state as feeding its rows one by one in arrival order.
+    """
+
+    def __init__(self, segments, campaigns, half_life=LEARNER_HALF_LIFE_CAMPAIGNS, campaigns_path=None):
+        self.segments = segments.reset_index(drop=True)
+        self.segment_index = pd.Index(self.segments['segment_id'])
+        self.campaigns = campaigns.set_index('campaign_id')[CAMPAIGN_COLUMNS]
+        self.campaigns_path = campaigns_path
+        self.decay = 0.5 ** (1 / half_life)
+
+        size = len(self.segments)
+        self.sums = {name: np.zeros(size) for name, *_ in PATTERN_MEANS}
+        self.weights = {name: np.zeros(size) for name, *_ in PATTERN_MEANS}
+        self.maxes = {name: np.full(size, np.nan) for name, _ in PATTERN_MAXES}
+        self.result_count = np.zeros(size, dtype=np.int64)
+        self.skipped = 0
+
+    @classmethod
+    def from_files(cls, segments_path=output_path(f'{DATA_DIR_OUTPUT}/{SEGMENTS_OUTPUT_FILE}'),
+                   campaigns_path=f'{DATA_DIR_GENERATED}/{CAMPAIGNS_FILE}', half_life=LEARNER_HALF_LIFE_CAMPAIGNS):
+        return cls(read_table(segments_path), pd.read_csv(campaigns_path), half_life, campaigns_path)
+
+    def _campaign_positions(self, campaign_ids):
+        positions = self.campaigns.index.get_indexer(campaign_ids)
+        if (positions < 0).any() and self.campaigns_path:
+            # Results can land for campaigns created after the learner started
+            self.campaigns = pd.read_csv(self.campaigns_path).set_index('campaign_id')[CAMPAIGN_COLUMNS]
+            positions = self.campaigns.index.get_indexer(campaign_ids)
+        return positions
+
+    def update(self, results):
+        """Fold a batch of campaign_id, segment_id, impressions, clicks, conversions rows into the averages."""
+        if results.empty:
+            return
+
+        campaign_pos = self._campaign_positions(results['campaign_id'])
+        segment_pos = self.segment_index.get_indexer(results['segment_id'])
+        matched = (campaign_pos >= 0) & (segment_pos >= 0)
+        self.skipped += int((~matched).sum())
+
+        # Group by segment, keeping arrival order within each segment
+        order = np.flatnonzero(matched)[np.argsort(segment_pos[matched], kind='stable')]
+        rows = segment_pos[order]
+        impressions = results['impressions'].to_numpy(dtype=float)[order]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            values = {
+                'engagement_rate': results['clicks'].to_numpy(dtype=float)[order] / impressions,
+                'conversion_rate': results['conversions'].to_numpy(dtype=float)[order] / impressions,
+            }
+        campaign_rows = campaign_pos[order]
+        for column in CAMPAIGN_COLUMNS:
+            values[column] = self.campaigns[column].to_numpy()[campaign_rows]
+
+        position = np.arange(len(rows))
+        is_start = np.diff(rows, prepend=-1) != 0
+        starts = np.flatnonzero(is_start)
+        group_size = np.diff(np.append(starts, len(rows)))
+        group_end = np.repeat(starts + group_size, group_size)
+
+        # A row is decayed once for every later row of its segment in this batch, and the
+        # segment's earlier state once for every row of the batch
+        weight = self.decay ** (group_end - position - 1)
+        touched = rows[starts]
+        carry = self.decay ** group_size
+        size = len(self.segments)
+
+        for name, value_column, filter_column, filter_value in PATTERN_MEANS:
+            sums, counts = pattern_contributions(values, value_column, filter_column, filter_value)
+            self.sums[name][touched] *= carry
+            self.weights[name][touched] *= carry
+            self.sums[name] += np.bincount(rows, weights=sums * weight, minlength=size)
+            self.weights[name] += np.bincount(rows, weights=counts * weight, minlength=size)
+
+        engagement = values['engagement_rate']
+        for name, channel_name in PATTERN_MAXES:
+            self.maxes[name][touched] *= carry
+            np.fmax.at(self.maxes[name], rows, np.where(values['channel'] == channel_name, engagement, 0.0) * weight)
+
+        self.result_count[touched] += group_size
+
+    def patterns(self):
+        """The decayed segment_patterns table, one row per segment."""
+        patterns = {'segment_id': self.segment_index}
+        for name, *_ in PATTERN_MEANS:
+            weights = self.weights[name]
+            with np.errstate(invalid='ignore', divide='ignore'):
+                patterns[name] = np.where(weights > 0, self.sums[name] / weights, np.nan)
+        for name, _ in PATTERN_MAXES:
+            patterns[name] = self.maxes[name]
+        patterns['campaign_count'] = self.result_count
+        return pd.DataFrame(patterns)[PATTERN_COLUMNS]
+
+    def snapshot(self, path=output_path(f'{DATA_DIR_OUTPUT}/{SEGMENTS_OUTPUT_FILE}')):
+        """Write the current attributes as the enriched segments table and return them."""
+        return export_learned_segments(learn_segment_attributes(self.segments, self.patterns()), path)
+
+    def run(self, batches, snapshot_every=LEARNER_SNAPSHOT_SECONDS,
+            path=output_path(f'{DATA_DIR_OUTPUT}/{SEGMENTS_OUTPUT_FILE}'), snapshot_requested=lambda: False):
+        """
+        Consume result batches, snapshotting every snapshot_every seconds, when snapshot_requested()
+        is true, and once more when batches end.
+        """
+        consumed = 0
+        start_time = last_snapshot = time.perf_counter()
+        for batch in batches:
+            self.update(batch)
+            consumed += len(batch)
+
+            now = time.perf_counter()
+            if len(batch):
+                print(f"  {consumed:,} results ({consumed / max(now - start_time, 1e-9):,.0f} rows/s)")
+            if now - last_snapshot >= snapshot_every or snapshot_requested():
+                self.snapshot(path)
+                last_snapshot = now
+        self.snapshot(path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Learn segment attributes online from streaming campaign results")
+    parser.add_argument('--results', default=f'{DATA_DIR_GENERATED}/{RESULTS_FILE}',
+                        help="Results CSV to consume; rows appended to it are picked up as they land")
+    parser.add_argument('--half-life', type=float, default=LEARNER_HALF_LIFE_CAMPAIGNS,
+                        help="Results per segment after which an earlier result's weight halves")
+    parser.add_argument('--snapshot-every', type=float, default=LEARNER_SNAPSHOT_SECONDS,
+                        help="Seconds between snapshots to the enriched segments CSV")
+    parser.add_argument('--once', action='store_true', help="Consume the file once and exit instead of following it")
+    args = parser.parse_args()
+
+    learner = OnlineSegmentLearner.from_files(half_life=args.half_life)
+
+    # kill -USR1 <pid> writes a snapshot without waiting for the interval
+    snapshot_requested = request_snapshots_on(signal.SIGUSR1)
+
+    batches = read_csv_blocks(args.results) if args.once else follow_csv(args.results)
+    try:
+        learner.run(batches, args.snapshot_every, snapshot_requested=snapshot_requested)
+    except KeyboardInterrupt:
+        learner.snapshot()
+    if learner.skipped:
+        print(f"Skipped {learner.skipped:,} results for unknown campaigns or segments")
@@ -1,54 +1,40 @@
-import swat
-import requests
-import os
-from dotenv import load_dotenv
 import pandas as pd
-
-load_dotenv()
+from .session import connect_cas
+from .table_loader import load_csv_table, fetch_table, export_tables, clear_table_cache
+from .table_io import output_path
+from .scheduler import run_analyses
+from .rollup_cube import CUBE_DIMENSIONS, AttributeCube, grouping_set_key, cube_mean, cube_std
 
 
 class AdvancedCampaignAnalytics:
-    def __init__(self):
-        self.conn = None
-        self._connect()
+    # Analysis: (tables it reads, tables it creates), scheduled by run_analyses; attribute_cube
+    # comes from AttributeCube
+    ANALYSES = {
+        'analyze_segment_consistency': (['campaign_metrics'], ['segment_consistency']),
+        'analyze_attribute_effectiveness': (['attribute_cube'], ['attribute_effectiveness']),
+        'analyze_interaction_effects': (['attribute_cube'], ['interaction_effects']),
+    }
+
+    # Exported table: what its rows count
+    EXPORTS = {
+        'segment_consistency': 'segments',
+        'attribute_effectiveness': 'configurations',
+        'interaction_effects': 'combinations',
+    }
+
+    def __init__(self, conn=None):
+        self.conn = conn
+        if self.conn is None:
+            self._connect()
 
     def _connect(self):
-        remote = os.getenv('VIYA_REMOTE', 'https://viya-i107icluw3.engage.sas.com')
-        hostname = os.getenv('VIYA_HOSTNAME')
-        client_id = os.getenv('VIYA_CLIENT_ID')
-        client_secret = os.getenv('VIYA_CLIENT_SECRET')
-
-        if not all([hostname, client_id, client_secret]):
-            raise ValueError("Missing required environment variables: VIYA_HOSTNAME, VIYA_CLIENT_ID, VIYA_CLIENT_SECRET")
-
-        print("Authenticating with Viya...")
-        response = requests.post(
-            f'{remote}/SASLogon/oauth/token',
-            data='grant_type=client_credentials',
-            headers={'Content-Type': 'application/x-www-form-urlencoded'},
-            auth=(client_id, client_secret)
-        )
-
-        if not response.ok:
-            raise ConnectionError(f"Auth failed: {response.text}")
-
-        token = response.json()['access_token']
-        print("✓ Authenticated")
-
-        cas_url = f"https://{hostname}/cas-shared-default-http/"
-        print(f"Connecting to CAS: {cas_url}")
-        self.conn = swat.CAS(cas_url, password=token, ssl_ca_list=False)
-        self.conn.loadactionset('fedsql')
-        print(f"✓ Connected. Session: {self.conn.sessionid}\n")
+        self.conn = connect_cas(('fedsql',))
 
     def load_data(self):
         print("Loading data into CAS...")
-        self.conn.read_csv('data/output/campaign_metrics.csv',
-                          casout={'name': 'campaign_metrics', 'replace': True})
-        self.conn.read_csv('data/generated/campaigns.csv',
-                          casout={'name': 'campaigns', 'replace': True})
-        self.conn.read_csv('data/output/user_segments_enriched.csv',
-                          casout={'name': 'segments', 'replace': True})
+        load_csv_table(self.conn, output_path('data/output/campaign_metrics.csv'), 'campaign_metrics')
+        load_csv_table(self.conn, 'data/generated/campaigns.csv', 'campaigns')
+        load_csv_table(self.conn, output_path('data/output/user_segments_enriched.csv'), 'segments')
         print("Data loaded\n")
 
     def analyze_segment_consistency(self):
@@ -72,95 +58,76 @@ class AdvancedCampaignAnalytics:
 
     def analyze_attribute_effectiveness(self):
         print("Analyzing campaign attribute effectiveness...")
-        self.conn.fedsql.execdirect(query='''
+        self.conn.fedsql.execdirect(query=f'''
             CREATE TABLE attribute_effectiveness AS
             SELECT
-                c.campaign_type,
-                c.channel,
-                c.message_sentiment,
-                c.value_theme,
-                COUNT(*) AS segment_count,
-                AVG(m.conversion_rate) AS avg_conversion,
-                AVG(m.engagement_rate) AS avg_engagement,
-                AVG(m.sales_vs_benchmark) AS avg_vs_benchmark,
-                STDDEV(m.conversion_rate) AS conversion_std,
-                STDDEV(m.conversion_rate) / SQRT(COUNT(*)) AS std_error
-            FROM campaign_metrics m
-            JOIN campaigns c ON m.campaign_id = c.campaign_id
-            GROUP BY c.campaign_type, c.channel, c.message_sentiment, c.value_theme
+                campaign_type,
+                channel,
+                message_sentiment,
+                value_theme,
+                row_count AS segment_count,
+                {cube_mean('conversion')} AS avg_conversion,
+                {cube_mean('engagement')} AS avg_engagement,
+                {cube_mean('vs_benchmark')} AS avg_vs_benchmark,
+                {cube_std('conversion')} AS conversion_std,
+                {cube_std('conversion')} / SQRT(row_count) AS std_error
+            FROM attribute_cube
+            WHERE grouping_set = '{grouping_set_key(*CUBE_DIMENSIONS)}'
         ''')
         print("Attribute effectiveness analyzed\n")
 
     def analyze_interaction_effects(self):
         print("Analyzing interaction effects...")
 
-        self.conn.fedsql.execdirect(query='''
-            CREATE TABLE campaign_type_baseline AS
-            SELECT
-                c.campaign_type,
-                AVG(m.conversion_rate) AS type_avg_conversion
-            FROM campaign_metrics m
-            JOIN campaigns c ON m.campaign_id = c.campaign_id
-            GROUP BY c.campaign_type
-        ''')
-
-        self.conn.fedsql.execdirect(query='''
-            CREATE TABLE channel_baseline AS
-            SELECT
-                c.channel,
-                AVG(m.conversion_rate) AS channel_avg_conversion
-            FROM campaign_metrics m
-            JOIN campaigns c ON m.campaign_id = c.campaign_id
-            GROUP BY c.channel
-        ''')
-
-        self.conn.fedsql.execdirect(query='''
+        self.conn.fedsql.execdirect(query=f'''
             CREATE TABLE interaction_effects AS
             SELECT
-                c.campaign_type,
-                c.channel,
-                COUNT(*) AS sample_size,
-                AVG(m.conversion_rate) AS actual_conversion,
-                AVG(m.engagement_rate) AS actual_engagement,
+                i.campaign_type,
+                i.channel,
+                i.sample_size,
+                i.actual_conversion,
+                i.actual_engagement,
                 tb.type_avg_conversion,
                 cb.channel_avg_conversion,
                 (tb.type_avg_conversion + cb.channel_avg_conversion) / 2 AS expected_conversion,
-                AVG(m.conversion_rate) - ((tb.type_avg_conversion + cb.channel_avg_conversion) / 2) AS interaction_lift,
-                (AVG(m.conversion_rate) - ((tb.type_avg_conversion + cb.channel_avg_conversion) / 2)) /
+                i.actual_conversion - ((tb.type_avg_conversion + cb.channel_avg_conversion) / 2) AS interaction_lift,
+                (i.actual_conversion - ((tb.type_avg_conversion + cb.channel_avg_conversion) / 2)) /
                     NULLIF(((tb.type_avg_conversion + cb.channel_avg_conversion) / 2), 0) * 100 AS interaction_lift_pct
-            FROM campaign_metrics m
-            JOIN campaigns c ON m.campaign_id = c.campaign_id
-            JOIN campaign_type_baseline tb ON c.campaign_type = tb.campaign_type
-            JOIN channel_baseline cb ON c.channel = cb.channel
-            GROUP BY c.campaign_type, c.channel, tb.type_avg_conversion, cb.channel_avg_conversion
+            FROM (
+                SELECT campaign_type, channel, row_count AS sample_size,
+                       {cube_mean('conversion')} AS actual_conversion,
+                       {cube_mean('engagement')} AS actual_engagement
+                FROM attribute_cube
+                WHERE grouping_set = '{grouping_set_key('campaign_type', 'channel')}'
+            ) i
+            JOIN (
+                SELECT campaign_type, {cube_mean('conversion')} AS type_avg_conversion
+                FROM attribute_cube
+                WHERE grouping_set = '{grouping_set_key('campaign_type')}'
+            ) tb ON i.campaign_type = tb.campaign_type
+            JOIN (
+                SELECT channel, {cube_mean('conversion')} AS channel_avg_conversion
+                FROM attribute_cube
+                WHERE grouping_set = '{grouping_set_key('channel')}'
+            ) cb ON i.channel = cb.channel
         ''')
         print("Interaction effects analyzed\n")
 
-    def export_results(self):
+    def export_results(self, outputs=None):
         print("Exporting Phase 1 results...")
 
-        consistency = self.conn.CASTable('segment_consistency').to_frame()
-        consistency.columns = consistency.columns.str.lower()
-        consistency.to_csv('data/output/segment_consistency.csv', index=False)
-        print(f"✓ Exported segment_consistency.csv ({len(consistency)} segments)")
-
-        effectiveness = self.conn.CASTable('attribute_effectiveness').to_frame()
-        effectiveness.columns = effectiveness.columns.str.lower()
-        effectiveness.to_csv('data/output/attribute_effectiveness.csv', index=False)
-        print(f"✓ Exported attribute_effectiveness.csv ({len(effectiveness)} configurations)")
-
-        interactions = self.conn.CASTable('interaction_effects').to_frame()
-        interactions.columns = interactions.columns.str.lower()
-        interactions.to_csv('data/output/interaction_effects.csv', index=False)
-        print(f"✓ Exported interaction_effects.csv ({len(interactions)} combinations)\n")
+        tables = [table for table in self.EXPORTS if outputs is None or table in outputs]
+        rows = export_tables(self.conn, {table: output_path(f'data/output/{table}.csv') for table in tables})
+        for table in tables:
+            print(f"✓ Exported {table} ({rows[table]} {self.EXPORTS[table]})")
+        print()
 
     def print_insights(self):
         print("=" * 60)
         print("PHASE 1 INSIGHTS")
         print("=" * 60)
 
-        consistency = self.conn.CASTable('segment_consistency').to_frame()
-        consistency.columns = consistency.columns.str.lower()
+        consistency = fetch_table(self.conn, 'segment_consistency')
 
         print("\n1. SEGMENT CONSISTENCY:")
         print(f"   High consistency (>0.7): {len(consistency[consistency['consistency_score'] > 0.7])} segments")
@@ -170,8 +137,7 @@ class AdvancedCampaignAnalytics:
         for _, row in top_consistent.iterrows():
             print(f"   - Segment {int(row['segment_id'])}: {row['consistency_score']:.2f} consistency, {row['avg_conversion']:.2%} avg conversion")
 
-        effectiveness = self.conn.CASTable('attribute_effectiveness').to_frame()
-        effectiveness.columns = effectiveness.columns.str.lower()
+        effectiveness = fetch_table(self.conn, 'attribute_effectiveness')
 
         print("\n2. BEST PERFORMING CONFIGURATIONS:")
         top_configs = effectiveness.nlargest(3, 'avg_conversion')
@@ -179,8 +145,7 @@ class AdvancedCampaignAnalytics:
             print(f"   - {row['campaign_type']}/{row['channel']}/{row['message_sentiment']}/{row['value_theme']}")
             print(f"     Conversion: {row['avg_conversion']:.2%}, Engagement: {row['avg_engagement']:.2%}, vs Benchmark: {row['avg_vs_benchmark']:.2f}x")
 
-        interactions = self.conn.CASTable('interaction_effects').to_frame()
-        interactions.columns = interactions.columns.str.lower()
+        interactions = fetch_table(self.conn, 'interaction_effects')
 
         print("\n3. STRONGEST INTERACTION EFFECTS:")
         top_interactions = interactions.nlargest(3, 'interaction_lift_pct')
@@ -191,6 +156,7 @@ class AdvancedCampaignAnalytics:
         print("\n" + "=" * 60)
 
     def close(self):
+        clear_table_cache(self.conn)
         self.conn.close()
 
 
@@ -198,9 +164,7 @@ if __name__ == "__main__":
     try:
         analytics = AdvancedCampaignAnalytics()
         analytics.load_data()
-        analytics.analyze_segment_consistency()
-        analytics.analyze_attribute_effectiveness()
-        analytics.analyze_interaction_effects()
+        run_analyses([AttributeCube(analytics.conn), analytics])
         analytics.export_results()
         analytics.print_insights()
         analytics.close()
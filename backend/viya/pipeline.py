@@ -0,0 +1,139 @@
+import argparse
+import time
+from .config import DATA_DIR_OUTPUT, SEGMENTS_OUTPUT_FILE, METRICS_FILE
+from .session import connect_cas
+from .table_io import output_path
+from .table_loader import drop_table, publish_table, clear_table_cache
+from .scheduler import run_analyses
+from .rollup_cube import AttributeCube
+from .core_campaign_metrics import ViyaCampaignAnalytics
+from .pattern_detection import AdvancedCampaignAnalytics
+from .cross_campaign_analysis import CrossCampaignAnalytics
+from .predictive_analytics import PredictiveAnalytics
+
+PHASES = ['core', 'cube', 'patterns', 'cross', 'predictive']
+
+
+def _run_core(conn):
+    analytics = ViyaCampaignAnalytics(conn=conn)
+    analytics.load_data()
+    analytics.calculate_metrics()
+    analytics.build_campaign_metrics()
+    analytics.derive_segment_attributes()
+    learned = analytics.export_segments()
+    analytics.export_campaign_metrics()
+
+    # Later phases read the exported metrics and learned segments; publish them in-session instead,
+    # labelled with the exported files' hashes so standalone phase runs can reuse them too
+    print("Publishing core outputs for later phases...")
+    drop_table(conn, 'campaign_metrics')
+    conn.fedsql.execdirect(query='''
+        CREATE TABLE campaign_metrics AS
+        SELECT * FROM campaign_segment_metrics
+    ''')
+    publish_table(conn, 'campaign_metrics', output_path(f'{DATA_DIR_OUTPUT}/{METRICS_FILE}'))
+
+    drop_table(conn, 'segments')
+    conn.upload_frame(learned, casout={'name': 'segments', 'replace': True})
+    publish_table(conn, 'segments', output_path(f'{DATA_DIR_OUTPUT}/{SEGMENTS_OUTPUT_FILE}'))
+    print("✓ campaign_metrics and segments resident\n")
+
+
+def _run_cube(conn):
+    # Built once here for both the patterns and cross phases, which read it from the session
+    run_analyses([AttributeCube(conn)])
+
+
+def _run_patterns(conn):
+    analytics = AdvancedCampaignAnalytics(conn=conn)
+    run_analyses([analytics])
+    analytics.export_results()
+    analytics.print_insights()
+
+
+def _run_cross(conn):
+    analytics = CrossCampaignAnalytics(conn=conn)
+    run_analyses([analytics])
+    analytics.export_results()
+    analytics.print_insights()
+
+
+def _run_predictive(conn):
+    analytics = PredictiveAnalytics(conn=conn)
+    run_analyses([analytics])
+    analytics.export_results()
+    analytics.print_insights()
+
+
+def _run_outputs(conn, outputs):
+    """Run only the analyses the requested outputs depend on, across all phases, and export those outputs."""
+    analytics = [AdvancedCampaignAnalytics(conn=conn), CrossCampaignAnalytics(conn=conn), PredictiveAnalytics(conn=conn)]
+    run_analyses([AttributeCube(conn)] + analytics, outputs)
+    for instance in analytics:
+        produced = {table for _, tables in instance.ANALYSES.values() for table in tables}
+        requested = [output for output in outputs if output in produced]
+        if requested:
+            instance.export_results(requested)
+
+
+PHASE_RUNNERS = {
+    'core': _run_core,
+    'cube': _run_cube,
+    'patterns': _run_patterns,
+    'cross': _run_cross,
+    'predictive': _run_predictive,
+}
+
+
+def run_pipeline(conn=None, outputs=None):
+    """
+    Run the analytics phases in order on one CAS session.
+
+    The core phase loads the CSV inputs once; later phases reuse the tables it left
+    in the session rather than re-uploading exported CSVs. With outputs, the core phase
+    is followed only by the analyses those outputs depend on. Returns seconds per phase.
+    """
+    if conn is None:
+        conn = connect_cas()
+
+    timings = {}
+    if outputs:
+        runners = {'core': _run_core, 'outputs': lambda conn: _run_outputs(conn, outputs)}
+    else:
+        runners = {phase: PHASE_RUNNERS[phase] for phase in PHASES}
+    try:
+        for phase, runner in runners.items():
+            start_time = time.perf_counter()
+            runner(conn)
+            timings[phase] = time.perf_counter() - start_time
+    finally:
+        clear_table_cache(conn)
+        conn.close()
+
+    print("\nPhase timings:")
+    for phase, seconds in timings.items():
+        print(f"  {phase:<12} {seconds:8.2f}s")
+    return timings
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run all analytics phases on a single CAS session")
+    parser.add_argument('--sqlite', action='store_true',
+                        help="Run against the embedded SQLite stand-in instead of SAS Viya")
+    parser.add_argument('--outputs', nargs='+', metavar='TABLE',
+                        help="Only materialize and export these outputs, e.g. segment_clusters")
+    args = parser.parse_args()
+
+    try:
+        conn = None
+        if args.sqlite:
+            from .sqlite_cas import SQLiteCASConnection
+            conn = SQLiteCASConnection()
+        run_pipeline(conn, args.outputs)
+        print("\nPipeline Complete")
+    except Exception as e:
+        print(f"Error: {e}")
+        import traceback
+        traceback.print_exc()
+        if not args.sqlite:
+            print("\nSet env vars: VIYA_HOSTNAME, VIYA_CLIENT_ID, VIYA_CLIENT_SECRET")
@@ -1,55 +1,36 @@
-import swat
-import requests
-import os
-from dotenv import load_dotenv
 import pandas as pd
 import numpy as np
-
-load_dotenv()
+from .session import connect_cas
+from .table_loader import load_csv_table, fetch_table, clear_table_cache
+from .table_io import output_path, write_table
+from .scheduler import run_analyses
 
 
 class PredictiveAnalytics:
-    def __init__(self):
-        self.conn = None
-        self._connect()
+    # Analysis: (tables it reads, tables it creates), scheduled by run_analyses
+    ANALYSES = {
+        'prepare_model_features': (['campaign_metrics', 'campaigns', 'segments'], ['model_features']),
+        'train_prediction_model': (['model_features'], ['predictions']),
+        'prepare_clustering_features': (['campaign_metrics', 'campaigns'], ['clustering_features']),
+        'perform_clustering': (['clustering_features'], ['segment_clusters']),
+    }
+
+    # Analyses fitted client-side; their outputs are kept on the instance rather than in CAS
+    CLIENT_ANALYSES = {'train_prediction_model', 'perform_clustering'}
+
+    def __init__(self, conn=None):
+        self.conn = conn
+        if self.conn is None:
+            self._connect()
 
     def _connect(self):
-        remote = os.getenv('VIYA_REMOTE', 'https://viya-i107icluw3.engage.sas.com')
-        hostname = os.getenv('VIYA_HOSTNAME')
-        client_id = os.getenv('VIYA_CLIENT_ID')
-        client_secret = os.getenv('VIYA_CLIENT_SECRET')
-
-        if not all([hostname, client_id, client_secret]):
-            raise ValueError("Missing required environment variables: VIYA_HOSTNAME, VIYA_CLIENT_ID, VIYA_CLIENT_SECRET")
-
-        print("Authenticating with Viya...")
-        response = requests.post(
-            f'{remote}/SASLogon/oauth/token',
-            data='grant_type=client_credentials',
-            headers={'Content-Type': 'application/x-www-form-urlencoded'},
-            auth=(client_id, client_secret)
-        )
-
-        if not response.ok:
-            raise ConnectionError(f"Auth failed: {response.text}")
-
-        token = response.json()['access_token']
-        print("✓ Authenticated")
-
-        cas_url = f"https://{hostname}/cas-shared-default-http/"
-        print(f"Connecting to CAS: {cas_url}")
-        self.conn = swat.CAS(cas_url, password=token, ssl_ca_list=False)
-        self.conn.loadactionset('fedsql')
-        print(f"✓ Connected. Session: {self.conn.sessionid}\n")
+        self.conn = connect_cas(('fedsql',))
 
     def load_data(self):
         print("Loading data into CAS...")
-        self.conn.read_csv('data/output/campaign_metrics.csv',
-                          casout={'name': 'campaign_metrics', 'replace': True})
-        self.conn.read_csv('data/generated/campaigns.csv',
-                          casout={'name': 'campaigns', 'replace': True})
-        self.conn.read_csv('data/output/user_segments_enriched.csv',
-                          casout={'name': 'segments', 'replace': True})
+        load_csv_table(self.conn, output_path('data/output/campaign_metrics.csv'), 'campaign_metrics')
+        load_csv_table(self.conn, 'data/generated/campaigns.csv', 'campaigns')
+        load_csv_table(self.conn, output_path('data/output/user_segments_enriched.csv'), 'segments')
         print("Data loaded\n")
 
     def prepare_model_features(self):
@@ -93,9 +74,6 @@ class PredictiveAnalytics:
     def train_prediction_model(self):
         print("Training conversion prediction model...")
 
-        data = self.conn.CASTable('model_features').to_frame()
-        data.columns = data.columns.str.lower()
-
         from sklearn.ensemble import GradientBoostingRegressor
         from sklearn.model_selection import train_test_split
         from sklearn.preprocessing import LabelEncoder
@@ -107,6 +85,9 @@ class PredictiveAnalytics:
 
         categorical_cols = ['campaign_type', 'channel', 'message_sentiment', 'value_theme']
 
+        data = fetch_table(self.conn, 'model_features',
+                           ['segment_id', 'campaign_id', 'target'] + feature_cols + categorical_cols)
+
         X = data[feature_cols].copy()
         for col in categorical_cols:
             le = LabelEncoder()
@@ -170,14 +151,13 @@ class PredictiveAnalytics:
         from sklearn.cluster import KMeans
         from sklearn.preprocessing import StandardScaler
 
-        data = self.conn.CASTable('clustering_features').to_frame()
-        data.columns = data.columns.str.lower()
-
         feature_cols = ['edu_affinity', 'premium_affinity', 'discount_affinity',
                        'email_preference', 'push_preference', 'inapp_preference',
                        'family_resonance', 'eco_resonance', 'convenience_resonance',
                        'quality_resonance', 'response_volatility', 'overall_engagement']
 
+        data = fetch_table(self.conn, 'clustering_features', ['segment_id'] + feature_cols)
+
         X = data[feature_cols].fillna(data[feature_cols].mean())
 
         scaler = StandardScaler()
@@ -197,9 +177,15 @@ class PredictiveAnalytics:
 
         print("Clustering complete\n")
 
-    def export_results(self):
+    def export_results(self, outputs=None):
         print("Exporting Phase 3 results...")
+        if outputs is None or 'predictions' in outputs:
+            self._export_model_results()
+        if outputs is None or 'segment_clusters' in outputs:
+            self._export_cluster_results()
+        print()
 
+    def _export_model_results(self):
         from sklearn.metrics import r2_score, mean_squared_error, mean_absolute_error
         r2 = r2_score(self.test_actual, self.test_predicted)
         rmse = np.sqrt(mean_squared_error(self.test_actual, self.test_predicted))
@@ -214,8 +200,8 @@ class PredictiveAnalytics:
             'actual_conversion', 'error', 'price_sensitivity', 'channel_match_score'
         ]].sort_values('predicted_conversion', ascending=False)
 
-        predictions_export.to_csv('data/output/predictions.csv', index=False)
-        print(f"✓ Exported predictions.csv ({len(predictions_export)} predictions)")
+        write_table(predictions_export, output_path('data/output/predictions.csv'))
+        print(f"✓ Exported predictions ({len(predictions_export)} predictions)")
 
         sorted_importance = sorted(self.feature_importance.items(), key=lambda x: x[1], reverse=True)
 
@@ -244,9 +230,11 @@ class PredictiveAnalytics:
                 'rank': str(idx + 1)
             }])], ignore_index=True)
 
-        model_summary.to_csv('data/output/model_summary.csv', index=False)
-        print(f"✓ Exported model_summary.csv")
+        write_table(model_summary, output_path('data/output/model_summary.csv'))
+        print(f"✓ Exported model_summary")
+        self.model_summary = model_summary
 
+    def _export_cluster_results(self):
         clusters = self.cluster_assignments.copy()
 
         cluster_names = {
@@ -276,8 +264,8 @@ class PredictiveAnalytics:
             'recommended_campaign_type', 'recommended_channel', 'recommended_theme', 'expected_conversion'
         ]]
 
-        segment_clusters.to_csv('data/output/segment_clusters.csv', index=False)
-        print(f"✓ Exported segment_clusters.csv ({len(segment_clusters)} segments)")
+        write_table(segment_clusters, output_path('data/output/segment_clusters.csv'))
+        print(f"✓ Exported segment_clusters ({len(segment_clusters)} segments)")
 
         profiles = self.cluster_profiles.copy()
         profiles['cluster_name'] = profiles['cluster_id'].map(cluster_names)
@@ -292,15 +280,16 @@ class PredictiveAnalytics:
             'top_campaign_type', 'top_channel', 'top_value'
         ]]
 
-        profiles_export.to_csv('data/output/cluster_profiles.csv', index=False)
-        print(f"✓ Exported cluster_profiles.csv ({len(profiles_export)} clusters)\n")
+        write_table(profiles_export, output_path('data/output/cluster_profiles.csv'))
+        print(f"✓ Exported cluster_profiles ({len(profiles_export)} clusters)")
+        self.profiles = profiles_export
 
     def print_insights(self):
         print("=" * 60)
         print("PHASE 3 INSIGHTS - Predictive Analytics")
         print("=" * 60)
 
-        model_summary = pd.read_csv('data/output/model_summary.csv')
+        model_summary = self.model_summary
         perf = model_summary[model_summary['section'] == 'performance']
 
         print("\n1. PREDICTION MODEL PERFORMANCE:")
@@ -319,8 +308,7 @@ class PredictiveAnalytics:
         for _, row in opportunities.iterrows():
             print(f"   {row['metric']}: {float(row['value']):.2%} predicted conversion")
 
-        clusters = pd.read_csv('data/output/segment_clusters.csv')
-        profiles = pd.read_csv('data/output/cluster_profiles.csv')
+        profiles = self.profiles
 
         print("\n4. BEHAVIORAL CLUSTERS:")
         for _, cluster in profiles.iterrows():
@@ -331,6 +319,7 @@ class PredictiveAnalytics:
         print("\n" + "=" * 60)
 
     def close(self):
+        clear_table_cache(self.conn)
         self.conn.close()
 
 
@@ -338,10 +327,7 @@ if __name__ == "__main__":
     try:
         analytics = PredictiveAnalytics()
         analytics.load_data()
-        analytics.prepare_model_features()
-        analytics.train_prediction_model()
-        analytics.prepare_clustering_features()
-        analytics.perform_clustering()
+        run_analyses([analytics])
         analytics.export_results()
         analytics.print_insights()
         analytics.close()
@@ -1,6 +1,29 @@
 import pandas as pd
+import numpy as np
+import hashlib
 import json
 import os
+import textwrap
+
+from .config import SEGMENTS_OUTPUT_FILE
+from .generate_prompt import (
+    SCORE_CATEGORY_INDEX, VALUE_DRIVERS, VALUE_NAMES, PROMPT_BLOCK_KEYS, PROMPT_BLOCK_TABLE
+)
+from .table_io import output_path, read_table, iter_table
+
+VALUE_COLUMNS = ['values_family', 'values_eco_conscious', 'values_convenience', 'values_quality']
+CHANNELS = ['push_notification', 'in_app_message']
+PLAN_COLUMNS = ['channel', 'timing', 'block', 'primary_value', 'secondary_value']
+
+# Every scored segment is one cell of this grid; timings are clipped to 1-14 days, hence 15 slots
+PLAN_SHAPE = (len(CHANNELS), 15, len(PROMPT_BLOCK_KEYS), len(VALUE_DRIVERS), len(VALUE_DRIVERS))
+SEGMENT_CHUNK_SIZE = 100_000
+
+
+def prompt_fingerprint(prompt):
+    # Content hash over canonical JSON, so the same prompt gets the same id across runs
+    canonical = json.dumps(prompt, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()[:16]
 
 
 class GeminiPromptGenerator:
@@ -14,11 +37,17 @@ class GeminiPromptGenerator:
         with open(prompt_blocks_path, 'r') as f:
             self.prompt_blocks = json.load(f)
 
+    def _segments_path(self):
+        return output_path(f'{self.output_dir}/{SEGMENTS_OUTPUT_FILE}')
+
     def load_segments(self):
         print("\nLoading segment data...")
-        self.segments = pd.read_csv(f'{self.output_dir}/user_segments_enriched.csv')
+        self.segments = read_table(self._segments_path())
         print(f"Loaded {len(self.segments)} segments")
 
+    def iter_segments(self, chunksize=SEGMENT_CHUNK_SIZE):
+        return iter_table(self._segments_path(), chunksize)
+
     def _categorize_score(self, score):
         if score > 0.6:
             return "high"
@@ -52,56 +81,157 @@ class GeminiPromptGenerator:
         timing = max(1, min(14, int(base_interval / max(frequency_tolerance, 0.2))))
         return timing
 
-    def _find_best_prompt_block(self, segment):
-        price_cat = self._categorize_score(segment['price_sensitivity'])
-        loyalty_cat = self._categorize_score(segment['brand_loyalty'])
-        engagement_cat = self._categorize_score(segment['engagement_propensity'])
-        primary_value, _ = self._rank_value_drivers(segment)
-
-        blocks = self.prompt_blocks["behavioral_combinations"]
-
-        if price_cat == "high" and primary_value == "family_orientation":
-            return blocks["price_driven_family_focused"]
-
-        elif loyalty_cat == "high" and primary_value == "quality_focus":
-            return blocks["quality_focused_loyal"]
-
-        elif engagement_cat == "low" and primary_value == "convenience_preference":
-            return blocks["convenience_seeker_low_engagement"]
-
-        elif engagement_cat == "high" and primary_value == "eco_consciousness":
-            return blocks["eco_conscious_engaged"]
-
-        elif price_cat == "high" and primary_value == "convenience_preference":
-            return blocks["price_driven_convenience_seeker"]
-
-        elif loyalty_cat == "high" and primary_value == "eco_consciousness":
-            return blocks["quality_focused_eco_conscious"]
+    def _find_best_prompt_block_key(self, segment):
+        values = [segment['values_family'], segment['values_eco_conscious'],
+                  segment['values_convenience'], segment['values_quality']]
 
-        elif engagement_cat == "high" and primary_value == "family_orientation":
-            return blocks["engaged_family_focused"]
+        index = PROMPT_BLOCK_TABLE[
+            SCORE_CATEGORY_INDEX[self._categorize_score(segment['price_sensitivity'])],
+            SCORE_CATEGORY_INDEX[self._categorize_score(segment['brand_loyalty'])],
+            SCORE_CATEGORY_INDEX[self._categorize_score(segment['engagement_propensity'])],
+            values.index(max(values))
+        ]
+        return PROMPT_BLOCK_KEYS[index]
 
-        elif engagement_cat == "low" and primary_value == "quality_focus":
-            return blocks["low_engagement_quality_seeker"]
-
-        elif price_cat == "medium" and engagement_cat == "medium":
-            return blocks["balanced_moderate"]
+    def _find_best_prompt_block(self, segment):
+        return self.prompt_blocks["behavioral_combinations"][self._find_best_prompt_block_key(segment)]
+
+    def _categorize_scores(self, scores):
+        return np.where(scores > 0.6, 2, np.where(scores < 0.4, 0, 1))
+
+    def score_segments(self, segments):
+        """
+        Columnar equivalent of generate_prompt for a whole frame.
+
+        Returns one row per segment holding indices into CHANNELS, PROMPT_BLOCK_KEYS and
+        VALUE_DRIVERS plus the timing in days; prompts are only materialized at write time.
+        """
+        values = segments[VALUE_COLUMNS].to_numpy(dtype=float)
+        # Stable sort on negated scores keeps _rank_value_drivers' tie-breaking (first driver wins)
+        ranked = np.argsort(-values, axis=1, kind='stable')
+
+        push = segments['channel_perf_push'].to_numpy(dtype=float)
+        inapp = segments['channel_perf_inapp'].to_numpy(dtype=float)
+        tolerance = segments['contact_frequency_tolerance'].to_numpy(dtype=float)
+
+        return pd.DataFrame({
+            'channel': np.where(push > inapp, 0, 1),
+            'timing': np.clip((7 / np.maximum(tolerance, 0.2)).astype(np.int64), 1, 14),
+            'block': PROMPT_BLOCK_TABLE[
+                self._categorize_scores(segments['price_sensitivity'].to_numpy(dtype=float)),
+                self._categorize_scores(segments['brand_loyalty'].to_numpy(dtype=float)),
+                self._categorize_scores(segments['engagement_propensity'].to_numpy(dtype=float)),
+                ranked[:, 0]
+            ],
+            'primary_value': ranked[:, 0],
+            'secondary_value': ranked[:, 1],
+        }, index=segments.index)
+
+    def _plan_keys(self, plan):
+        # Pack each plan row into one integer so identical prompts share a key
+        return np.ravel_multi_index(tuple(plan[column].to_numpy() for column in PLAN_COLUMNS), PLAN_SHAPE)
+
+    def _prompt_for_key(self, key):
+        channel, timing, block, primary_value, secondary_value = np.unravel_index(key, PLAN_SHAPE)
+        return self._build_prompt(CHANNELS[channel], int(timing), PROMPT_BLOCK_KEYS[block],
+                                  VALUE_DRIVERS[primary_value], VALUE_DRIVERS[secondary_value])
+
+    def _score_chunks(self, chunks, totals):
+        # Yields (chunk, plan keys) while keeping running channel/timing counters in totals
+        for chunk in chunks:
+            plan = self.score_segments(chunk)
+            totals['channel'] += np.bincount(plan['channel'], minlength=PLAN_SHAPE[0])
+            totals['timing'] += np.bincount(plan['timing'], minlength=PLAN_SHAPE[1])
+            totals['count'] += len(plan)
+            yield chunk, self._plan_keys(plan)
+
+    def _new_totals(self):
+        return {
+            'count': 0,
+            'channel': np.zeros(PLAN_SHAPE[0], dtype=np.int64),
+            'timing': np.zeros(PLAN_SHAPE[1], dtype=np.int64),
+        }
 
-        else:
-            return blocks["default_balanced"]
+    def write_prompts(self, chunks, output_path, output_format='ndjson'):
+        """
+        Score and write prompts chunk by chunk, flushing after each chunk.
+
+        'ndjson' writes one compact {"segment_id", ...prompt} object per line; 'json' writes the
+        indented array format. Returns the running prompt count and channel/timing counters.
+        """
+        rendered = {}
+        totals = self._new_totals()
+        written = 0
+
+        with open(output_path, 'w') as f:
+            if output_format == 'json':
+                f.write('[')
+
+            for chunk, keys in self._score_chunks(chunks, totals):
+                # Each distinct prompt is serialized once per run, not once per segment
+                for key in np.unique(keys):
+                    if key not in rendered:
+                        prompt = self._prompt_for_key(key)
+                        if output_format == 'json':
+                            rendered[key] = textwrap.indent(json.dumps(prompt, indent=2), '  ')
+                        else:
+                            rendered[key] = json.dumps(prompt, separators=(',', ':'))
+
+                if output_format == 'json':
+                    if len(keys):
+                        f.write(',\n' if written else '\n')
+                        f.write(',\n'.join(rendered[key] for key in keys))
+                else:
+                    segment_ids = chunk['segment_id'].astype('int64')
+                    f.writelines(f'{{"segment_id":{segment_id},{rendered[key][1:]}\n'
+                                 for segment_id, key in zip(segment_ids, keys))
+                written += len(keys)
+                f.flush()
+
+            if output_format == 'json':
+                f.write('\n]' if written else ']')
+
+        return totals
+
+    def write_prompt_manifest(self, chunks, prompts_path, mapping_path):
+        """
+        Write each distinct prompt once, keyed by its content fingerprint, plus a
+        segment_id -> prompt_id mapping, so Gemini runs once per distinct prompt.
+        """
+        prompt_ids = {}
+        totals = self._new_totals()
+
+        with open(prompts_path, 'w') as prompts_file, open(mapping_path, 'w') as mapping_file:
+            mapping_file.write('segment_id,prompt_id\n')
+
+            for chunk, keys in self._score_chunks(chunks, totals):
+                for key in np.unique(keys):
+                    if key not in prompt_ids:
+                        prompt = self._prompt_for_key(key)
+                        prompt_ids[key] = prompt_fingerprint(prompt)
+                        prompts_file.write(json.dumps({"prompt_id": prompt_ids[key], **prompt},
+                                                      separators=(',', ':')) + '\n')
+
+                segment_ids = chunk['segment_id'].astype('int64')
+                mapping_file.writelines(f'{segment_id},{prompt_ids[key]}\n'
+                                        for segment_id, key in zip(segment_ids, keys))
+                prompts_file.flush()
+                mapping_file.flush()
+
+        totals['unique_prompts'] = len(prompt_ids)
+        return totals
 
     def generate_prompt(self, segment):
-        channel, constraints = self._select_channel(segment)
+        channel, _ = self._select_channel(segment)
         timing = self._calculate_timing(segment['contact_frequency_tolerance'])
-        prompt_block = self._find_best_prompt_block(segment)
+        block_key = self._find_best_prompt_block_key(segment)
         primary_value, secondary_value = self._rank_value_drivers(segment)
 
-        value_names = {
-            'family_orientation': 'family moments and bonding experiences',
-            'eco_consciousness': 'environmental impact and sustainability',
-            'convenience_preference': 'time-saving and easy solutions',
-            'quality_focus': 'premium quality and reliability'
-        }
+        return self._build_prompt(channel, timing, block_key, primary_value, secondary_value)
+
+    def _build_prompt(self, channel, timing, block_key, primary_value, secondary_value):
+        constraints = self.prompt_blocks["channel_constraints"][channel]
+        prompt_block = self.prompt_blocks["behavioral_combinations"][block_key]
 
         return {
             "delivery_settings": {
@@ -111,8 +241,8 @@ class GeminiPromptGenerator:
             },
             "audience_profile": {
                 "behavioral_summary": prompt_block["behavioral_summary"],
-                "primary_value_driver": value_names[primary_value],
-                "secondary_value_driver": value_names[secondary_value],
+                "primary_value_driver": VALUE_NAMES[primary_value],
+                "secondary_value_driver": VALUE_NAMES[secondary_value],
                 "motivational_triggers": prompt_block["motivational_triggers"]
             },
             "content_guidance": {
@@ -123,40 +253,49 @@ class GeminiPromptGenerator:
             }
         }
 
-    def run(self):
+    def run(self, output_format='ndjson', chunksize=SEGMENT_CHUNK_SIZE):
         print("=" * 60)
         print("PHASE 4: GEMINI PROMPT GENERATION")
         print("=" * 60)
 
         try:
-            self.load_segments()
-
             print("\nGenerating Gemini prompts for all segments...")
-            prompts = []
-
-            for _, segment in self.segments.iterrows():
-                prompt = self.generate_prompt(segment)
-                prompts.append(prompt)
-
-            output_path = f'{self.output_dir}/gemini_prompts.json'
-            with open(output_path, 'w') as f:
-                json.dump(prompts, f, indent=2)
-
-            print(f"\nSaved {len(prompts)} prompts to {output_path}")
-
-            channel_dist = pd.Series([p['delivery_settings']['channel'] for p in prompts])
+            if output_format == 'manifest':
+                totals = self.write_prompt_manifest(
+                    self.iter_segments(chunksize),
+                    f'{self.output_dir}/gemini_prompts_unique.ndjson',
+                    f'{self.output_dir}/gemini_prompt_segments.csv'
+                )
+                outputs = [
+                    f"gemini_prompts_unique.ndjson ({totals['unique_prompts']} unique prompts)",
+                    f"gemini_prompt_segments.csv ({totals['count']} segment -> prompt mappings)"
+                ]
+                print(f"\nSaved {totals['unique_prompts']} unique prompts for {totals['count']} segments "
+                      f"to {self.output_dir}")
+            else:
+                output_file = 'gemini_prompts.ndjson' if output_format == 'ndjson' else 'gemini_prompts.json'
+                output_path = f'{self.output_dir}/{output_file}'
+                totals = self.write_prompts(self.iter_segments(chunksize), output_path, output_format)
+                outputs = [f"{output_file} ({totals['count']} segment prompts)"]
+                print(f"\nSaved {totals['count']} prompts to {output_path}")
+
+            count = totals['count']
+            channel_dist = pd.Series(totals['channel'], index=pd.Index(CHANNELS, name='channel'), name='count')
             print(f"\nChannel distribution:")
-            print(channel_dist.value_counts())
+            print(channel_dist[channel_dist > 0].sort_values(ascending=False))
 
-            timing_dist = pd.Series([p['delivery_settings']['send_timing_days_from_today'] for p in prompts])
+            timing_dist = pd.Series(totals['timing'], name='count').rename_axis('days')
             print(f"\nTiming distribution (days from today):")
-            print(timing_dist.describe())
+            print(timing_dist[timing_dist > 0])
+            if count:
+                print(f"mean: {(timing_dist.index * timing_dist).sum() / count:.2f} days")
 
             print("\n" + "=" * 60)
             print("PHASE 4 COMPLETE")
             print("=" * 60)
             print("\nOutput ready for Gemini integration:")
-            print(f"  - gemini_prompts.json ({len(prompts)} segment prompts)")
+            for output in outputs:
+                print(f"  - {output}")
 
         except Exception as e:
             print(f"Error: {e}")
@@ -165,5 +304,15 @@ class GeminiPromptGenerator:
 
 
 if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Generate Gemini prompts for all enriched segments")
+    parser.add_argument('--format', choices=['ndjson', 'json', 'manifest'], default='ndjson',
+                        help="ndjson streams one compact prompt per line; json writes an indented array; "
+                             "manifest writes each distinct prompt once plus a segment_id -> prompt_id mapping")
+    parser.add_argument('--chunksize', type=int, default=SEGMENT_CHUNK_SIZE,
+                        help="Segments read and scored per chunk")
+    args = parser.parse_args()
+
     generator = GeminiPromptGenerator()
-    generator.run()
+    generator.run(output_format=args.format, chunksize=args.chunksize)
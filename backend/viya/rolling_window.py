@@ -0,0 +1,211 @@
+import numpy as np
+import pandas as pd
+from .config import ROLLING_WINDOW_CAMPAIGNS
+
+WINDOW_COLUMNS = {
+    'engagement_rate': np.float64,
+    'conversion_rate': np.float64,
+    'campaign_type': object,
+    'channel': object,
+    'value_theme': object,
+}
+
+# segment_patterns averages: (output column, value column, filter column, filter value)
+PATTERN_MEANS = [
+    ('avg_engagement', 'engagement_rate', None, None),
+    ('discount_response', 'conversion_rate', 'campaign_type', 'discount'),
+    ('premium_response', 'conversion_rate', 'campaign_type', 'premium'),
+    ('family_resp', 'conversion_rate', 'value_theme', 'family'),
+    ('eco_resp', 'conversion_rate', 'value_theme', 'eco_conscious'),
+    ('conv_resp', 'conversion_rate', 'value_theme', 'convenience'),
+    ('qual_resp', 'conversion_rate', 'value_theme', 'quality'),
+]
+
+# segment_patterns maxima of engagement per channel, 0 for other channels
+PATTERN_MAXES = [
+    ('email_perf', 'email'),
+    ('push_perf', 'push'),
+    ('inapp_perf', 'inapp'),
+]
+
+PATTERN_COLUMNS = ['segment_id', 'avg_engagement', 'discount_response', 'premium_response',
+                   'email_perf', 'push_perf', 'inapp_perf',
+                   'family_resp', 'eco_resp', 'conv_resp', 'qual_resp', 'campaign_count']
+
+
+def campaign_sequence(campaign_ids):
+    """
+    Send order of campaigns: the number after the last '_' of their ids, e.g. CAMP_1000 -> 1000.
+
+    Campaign ids are issued in send order but compare as strings ('CAMP_1000' < 'CAMP_999'),
+    so recency is decided on this number, as SCAN(campaign_id, -1, '_') does in FedSQL.
+    """
+    return pd.Series(campaign_ids).astype(str).str.rsplit('_', n=1).str[-1].astype(np.float64).to_numpy()
+
+
+def pattern_contributions(values, value_column, filter_column, filter_value):
+    """Per-row (sum, count) contribution of values to one AVG(CASE WHEN ... END) aggregate."""
+    value = np.asarray(values[value_column], dtype=np.float64)
+    valid = ~np.isnan(value)
+    if filter_column is not None:
+        valid &= np.asarray(values[filter_column] == filter_value)
+    return np.where(valid, value, 0.0), valid.astype(np.int64)
+
+
+class SegmentRollingWindow:
+    """
+    The most recent capacity campaign results of every segment, in send order.
+
+    Each segment owns a fixed-size ring buffer; results are appended in send_sequence order
+    (see campaign_sequence) and the oldest entry is overwritten once the buffer is full.
+    Sums and counts behind every segment_patterns average are kept running, adding the new
+    entry and subtracting the evicted one, so a result costs O(1) and patterns() needs no
+    pass over campaign history.
+    """
+
+    def __init__(self, capacity=ROLLING_WINDOW_CAMPAIGNS):
+        self.capacity = capacity
+        self.segment_ids = pd.Index([])
+        self.start = np.zeros(0, dtype=np.int64)
+        self.count = np.zeros(0, dtype=np.int64)
+        self.buffers = {name: np.empty((0, capacity), dtype=dtype) for name, dtype in WINDOW_COLUMNS.items()}
+        self.sums = {name: np.zeros(0) for name, *_ in PATTERN_MEANS}
+        self.counts = {name: np.zeros(0, dtype=np.int64) for name, *_ in PATTERN_MEANS}
+        self.last_sequence = None
+        # {name: label} of the inputs the window was built from, saved with it
+        self.source = {}
+
+    def _segment_rows(self, segment_ids):
+        """Buffer rows of segment_ids, allocating empty buffers for unseen segments."""
+        unseen = pd.Index(segment_ids).unique().difference(self.segment_ids)
+        if len(unseen):
+            added = len(unseen)
+            self.segment_ids = unseen if self.segment_ids.empty else self.segment_ids.append(unseen)
+            self.start = np.concatenate([self.start, np.zeros(added, dtype=np.int64)])
+            self.count = np.concatenate([self.count, np.zeros(added, dtype=np.int64)])
+            for name, dtype in WINDOW_COLUMNS.items():
+                self.buffers[name] = np.concatenate([self.buffers[name], np.empty((added, self.capacity), dtype=dtype)])
+            for name in self.sums:
+                self.sums[name] = np.concatenate([self.sums[name], np.zeros(added)])
+                self.counts[name] = np.concatenate([self.counts[name], np.zeros(added, dtype=np.int64)])
+        return self.segment_ids.get_indexer(segment_ids)
+
+    def _accumulate(self, rows, values, sign):
+        for name, value_column, filter_column, filter_value in PATTERN_MEANS:
+            sums, counts = pattern_contributions(values, value_column, filter_column, filter_value)
+            size = len(self.segment_ids)
+            self.sums[name] += sign * np.bincount(rows, weights=sums, minlength=size)
+            self.counts[name] += sign * np.bincount(rows, weights=counts, minlength=size).astype(np.int64)
+
+    def add(self, segment_id, send_sequence, **values):
+        """Append one result to its segment's window, evicting the segment's oldest when full."""
+        row = self._segment_rows([segment_id])
+        slot = (self.start[row] + self.count[row]) % self.capacity
+
+        if self.count[row[0]] == self.capacity:
+            self._accumulate(row, {name: buffer[row, slot] for name, buffer in self.buffers.items()}, -1)
+            self.start[row] = (self.start[row] + 1) % self.capacity
+        else:
+            self.count[row] += 1
+
+        for name, buffer in self.buffers.items():
+            buffer[row, slot] = values[name]
+        self._accumulate(row, {name: np.asarray([values[name]]) for name in WINDOW_COLUMNS}, 1)
+        self.last_sequence = send_sequence
+
+    def extend(self, results):
+        """
+        Append results of campaigns sent after last_sequence, vectorised across segments.
+
+        Equivalent to calling add for each row in (send_sequence, segment_id) order; when a
+        segment receives more than capacity rows only the newest capacity are written.
+        """
+        if self.last_sequence is not None:
+            results = results[results['send_sequence'] > self.last_sequence]
+        if results.empty:
+            return
+
+        campaign_codes, sequences = pd.factorize(results['send_sequence'], sort=True)
+        rows = self._segment_rows(results['segment_id'])
+        order = np.lexsort((campaign_codes, rows))
+        rows = rows[order]
+        values = {name: results[name].to_numpy()[order] for name in WINDOW_COLUMNS}
+
+        position = np.arange(len(rows))
+        is_start = np.diff(rows, prepend=-1) != 0
+        group_start = np.maximum.accumulate(np.where(is_start, position, 0))
+        group_size = np.diff(np.append(np.flatnonzero(is_start), len(rows)))[np.cumsum(is_start) - 1]
+        rank = position - group_start
+
+        # Rows older than the newest capacity of their segment would be overwritten in the same call
+        keep = rank >= group_size - self.capacity
+        rows, rank, group_size = rows[keep], rank[keep], group_size[keep]
+        values = {name: column[keep] for name, column in values.items()}
+
+        start, count = self.start[rows], self.count[rows]
+        slot = (start + count + rank) % self.capacity
+        evicted = (slot - start) % self.capacity < count
+        self._accumulate(rows[evicted], {name: buffer[rows[evicted], slot[evicted]]
+                                         for name, buffer in self.buffers.items()}, -1)
+
+        for name, buffer in self.buffers.items():
+            buffer[rows, slot] = values[name]
+        self._accumulate(rows, values, 1)
+
+        first = rank == np.maximum(group_size - self.capacity, 0)
+        touched, size = rows[first], group_size[first]
+        total = self.count[touched] + size
+        self.start[touched] = np.where(total > self.capacity,
+                                       (self.start[touched] + total) % self.capacity, self.start[touched])
+        self.count[touched] = np.minimum(total, self.capacity)
+        self.last_sequence = float(sequences[-1])
+
+    def patterns(self):
+        """The segment_patterns table for every segment with results, ordered by segment_id."""
+        occupied = (np.arange(self.capacity) - self.start[:, None]) % self.capacity < self.count[:, None]
+        patterns = {'segment_id': self.segment_ids}
+        for name, *_ in PATTERN_MEANS:
+            counts = self.counts[name]
+            with np.errstate(invalid='ignore', divide='ignore'):
+                patterns[name] = np.where(counts > 0, self.sums[name] / counts, np.nan)
+
+        engagement = self.buffers['engagement_rate']
+        channel = self.buffers['channel']
+        for name, channel_name in PATTERN_MAXES:
+            values = np.where(channel == channel_name, engagement, 0.0)
+            patterns[name] = np.fmax.reduce(np.where(occupied, values, np.nan), axis=1)
+        patterns['campaign_count'] = self.count
+
+        patterns = pd.DataFrame(patterns)
+        patterns = patterns[self.count > 0].sort_values('segment_id').reset_index(drop=True)
+        return patterns[PATTERN_COLUMNS]
+
+    def save(self, path):
+        arrays = {f'buffer_{name}': buffer.astype(str) if buffer.dtype == object else buffer
+                  for name, buffer in self.buffers.items()}
+        arrays.update({f'sum_{name}': values for name, values in self.sums.items()})
+        arrays.update({f'count_{name}': values for name, values in self.counts.items()})
+        arrays.update({f'source_{name}': np.asarray(label) for name, label in self.source.items()})
+        np.savez(path, capacity=self.capacity, segment_ids=np.asarray(self.segment_ids.tolist()),
+                 start=self.start, count=self.count,
+                 last_sequence=np.asarray(np.nan if self.last_sequence is None else self.last_sequence),
+                 **arrays)
+
+    @classmethod
+    def load(cls, path):
+        """The window saved at path, or None when it was saved in an older format."""
+        with np.load(path, allow_pickle=False) as state:
+            if 'last_sequence' not in state:
+                return None
+            window = cls(int(state['capacity']))
+            window.segment_ids = pd.Index(state['segment_ids'])
+            window.start = state['start']
+            window.count = state['count']
+            window.buffers = {name: state[f'buffer_{name}'].astype(dtype) for name, dtype in WINDOW_COLUMNS.items()}
+            window.sums = {name: state[f'sum_{name}'] for name in window.sums}
+            window.counts = {name: state[f'count_{name}'] for name in window.counts}
+            last_sequence = float(state['last_sequence'])
+            window.last_sequence = None if np.isnan(last_sequence) else last_sequence
+            window.source = {name[len('source_'):]: str(state[name]) for name in state.files
+                             if name.startswith('source_')}
+        return window
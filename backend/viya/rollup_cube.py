@@ -0,0 +1,107 @@
+from itertools import combinations
+
+# Campaign attributes the cube rolls up over; every subset of them is a grouping set
+CUBE_DIMENSIONS = ['campaign_type', 'channel', 'message_sentiment', 'value_theme']
+
+# Per-segment grouping sets, for analyses that pivot a segment's results by attribute
+SEGMENT_GROUPING_SETS = [('segment_id', 'campaign_type')]
+
+CUBE_GROUPING_SETS = [dimensions for size in range(len(CUBE_DIMENSIONS) + 1)
+                      for dimensions in combinations(CUBE_DIMENSIONS, size)] + SEGMENT_GROUPING_SETS
+
+# Cube measure: campaign_metrics column it summarises
+CUBE_MEASURES = {
+    'conversion': 'conversion_rate',
+    'engagement': 'engagement_rate',
+    'vs_benchmark': 'sales_vs_benchmark',
+}
+
+
+def grouping_set_key(*dimensions):
+    """The attribute_cube grouping_set value of the rows grouped by dimensions."""
+    return ','.join(dimensions) or 'total'
+
+
+def cube_mean(measure):
+    """SQL for AVG of a measure from its cube count and sum."""
+    return f'{measure}_sum / NULLIF({measure}_count, 0)'
+
+
+def cube_pivot_mean(measure, dimension, value):
+    """SQL for AVG of a measure over the cube rows where dimension = value, inside a GROUP BY."""
+    return (f"SUM(CASE WHEN {dimension} = '{value}' THEN {measure}_sum END) / "
+            f"NULLIF(SUM(CASE WHEN {dimension} = '{value}' THEN {measure}_count END), 0)")
+
+
+def cube_std(measure):
+    """SQL for STDDEV of a measure from its cube count, sum and sum of squares (NULL below two values)."""
+    variance = f'({measure}_sq_sum - {measure}_sum * {measure}_sum / {measure}_count) / ({measure}_count - 1)'
+    return f'CASE WHEN {measure}_count > 1 THEN SQRT(CASE WHEN {variance} > 0 THEN {variance} ELSE 0 END) END'
+
+
+def build_attribute_cube(conn):
+    """
+    Materialize attribute_cube: row count and per-measure count, sum and sum of squares for every grouping set.
+
+    campaign_metrics joined to campaigns is scanned once, into a base at segment x attribute
+    grain; each grouping set is then summed from that base. Means and standard deviations of
+    any grouping set follow from its row via cube_mean and cube_std, so attribute-level
+    analyses read a few hundred cube rows instead of the fact table. Dimensions outside a
+    row's grouping set are NULL.
+    """
+    base_dimensions = ['segment_id'] + CUBE_DIMENSIONS
+    measures = ',\n'.join(
+        f'COUNT(m.{column}) AS {measure}_count, SUM(m.{column}) AS {measure}_sum, '
+        f'SUM(m.{column} * m.{column}) AS {measure}_sq_sum'
+        for measure, column in CUBE_MEASURES.items()
+    )
+    conn.table.droptable(name='attribute_cube_base', quiet=True)
+    conn.fedsql.execdirect(query=f'''
+        CREATE TABLE attribute_cube_base AS
+        SELECT m.segment_id, {', '.join(f'c.{dimension}' for dimension in CUBE_DIMENSIONS)},
+               COUNT(*) AS row_count,
+               {measures}
+        FROM campaign_metrics m
+        JOIN campaigns c ON m.campaign_id = c.campaign_id
+        GROUP BY m.segment_id, {', '.join(f'c.{dimension}' for dimension in CUBE_DIMENSIONS)}
+    ''')
+
+    totals = ', '.join(['SUM(row_count) AS row_count'] + [
+        f'SUM({measure}_{statistic}) AS {measure}_{statistic}'
+        for measure in CUBE_MEASURES for statistic in ('count', 'sum', 'sq_sum')
+    ])
+    rollups = []
+    for dimensions in CUBE_GROUPING_SETS:
+        columns = ', '.join(
+            dimension if dimension in dimensions
+            else f'CAST(NULL AS {"DOUBLE" if dimension == "segment_id" else "VARCHAR(32)"}) AS {dimension}'
+            for dimension in base_dimensions
+        )
+        group_by = f'GROUP BY {", ".join(dimensions)}' if dimensions else ''
+        rollups.append(f"SELECT CAST('{grouping_set_key(*dimensions)}' AS VARCHAR(64)) AS grouping_set, {columns}, {totals} "
+                       f"FROM attribute_cube_base {group_by}")
+
+    conn.table.droptable(name='attribute_cube', quiet=True)
+    conn.fedsql.execdirect(query='CREATE TABLE attribute_cube AS\n' + '\nUNION ALL\n'.join(rollups))
+    conn.table.droptable(name='attribute_cube_base', quiet=True)
+
+
+class AttributeCube:
+    """
+    The attribute_cube analysis shared by the pattern and cross-campaign phases.
+
+    Scheduled by run_analyses next to the analytics that read attribute_cube; the pipeline
+    builds it once for both phases.
+    """
+    # Analysis: (tables it reads, tables it creates), scheduled by run_analyses
+    ANALYSES = {
+        'build_attribute_cube': (['campaign_metrics', 'campaigns'], ['attribute_cube']),
+    }
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def build_attribute_cube(self):
+        print("Building attribute rollup cube...")
+        build_attribute_cube(self.conn)
+        print("Attribute cube built\n")
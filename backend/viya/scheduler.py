@@ -0,0 +1,126 @@
+import copy
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from .config import ANALYSIS_CONCURRENCY, CAS_TABLE_CASLIB
+from .table_loader import drop_table, clear_table_cache
+
+
+def analysis_graph(analytics):
+    """
+    {analysis: (instance, inputs, outputs)} from the ANALYSES declared by each analytics instance.
+
+    Analyses are keyed by method name, so a name declared by two instances raises ValueError;
+    an analysis several classes read from, such as build_attribute_cube, lives on its own class.
+    """
+    graph = {}
+    for instance in analytics:
+        for method, (inputs, outputs) in instance.ANALYSES.items():
+            if method in graph:
+                raise ValueError(f"Analysis {method} is declared by both {type(graph[method][0]).__name__} "
+                                 f"and {type(instance).__name__}")
+            graph[method] = (instance, inputs, outputs)
+    return graph
+
+
+def required_analyses(graph, outputs):
+    """The analyses needed to materialize outputs, including everything they transitively read."""
+    producers = {table: name for name, (_, _, produced) in graph.items() for table in produced}
+    unknown = [table for table in outputs if table not in producers]
+    if unknown:
+        raise ValueError(f"No analysis produces {', '.join(unknown)}")
+
+    required = set()
+    pending = list(outputs)
+    while pending:
+        name = producers.get(pending.pop())
+        # Tables without a producer are inputs loaded by load_data
+        if name is None or name in required:
+            continue
+        required.add(name)
+        pending.extend(graph[name][1])
+    return required
+
+
+def run_analyses(analytics, outputs=None, concurrency=ANALYSIS_CONCURRENCY, caslib=CAS_TABLE_CASLIB):
+    """
+    Run the analyses of analytics instances that outputs depend on (all when None) in dependency order.
+
+    An analysis starts once every analysis producing one of its inputs has finished. Session
+    tables are private to their session, so analyses only run concurrently when there is a
+    caslib to share tables through. In that case independent FedSQL analyses run on worker
+    sessions from conn.copy(), and their outputs are promoted into caslib after stale copies
+    from an earlier run are dropped. Client-side analyses (CLIENT_ANALYSES) fit models on
+    their instance in the calling thread. Prints and returns seconds per analysis.
+    """
+    graph = analysis_graph(analytics)
+    names = required_analyses(graph, outputs) if outputs else set(graph)
+    producers = {table: name for name, (_, _, produced) in graph.items() for table in produced}
+    depends_on = {name: {producers[table] for table in graph[name][1] if table in producers} for name in names}
+    conn = analytics[0].conn
+    parallel = concurrency > 1 and bool(caslib)
+
+    def in_session(name):
+        return parallel and name not in getattr(graph[name][0], 'CLIENT_ANALYSES', ())
+
+    if parallel:
+        for name in filter(in_session, names):
+            for table in graph[name][2]:
+                drop_table(conn, table, caslib)
+
+    local = threading.local()
+    sessions = []
+    timings = {}
+
+    def run(name):
+        instance, _, produced = graph[name]
+        start_time = time.perf_counter()
+        if in_session(name):
+            if not hasattr(local, 'session'):
+                local.session = conn.copy()
+                local.session.loadactionset('fedsql')
+                sessions.append(local.session)
+            worker = copy.copy(instance)
+            worker.conn = local.session
+            getattr(worker, name)()
+            for table in produced:
+                local.session.table.promote(name=table, targetlib=caslib)
+        else:
+            getattr(instance, name)()
+        timings[name] = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    done = set()
+    running = {}
+    try:
+        with ThreadPoolExecutor(max_workers=max(concurrency, 1)) as pool:
+            while len(done) < len(names):
+                ready = [name for name in graph if name in names and name not in done
+                         and name not in running.values() and depends_on[name] <= done]
+                if not ready and not running:
+                    raise ValueError(f"Analyses depend on each other in a cycle: {', '.join(sorted(names - done))}")
+
+                for name in ready:
+                    if in_session(name):
+                        running[pool.submit(run, name)] = name
+                    else:
+                        run(name)
+                        done.add(name)
+
+                if running:
+                    finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        future.result()
+                        done.add(running.pop(future))
+    finally:
+        for session in sessions:
+            clear_table_cache(session)
+            session.close()
+
+    elapsed = max(time.perf_counter() - start_time, 1e-9)
+    print("Analysis timings:")
+    for name in graph:
+        if name in timings:
+            print(f"  {name:<36} {timings[name]:8.2f}s")
+    print(f"  {len(timings)} analyses in {elapsed:.2f}s, {sum(timings.values()) / elapsed:.1f}x sequential throughput\n")
+    return timings
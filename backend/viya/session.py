@@ -0,0 +1,96 @@
+import fcntl
+import json
+import os
+import time
+import requests
+from .config import TOKEN_CACHE_FILE, TOKEN_REFRESH_MARGIN
+
+DEFAULT_ACTIONSETS = ('fedsql', 'datastep')
+
+
+def fetch_token(remote, client_id, client_secret):
+    """POST client credentials to SAS Logon and return (access_token, expires_in seconds)."""
+    print("Authenticating with Viya...")
+    response = requests.post(
+        f'{remote}/SASLogon/oauth/token',
+        data='grant_type=client_credentials',
+        headers={'Content-Type': 'application/x-www-form-urlencoded'},
+        auth=(client_id, client_secret)
+    )
+
+    if not response.ok:
+        raise ConnectionError(f"Auth failed: {response.text}")
+
+    payload = response.json()
+    print("✓ Authenticated")
+    return payload['access_token'], payload.get('expires_in', 0)
+
+
+def read_json_cache(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def write_json_cache(path, cache):
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, 'w') as f:
+        json.dump(cache, f)
+    os.replace(tmp_path, path)
+
+
+def get_token(remote, client_id, client_secret, cache_file=TOKEN_CACHE_FILE):
+    """
+    Return a token for remote and client_id, reusing the on-disk cache until shortly before expiry.
+
+    The cache file is guarded by an exclusive lock held across the refresh, so concurrent
+    processes wait for one token request and then reuse its result.
+    """
+    if not cache_file:
+        return fetch_token(remote, client_id, client_secret)[0]
+
+    os.makedirs(os.path.dirname(os.path.abspath(cache_file)), exist_ok=True)
+    key = f'{remote}|{client_id}'
+
+    with open(f'{cache_file}.lock', 'a') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            cache = read_json_cache(cache_file)
+            entry = cache.get(key)
+            now = time.time()
+            if entry and entry['expires_at'] - TOKEN_REFRESH_MARGIN > now:
+                print(f"✓ Reusing cached token (expires in {int(entry['expires_at'] - now)}s)")
+                return entry['access_token']
+
+            token, expires_in = fetch_token(remote, client_id, client_secret)
+            cache[key] = {'access_token': token, 'expires_at': now + expires_in}
+            write_json_cache(cache_file, cache)
+            return token
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def connect_cas(actionsets=DEFAULT_ACTIONSETS):
+    """Authenticate against SAS Logon and open a CAS session with the given action sets loaded."""
+    import swat
+
+    remote = os.getenv('VIYA_REMOTE', 'https://viya-i107icluw3.engage.sas.com')
+    hostname = os.getenv('VIYA_HOSTNAME')
+    client_id = os.getenv('VIYA_CLIENT_ID')
+    client_secret = os.getenv('VIYA_CLIENT_SECRET')
+
+    if not all([hostname, client_id, client_secret]):
+        raise ValueError("Missing required environment variables: VIYA_HOSTNAME, VIYA_CLIENT_ID, VIYA_CLIENT_SECRET")
+
+    token = get_token(remote, client_id, client_secret)
+
+    cas_url = f"https://{hostname}/cas-shared-default-http/"
+    print(f"Connecting to CAS: {cas_url}")
+    conn = swat.CAS(cas_url, password=token, ssl_ca_list=False)
+    for actionset in actionsets:
+        conn.loadactionset(actionset)
+    print(f"✓ Connected. Session: {conn.sessionid}\n")
+    return conn
@@ -0,0 +1,395 @@
+import argparse
+import math
+import re
+import sqlite3
+import threading
+import time
+import uuid
+
+import numpy as np
+import pandas as pd
+
+DATASTEP_RANK_PATTERN = re.compile(
+    r'data\s+(?P<out>\w+)\s*;\s*'
+    r'set\s+(?P<source>\w+)\s*;\s*'
+    r'by\s+(?P<by>[\w\s]+?)\s*;\s*'
+    r'retain\s+(?P<rank>\w+)\s*;\s*'
+    r'if\s+first\.(?P<group>\w+)\s+then\s+(?P=rank)\s*=\s*1\s*;\s*'
+    r'else\s+(?P=rank)\s*\+\s*1\s*;\s*'
+    r'(?:if\s+(?P=rank)\s*<=\s*(?P<limit>\d+)\s*;\s*)?'
+    r'run\s*;',
+    re.IGNORECASE
+)
+
+DATASTEP_PROMOTE_PATTERN = re.compile(
+    r'data\s+(?:\w+\.)?(?P<out>\w+)\s*\(\s*promote\s*=\s*yes\s*\)\s*;\s*'
+    r'set\s+(?P<source>\w+)\s*;\s*'
+    r'run\s*;',
+    re.IGNORECASE
+)
+
+# Schema the shared database holding promoted (global) tables is attached as
+GLOBAL_SCHEMA = 'caslib'
+
+DATASTEP_APPEND_PATTERN = re.compile(
+    r'data\s+(?P<out>\w+)\s*\(\s*append\s*=\s*yes\s*\)\s*;\s*'
+    r'set\s+(?P<source>\w+)\s*;\s*'
+    r'run\s*;',
+    re.IGNORECASE
+)
+
+
+class _StdDev:
+    """Sample standard deviation aggregate matching FedSQL STDDEV (NULL below two values)."""
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def step(self, value):
+        if value is None:
+            return
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+
+    def finalize(self):
+        if self.count < 2:
+            return None
+        return math.sqrt(self.m2 / (self.count - 1))
+
+
+def _sqrt(value):
+    if value is None or value < 0:
+        return None
+    return math.sqrt(value)
+
+
+def _scan(value, count, delimiters):
+    """SAS SCAN: the count-th word of value split on any of delimiters, from the right when negative."""
+    if value is None:
+        return None
+    words = [word for word in re.split(f'[{re.escape(delimiters)}]', value) if word]
+    count = int(count)
+    if count == 0 or abs(count) > len(words):
+        return ''
+    return words[count - 1] if count > 0 else words[count]
+
+
+class SQLiteCASTable:
+    def __init__(self, conn, name):
+        self.conn = conn
+        self.name = name
+
+    def to_frame(self):
+        return pd.read_sql_query(f'SELECT * FROM "{self.name}"', self.conn.db)
+
+
+class _FedSQLActions:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def execdirect(self, query):
+        return self.conn.execute(query)
+
+
+class _DataStepActions:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def runcode(self, code):
+        """
+        Run the data steps used by the pipelines: BY-group ranking as a window query,
+        append=yes table appends as INSERT ... SELECT and promote=yes copies. Other programs raise.
+        """
+        append = DATASTEP_APPEND_PATTERN.search(code)
+        if append:
+            return self.conn.execute(f'INSERT INTO "{append["out"]}" SELECT * FROM "{append["source"]}"')
+
+        promote = DATASTEP_PROMOTE_PATTERN.search(code)
+        if promote:
+            return self.conn.execute(
+                f'CREATE TABLE {GLOBAL_SCHEMA}."{promote["out"]}" AS SELECT * FROM "{promote["source"]}"'
+            )
+
+        match = DATASTEP_RANK_PATTERN.search(code)
+        if not match:
+            raise NotImplementedError("SQLite CAS stand-in only supports the ranking and append data steps")
+
+        # BY variables in order, each preceded by an optional DESCENDING keyword
+        by_columns = []
+        descending = False
+        for token in match['by'].split():
+            if token.lower() == 'descending':
+                descending = True
+                continue
+            by_columns.append((token, descending))
+            descending = False
+        if match['group'].lower() != by_columns[0][0].lower() or by_columns[0][1]:
+            raise NotImplementedError("Ranking data step must restart on the first, ascending BY variable")
+
+        order = ', '.join(f'"{column}"{" DESC" if desc else ""}' for column, desc in by_columns)
+        limit = f'WHERE "{match["rank"]}" <= {match["limit"]}' if match['limit'] else ''
+        return self.conn.execute(f'''
+            CREATE TABLE "{match['out']}" AS
+            SELECT * FROM (
+                SELECT t.*, CAST(ROW_NUMBER() OVER (PARTITION BY "{by_columns[0][0]}" ORDER BY {order}) AS DOUBLE)
+                    AS "{match['rank']}"
+                FROM "{match['source']}" t
+            ) {limit}
+            ORDER BY {order}
+        ''')
+
+
+class _TableActions:
+    """Table metadata actions; labels live in each database's _cas_tables bookkeeping table."""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def tableexists(self, name, caslib=None):
+        with self.conn.lock:
+            schema = self.conn.table_schema(name)
+        return {'exists': {None: 0, 'main': 1, GLOBAL_SCHEMA: 2}[schema]}
+
+    def tableinfo(self, name, caslib=None):
+        with self.conn.lock:
+            schema = self.conn.table_schema(name)
+            rows = self.conn.db.execute(f'SELECT COUNT(*) FROM {schema}."{name}"').fetchone()[0]
+            create_time, mod_time = self.conn.table_times.get(self.conn.table_key(name), (0.0, 0.0))
+            label = self.conn.table_meta(name)['label']
+        return {'TableInfo': pd.DataFrame({'Name': [name.upper()], 'Rows': [rows], 'Label': [label],
+                                           'CreateTime': [create_time], 'ModTime': [mod_time]})}
+
+    def fetch(self, table, maxrows=20, index=True, sastypes=True, **kwargs):
+        start = kwargs.get('from', 1)
+        stop = min(kwargs.get('to', start + maxrows - 1), start + maxrows - 1)
+        columns = ', '.join(f'"{column}"' for column in table['vars']) if table.get('vars') else '*'
+        query = (f'SELECT {columns} FROM "{table["name"]}" ORDER BY rowid '
+                 f'LIMIT {max(stop - start + 1, 0)} OFFSET {start - 1}')
+        return {'Fetch': self.conn.execute(query)}
+
+    def droptable(self, name, caslib=None, quiet=False):
+        """Drop the session table name, or the global one when the session has none, like CAS."""
+        with self.conn.lock:
+            schema = self.conn.table_schema(name)
+            if schema is None:
+                if quiet:
+                    return
+                raise sqlite3.OperationalError(f"no such table: {name}")
+            key = self.conn.table_key(name)
+            self.conn.db.execute(f'DROP TABLE {schema}."{name}"')
+            self.conn.db.execute(f'DELETE FROM {schema}._cas_tables WHERE name = ?', (name.lower(),))
+            self.conn.table_times.pop(key, None)
+
+    def altertable(self, name, caslib=None, label=None):
+        self.conn.set_table_meta(name, label=label)
+
+    def promote(self, name, caslib=None, targetlib=None, target=None):
+        """Move the session table name into the global database, as target when given."""
+        target = target or name
+        with self.conn.lock:
+            schema = self.conn.table_schema(name)
+            label = self.conn.table_meta(name)['label']
+            times = self.conn.table_times.pop(self.conn.table_key(name), (0.0, 0.0))
+            if schema == 'main':
+                self.conn.db.execute(f'CREATE TABLE {GLOBAL_SCHEMA}."{target}" AS SELECT * FROM main."{name}"')
+                self.conn.db.execute(f'DROP TABLE main."{name}"')
+            elif target.lower() != name.lower():
+                self.conn.db.execute(f'ALTER TABLE {GLOBAL_SCHEMA}."{name}" RENAME TO "{target}"')
+            self.conn.db.execute(f'DELETE FROM {schema}._cas_tables WHERE name = ?', (name.lower(),))
+            self.conn.set_table_meta(target, label=label)
+            self.conn.table_times[self.conn.table_key(target)] = times
+
+
+class SQLiteCASConnection:
+    """
+    Embedded SQLite stand-in for the subset of swat.CAS used by the analytics classes.
+
+    Supports read_csv, upload_frame, fedsql.execdirect, the ranking datastep.runcode,
+    the table metadata actions used for promoted-table reuse and CASTable(...).to_frame(),
+    so the existing FedSQL runs unchanged without Viya. Like CAS sessions, each connection
+    keeps the tables it creates in a private in-memory database, and promote moves them into
+    the shared database, attached as GLOBAL_SCHEMA, where every session sees them. Unqualified
+    names resolve to the session's table first. With a database file, promoted tables outlive
+    the connection like global CAS tables. copy() opens another session on the same shared
+    database, like swat.CAS.copy, for use from another thread. Create and modification times
+    are only tracked for tables written by this connection and its copies. Every action is
+    timed in self.timings for benchmarking.
+    """
+
+    def __init__(self, database=':memory:'):
+        if database == ':memory:':
+            # Shared-cache in-memory database, so copies see the same global tables
+            database = f'file:sqlite-cas-{uuid.uuid4()}?mode=memory&cache=shared'
+        self.table_times = {}
+        # Shared-cache databases fail rather than wait on a lock held by another session
+        self.lock = threading.RLock()
+        self._open(database)
+
+    def _open(self, database):
+        self.database = database
+        # Cached statements keep resolving a name to the table they were prepared against
+        self.db = sqlite3.connect(':memory:', uri=True, check_same_thread=False,
+                                  isolation_level=None, cached_statements=0)
+        with self.lock:
+            self.db.execute(f'ATTACH DATABASE ? AS {GLOBAL_SCHEMA}', (database,))
+            for schema in ('main', GLOBAL_SCHEMA):
+                self.db.execute(f'CREATE TABLE IF NOT EXISTS {schema}._cas_tables '
+                                '(name TEXT PRIMARY KEY, label TEXT NOT NULL DEFAULT \'\')')
+        self.db.create_aggregate('STDDEV', 1, _StdDev)
+        self.db.create_function('SQRT', 1, _sqrt)
+        self.db.create_function('SCAN', 3, _scan)
+        self.sessionid = f'sqlite-{uuid.uuid4()}'
+        self.fedsql = _FedSQLActions(self)
+        self.datastep = _DataStepActions(self)
+        self.table = _TableActions(self)
+        self.timings = []
+
+    def copy(self):
+        conn = SQLiteCASConnection.__new__(SQLiteCASConnection)
+        conn.table_times = self.table_times
+        conn.lock = self.lock
+        conn._open(self.database)
+        return conn
+
+    def table_schema(self, name):
+        """'main' for a session table, GLOBAL_SCHEMA for a promoted one, None when absent."""
+        for schema in ('main', GLOBAL_SCHEMA):
+            if self.db.execute(f"SELECT 1 FROM {schema}.sqlite_master WHERE type = 'table' AND name = ? COLLATE NOCASE",
+                               (name,)).fetchone():
+                return schema
+        return None
+
+    def table_key(self, name):
+        """table_times key: session tables are private to their session."""
+        scope = self.sessionid if self.table_schema(name) == 'main' else GLOBAL_SCHEMA
+        return scope, name.lower()
+
+    def has_table(self, name):
+        with self.lock:
+            return self.table_schema(name) is not None
+
+    def table_meta(self, name):
+        with self.lock:
+            schema = self.table_schema(name)
+            row = schema and self.db.execute(f'SELECT label FROM {schema}._cas_tables WHERE name = ?',
+                                             (name.lower(),)).fetchone()
+        return {'label': row[0] if row else '', 'promoted': int(schema == GLOBAL_SCHEMA)}
+
+    def set_table_meta(self, name, label=None):
+        with self.lock:
+            schema = self.table_schema(name)
+            if label is not None:
+                self.db.execute(f'INSERT OR REPLACE INTO {schema}._cas_tables (name, label) VALUES (?, ?)',
+                                (name.lower(), label))
+
+    def loadactionset(self, actionset):
+        pass
+
+    def read_csv(self, filepath, casout):
+        start_time = time.perf_counter()
+        self._store(pd.read_csv(filepath), casout)
+        self.timings.append((f"read_csv {casout['name']}", time.perf_counter() - start_time))
+        return SQLiteCASTable(self, casout['name'])
+
+    def upload_frame(self, df, casout):
+        start_time = time.perf_counter()
+        self._store(df, casout)
+        self.timings.append((f"upload_frame {casout['name']}", time.perf_counter() - start_time))
+        return SQLiteCASTable(self, casout['name'])
+
+    def _store(self, df, casout):
+        # CAS stores every numeric column as DOUBLE, which keeps SQL division non-integer
+        df = df.copy()
+        numeric = df.select_dtypes(include='number').columns
+        df[numeric] = df[numeric].astype(np.float64)
+
+        with self.lock:
+            # Written to the session database, then moved to the global one when promoted
+            df.to_sql(casout['name'], self.db, index=False,
+                      if_exists='replace' if casout.get('replace') else 'fail')
+            self._touch(casout['name'], created=True)
+            self.set_table_meta(casout['name'], label=casout.get('label', ''))
+            if casout.get('promote'):
+                self.table.promote(name=casout['name'])
+
+    def execute(self, query):
+        start_time = time.perf_counter()
+        with self.lock:
+            cursor = self.db.execute(query)
+            result = None
+            if cursor.description:
+                result = pd.DataFrame(cursor.fetchall(), columns=[column[0] for column in cursor.description])
+
+            label = re.search(rf'CREATE\s+TABLE\s+(?:{GLOBAL_SCHEMA}\.)?"?(\w+)', query, re.IGNORECASE)
+            if label:
+                self._touch(label[1], created=True)
+            inserted = re.match(r'\s*INSERT\s+INTO\s+"?(\w+)', query, re.IGNORECASE)
+            if inserted:
+                self._touch(inserted[1])
+        self.timings.append((label[1] if label else query.split(None, 1)[0], time.perf_counter() - start_time))
+        return result
+
+    def _touch(self, name, created=False):
+        now = time.time()
+        key = self.table_key(name)
+        create_time = now if created else self.table_times.get(key, (now, now))[0]
+        self.table_times[key] = (create_time, now)
+
+    def CASTable(self, name):
+        return SQLiteCASTable(self, name)
+
+    def close(self):
+        self.db.close()
+
+BENCHMARK_PHASES = ['core', 'patterns', 'cross', 'predictive']
+
+
+def benchmark(phases):
+    """Run the SQL phases of each analytics class against SQLite and print per-query timings."""
+    from .core_campaign_metrics import ViyaCampaignAnalytics
+    from .pattern_detection import AdvancedCampaignAnalytics
+    from .cross_campaign_analysis import CrossCampaignAnalytics
+    from .predictive_analytics import PredictiveAnalytics
+    from .rollup_cube import AttributeCube
+
+    steps = {
+        'core': (ViyaCampaignAnalytics, ['load_data', 'calculate_metrics', 'build_campaign_metrics',
+                                         'derive_segment_attributes']),
+        'patterns': (AdvancedCampaignAnalytics, ['load_data', 'analyze_segment_consistency', 'build_attribute_cube',
+                                                 'analyze_attribute_effectiveness', 'analyze_interaction_effects']),
+        'cross': (CrossCampaignAnalytics, ['load_data', 'build_attribute_cube', 'analyze_campaign_type_affinity',
+                                           'analyze_educational_priming', 'analyze_value_alignment',
+                                           'analyze_channel_versatility']),
+        'predictive': (PredictiveAnalytics, ['load_data', 'prepare_model_features', 'prepare_clustering_features']),
+    }
+
+    for phase in phases:
+        analytics_class, methods = steps[phase]
+        conn = SQLiteCASConnection()
+        analytics = analytics_class(conn=conn)
+        for method in methods:
+            # The shared attribute cube is built by AttributeCube rather than the phase classes
+            owner = analytics if hasattr(analytics, method) else AttributeCube(conn)
+            getattr(owner, method)()
+
+        print(f"{phase} query timings:")
+        for label, seconds in conn.timings:
+            print(f"  {label:<40} {seconds * 1000:9.1f} ms")
+        print(f"  {'total':<40} {sum(seconds for _, seconds in conn.timings) * 1000:9.1f} ms\n")
+        analytics.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the analytics FedSQL against an embedded SQLite engine")
+    parser.add_argument('phases', nargs='*', metavar='PHASE',
+                        help=f"Phases to benchmark, from {', '.join(BENCHMARK_PHASES)} (default: all)")
+    args = parser.parse_args()
+    # argparse checks a list default against choices as one value, so phases are validated here
+    unknown = [phase for phase in args.phases if phase not in BENCHMARK_PHASES]
+    if unknown:
+        parser.error(f"invalid phase: {', '.join(unknown)} (choose from {', '.join(BENCHMARK_PHASES)})")
+    benchmark(args.phases or BENCHMARK_PHASES)
@@ -0,0 +1,77 @@
+import argparse
+import base64
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+TOKEN_PATH = '/SASLogon/oauth/token'
+
+
+class _TokenHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        server = self.server
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+
+        if self.path != TOKEN_PATH:
+            self._respond(404, {'error': 'not_found'})
+            return
+
+        expected = base64.b64encode(f'{server.client_id}:{server.client_secret}'.encode()).decode()
+        if server.client_id and self.headers.get('Authorization') != f'Basic {expected}':
+            self._respond(401, {'error': 'unauthorized'})
+            return
+
+        time.sleep(server.delay)
+        with server.lock:
+            server.request_count += 1
+            token = f'stub-token-{server.request_count}'
+        self._respond(200, {'access_token': token, 'token_type': 'bearer', 'expires_in': server.expires_in})
+
+    def _respond(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stub_token_server(port=0, expires_in=3600, delay=0.0, client_id=None, client_secret=None):
+    """
+    Serve a SAS Logon client-credentials token endpoint on localhost in a background thread.
+
+    Tokens are numbered so callers can tell a cached token from a fresh one, and
+    server.request_count reports how many token requests were made. Point VIYA_REMOTE
+    at f'http://127.0.0.1:{server.server_port}'.
+    """
+    server = ThreadingHTTPServer(('127.0.0.1', port), _TokenHandler)
+    server.expires_in = expires_in
+    server.delay = delay
+    server.client_id = client_id
+    server.client_secret = client_secret
+    server.request_count = 0
+    server.lock = threading.Lock()
+
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local stub of the SAS Logon OAuth token endpoint")
+    parser.add_argument('--port', type=int, default=8089)
+    parser.add_argument('--expires-in', type=int, default=3600, help="Token lifetime in seconds")
+    parser.add_argument('--delay', type=float, default=0.0, help="Seconds to wait before answering")
+    args = parser.parse_args()
+
+    server = start_stub_token_server(args.port, args.expires_in, args.delay)
+    print(f"Stub token endpoint: http://127.0.0.1:{server.server_port}{TOKEN_PATH}")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.shutdown()
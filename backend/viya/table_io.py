@@ -0,0 +1,86 @@
+import argparse
+import glob
+import os
+import pandas as pd
+from .config import DATA_DIR_OUTPUT, OUTPUT_FORMAT, PARQUET_COMPRESSION
+
+
+def output_path(path, output_format=OUTPUT_FORMAT):
+    """path with its extension swapped for output_format, e.g. campaign_metrics.csv -> campaign_metrics.parquet."""
+    return f'{os.path.splitext(path)[0]}.{output_format}'
+
+
+def write_table(df, path):
+    """Write df as Parquet when path ends in .parquet, otherwise as CSV."""
+    if path.endswith('.parquet'):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        pq.write_table(pa.Table.from_pandas(df, preserve_index=False), path, compression=PARQUET_COMPRESSION)
+    else:
+        df.to_csv(path, index=False)
+
+
+def write_table_pages(pages, path):
+    """
+    Stream DataFrame pages into one Parquet or CSV file and return the number of rows written.
+
+    Parquet pages become row groups cast to the first page's schema; CSV pages are appended.
+    """
+    rows = 0
+    writer = None
+    for number, page in enumerate(pages):
+        if path.endswith('.parquet'):
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            table = pa.Table.from_pandas(page, preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(path, table.schema, compression=PARQUET_COMPRESSION)
+            writer.write_table(table.cast(writer.schema))
+        else:
+            page.to_csv(path, mode='w' if number == 0 else 'a', header=number == 0, index=False)
+        rows += len(page)
+
+    if writer is not None:
+        writer.close()
+    return rows
+
+
+def read_table(path, columns=None):
+    """
+    Read a Parquet or CSV table, optionally only the given columns.
+
+    Parquet columns are decoded on all cores and keep the dtypes they were written with.
+    """
+    if path.endswith('.parquet'):
+        import pyarrow.parquet as pq
+
+        return pq.read_table(path, columns=columns, use_threads=True).to_pandas()
+    return pd.read_csv(path, usecols=columns)
+
+
+def iter_table(path, chunksize, columns=None):
+    """Yield a Parquet or CSV table as DataFrames of at most chunksize rows."""
+    if path.endswith('.parquet'):
+        import pyarrow.parquet as pq
+
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunksize, columns=columns):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, usecols=columns, chunksize=chunksize)
+
+
+def export_csv(directory=DATA_DIR_OUTPUT):
+    """Write a CSV copy next to every Parquet table in directory, for consumers that only read CSV."""
+    for path in sorted(glob.glob(os.path.join(directory, '*.parquet'))):
+        csv_path = output_path(path, 'csv')
+        read_table(path).to_csv(csv_path, index=False)
+        print(f"✓ {os.path.basename(path)} -> {os.path.basename(csv_path)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export Parquet analytics outputs as CSV")
+    parser.add_argument('--directory', default=DATA_DIR_OUTPUT)
+    args = parser.parse_args()
+    export_csv(args.directory)
@@ -0,0 +1,386 @@
+import hashlib
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+from .config import (
+    CAS_TABLE_CASLIB, CAS_FETCH_PAGE_ROWS, TABLE_CACHE_MAX_ROWS, EXPORT_CONCURRENCY, FINGERPRINT_CACHE_FILE
+)
+from .session import read_json_cache, write_json_cache
+from .table_io import read_table, write_table_pages
+
+HASH_BLOCK_SIZE = 8 * 1024 * 1024
+
+# Bytes before an ingestion watermark that must be unchanged for the file to count as only appended to
+WATERMARK_CHECK_BYTES = 64 * 1024
+
+# Fetched tables per CAS session: {sessionid: {(table name, columns): (table_version, DataFrame)}},
+# where columns is None for the full table or the frozenset of projected columns
+_fetched_tables = {}
+
+
+def file_fingerprint(path, cache_file=FINGERPRINT_CACHE_FILE):
+    """
+    SHA-256 of a file's contents.
+
+    Digests are cached by absolute path, size and mtime, so unchanged files are not re-read.
+    """
+    stat = os.stat(path)
+    key = os.path.abspath(path)
+    cache = read_json_cache(cache_file)
+    entry = cache.get(key)
+    if entry and entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns:
+        return entry['sha256']
+
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b''):
+            digest.update(block)
+
+    cache[key] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': digest.hexdigest()}
+    os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+    write_json_cache(cache_file, cache)
+    return digest.hexdigest()
+
+
+def _complete_size(f):
+    """Bytes of f up to and including its last newline, so a row still being written is left out."""
+    end = f.seek(0, os.SEEK_END)
+    position = end
+    while position > 0:
+        block_start = max(position - HASH_BLOCK_SIZE, 0)
+        f.seek(block_start)
+        newline = f.read(position - block_start).rfind(b'\n')
+        if newline >= 0:
+            return block_start + newline + 1
+        position = block_start
+    return 0
+
+
+def _range_digest(f, end):
+    start = max(end - WATERMARK_CHECK_BYTES, 0)
+    f.seek(start)
+    return hashlib.sha256(f.read(end - start)).hexdigest()
+
+
+def file_watermark(path):
+    """
+    Ingestion watermark of a file that only grows by appended rows: '<bytes>:<sha256>'.
+
+    bytes covers the complete lines written so far and the digest is over the
+    WATERMARK_CHECK_BYTES before that point, which appended_offset checks later.
+    """
+    with open(path, 'rb') as f:
+        size = _complete_size(f)
+        return f'{size}:{_range_digest(f, size)}'
+
+
+def appended_offset(path, watermark):
+    """Byte offset where rows appended after watermark start, or None if the file was rewritten since."""
+    try:
+        size, digest = watermark.split(':')
+        size = int(size)
+    except (AttributeError, ValueError):
+        return None
+    with open(path, 'rb') as f:
+        if f.seek(0, os.SEEK_END) < size or _range_digest(f, size) != digest:
+            return None
+    return size
+
+
+def csv_rows(path, stop):
+    """Data rows of the CSV file path in its first stop bytes, e.g. the rows a file_watermark covers."""
+    with open(path, 'rb') as f:
+        lines = sum(block.count(b'\n') for block in iter(lambda: f.read(min(HASH_BLOCK_SIZE, stop - f.tell())), b''))
+    return max(lines - 1, 0)
+
+
+def table_label(conn, name, caslib=CAS_TABLE_CASLIB):
+    """Label of a table in caslib, or None when it does not exist."""
+    if not conn.table.tableexists(caslib=caslib, name=name)['exists']:
+        return None
+    return conn.table.tableinfo(caslib=caslib, name=name)['TableInfo']['Label'].iloc[0]
+
+
+def table_exists(conn, name, caslib=CAS_TABLE_CASLIB):
+    if caslib:
+        return bool(conn.table.tableexists(caslib=caslib, name=name)['exists'])
+    return bool(conn.table.tableexists(name=name)['exists'])
+
+
+def table_rows(conn, name):
+    return int(conn.table.tableinfo(name=name)['TableInfo']['Rows'].iloc[0])
+
+
+def table_version(conn, name):
+    """(create time, modification time, rows) of a CAS table; re-creating or appending to it changes the value."""
+    info = conn.table.tableinfo(name=name)['TableInfo'].iloc[0]
+    return info['CreateTime'], info['ModTime'], int(info['Rows'])
+
+
+def clear_table_cache(conn):
+    """Forget the tables fetched on conn's session, e.g. before closing it."""
+    _fetched_tables.pop(conn.sessionid, None)
+
+
+def _cache_key(name, columns=None):
+    return name.lower(), frozenset(c.lower() for c in columns) if columns else None
+
+
+def _cached_table(cache, name, version, columns=None):
+    """A cached copy of name at version holding columns (all columns when None), or None."""
+    keys = [_cache_key(name)]
+    if columns:
+        keys.append(_cache_key(name, columns))
+    for key in keys:
+        cached_version, cached = cache.get(key, (None, None))
+        if cached_version == version:
+            return cached[[c.lower() for c in columns]] if columns else cached.copy(deep=False)
+    return None
+
+
+def iter_table_pages(conn, name, columns=None, page_rows=CAS_FETCH_PAGE_ROWS):
+    """
+    Yield a CAS table as DataFrames of at most page_rows rows, with lowercase column names.
+
+    Each page is one table.fetch with the columns as the table's vars, so only projected
+    columns are transferred and client memory holds one page. An empty table yields one
+    empty page.
+
+    Tables of at most TABLE_CACHE_MAX_ROWS rows are kept per session once fully read, and
+    served from memory while table_version is unchanged, so exports and insight printers
+    reading the same table fetch it once. A CREATE TABLE or append invalidates the copy.
+    Projected reads are cached under their column set and only serve the same projection;
+    a full read serves every projection.
+    """
+    cache = _fetched_tables.setdefault(conn.sessionid, {})
+    version = table_version(conn, name)
+    cached = _cached_table(cache, name, version, columns)
+    if cached is not None:
+        yield cached
+        return
+
+    table = {'name': name}
+    if columns:
+        table['vars'] = list(columns)
+
+    total = version[2]
+    pages = []
+    for start in range(1, max(total, 1) + 1, page_rows):
+        page = conn.table.fetch(table=table, maxrows=page_rows, index=False, sastypes=False,
+                                **{'from': start, 'to': min(start + page_rows - 1, total)})['Fetch']
+        page.columns = page.columns.str.lower()
+        if total <= TABLE_CACHE_MAX_ROWS:
+            pages.append(page.copy(deep=False))
+        yield page
+
+    if total <= TABLE_CACHE_MAX_ROWS:
+        for key in [key for key, (cached_version, _) in cache.items()
+                    if key[0] == name.lower() and cached_version != version]:
+            del cache[key]
+        cache[_cache_key(name, columns)] = (version, pd.concat(pages, ignore_index=True))
+
+
+def fetch_table(conn, name, columns=None, page_rows=CAS_FETCH_PAGE_ROWS):
+    """Fetch a CAS table, or only columns of it, into one DataFrame page by page."""
+    return pd.concat(iter_table_pages(conn, name, columns, page_rows), ignore_index=True)
+
+
+def export_tables(conn, tables, concurrency=EXPORT_CONCURRENCY, caslib=CAS_TABLE_CASLIB):
+    """
+    Fetch and write result tables {name: path} with up to concurrency at once; returns rows per table.
+
+    A swat connection runs one action at a time, so worker threads fetch over their own sessions
+    from conn.copy(). Tables already promoted into caslib, such as run_analyses outputs, are
+    fetched as they are. Session tables are private to their session, so each is first copied
+    server-side into a promoted table named with a suffix unique to this call, which keeps
+    concurrent runs sharing the caslib apart; the copies are dropped afterwards. Fetched tables
+    land in conn's table cache under their own names. Prints each table's fetch latency, the time
+    spent copying and fetching, and the slowest table, which bounds the fetch time.
+    """
+    latencies = {}
+    rows = {}
+
+    def export(session, name, source, path):
+        table_start = time.perf_counter()
+        rows[name] = write_table_pages(iter_table_pages(session, source), path)
+        latencies[name] = time.perf_counter() - table_start
+
+    start_time = time.perf_counter()
+    copy_time = 0.0
+    if concurrency > 1 and len(tables) > 1:
+        suffix = uuid.uuid4().hex[:12]
+        libref = f'{caslib}.' if caslib else ''
+        sources = {}
+        versions = {}
+        local = threading.local()
+        sessions = []
+
+        def run(name, path):
+            if not hasattr(local, 'session'):
+                local.session = conn.copy()
+                sessions.append(local.session)
+            export(local.session, name, sources[name], path)
+
+        try:
+            conn.loadactionset('datastep')
+            for name in tables:
+                versions[name] = table_version(conn, name)
+                if caslib and conn.table.tableexists(caslib=caslib, name=name)['exists'] == 2:
+                    sources[name] = name
+                    continue
+                sources[name] = f'{name}_export_{suffix}'
+                conn.datastep.runcode(code=f'data {libref}{sources[name]}(promote=yes); set {name}; run;')
+            copy_time = time.perf_counter() - start_time
+
+            with ThreadPoolExecutor(max_workers=min(concurrency, len(tables))) as pool:
+                for future in [pool.submit(run, name, path) for name, path in tables.items()]:
+                    future.result()
+        finally:
+            cache = _fetched_tables.setdefault(conn.sessionid, {})
+            for session in sessions:
+                fetched = _fetched_tables.pop(session.sessionid, {})
+                for name, source in sources.items():
+                    if _cache_key(source) in fetched:
+                        cache[_cache_key(name)] = (versions[name], fetched[_cache_key(source)][1])
+                session.close()
+            for name, source in sources.items():
+                if source != name:
+                    drop_table(conn, source, caslib)
+    else:
+        for name, path in tables.items():
+            export(conn, name, name, path)
+
+    elapsed = max(time.perf_counter() - start_time, 1e-9)
+    for name in tables:
+        print(f"  {name:<28} {rows[name]:>10,} rows {latencies[name]:8.2f}s")
+    slowest = max(tables, key=latencies.get)
+    print(f"  {len(tables)} tables in {elapsed:.2f}s ({copy_time:.2f}s copying session tables, "
+          f"{elapsed - copy_time:.2f}s fetching); slowest {slowest} {latencies[slowest]:.2f}s")
+    return rows
+
+
+def replace_table(conn, name, target, caslib=CAS_TABLE_CASLIB):
+    """Swap session table name in for the promoted table target."""
+    drop_table(conn, target, caslib)
+    conn.table.promote(name=name, target=target, targetlib=caslib)
+
+
+def drop_table(conn, name, caslib=CAS_TABLE_CASLIB):
+    """Drop a table from the shared caslib (or the session when caching is disabled), if present."""
+    if caslib:
+        conn.table.droptable(caslib=caslib, name=name, quiet=True)
+    else:
+        conn.table.droptable(name=name, quiet=True)
+
+
+def stream_csv_table(conn, path, name, chunksize, start=0, stop=None):
+    """
+    Upload a CSV into session table name in chunks of chunksize rows.
+
+    The first chunk creates the table and each later chunk is staged and appended with a
+    data step, so client memory holds one chunk at a time. Numeric columns are sent as
+    doubles so every chunk matches the table's column types. With start, only the rows in
+    bytes [start, stop) are read, e.g. the rows appended since a file_watermark.
+    """
+    staging = f'{name}_chunk'
+    total_rows = 0
+    total_bytes = 0
+    start_time = time.perf_counter()
+
+    with open(path, 'rb') as f:
+        if start:
+            columns = f.readline().decode().strip().split(',')
+            stop = f.seek(0, os.SEEK_END) if stop is None else stop
+            f.seek(start)
+            rows = sum(block.count(b'\n') for block in iter(lambda: f.read(min(HASH_BLOCK_SIZE, stop - f.tell())), b''))
+            f.seek(start)
+            chunks = pd.read_csv(f, names=columns, header=None, nrows=rows, chunksize=chunksize or None)
+        else:
+            chunks = pd.read_csv(f, chunksize=chunksize or None)
+        if isinstance(chunks, pd.DataFrame):
+            chunks = [chunks]
+
+        chunk_start = start_time
+        for number, chunk in enumerate(chunks, 1):
+            numeric = chunk.select_dtypes(include='number').columns
+            chunk[numeric] = chunk[numeric].astype('float64')
+
+            if number == 1:
+                conn.upload_frame(chunk, casout={'name': name, 'replace': True})
+            else:
+                conn.upload_frame(chunk, casout={'name': staging, 'replace': True})
+                conn.datastep.runcode(code=f'data {name}(append=yes); set {staging}; run;')
+
+            # The parser reads ahead, so byte counts per chunk are approximate
+            chunk_bytes = f.tell() - start - total_bytes
+            total_rows += len(chunk)
+            total_bytes += chunk_bytes
+            now = time.perf_counter()
+            elapsed = max(now - chunk_start, 1e-9)
+            print(f"  chunk {number}: {len(chunk):,} rows, {chunk_bytes / 1e6:.1f} MB "
+                  f"({len(chunk) / elapsed:,.0f} rows/s, {chunk_bytes / 1e6 / elapsed:.1f} MB/s)")
+            chunk_start = now
+
+    conn.table.droptable(name=staging, quiet=True)
+    elapsed = max(time.perf_counter() - start_time, 1e-9)
+    print(f"  {total_rows:,} rows, {total_bytes / 1e6:.1f} MB in {elapsed:.1f}s "
+          f"({total_rows / elapsed:,.0f} rows/s, {total_bytes / 1e6 / elapsed:.1f} MB/s)")
+
+
+def _upload_file(conn, path, casout):
+    if path.endswith('.parquet'):
+        conn.upload_frame(read_table(path), casout=casout)
+    else:
+        conn.read_csv(path, casout=casout)
+
+
+def load_csv_table(conn, path, name, caslib=CAS_TABLE_CASLIB, chunksize=None):
+    """
+    Load a CSV or Parquet file into CAS unless a promoted table of identical contents is already there.
+
+    Tables are promoted into caslib and labelled with the file's SHA-256; a matching label
+    makes the load a metadata check. Without a caslib the file is always uploaded. With a
+    chunksize the file is streamed in chunks instead of parsed whole on the client.
+    """
+    if path.endswith('.parquet'):
+        # Parquet is decoded client-side with its dtypes and uploaded whole
+        chunksize = None
+
+    if not caslib:
+        if chunksize:
+            stream_csv_table(conn, path, name, chunksize)
+        else:
+            _upload_file(conn, path, {'name': name, 'replace': True})
+        return
+
+    label = f'sha256:{file_fingerprint(path)}'
+    existing = table_label(conn, name, caslib)
+    if existing == label:
+        print(f"✓ {name} unchanged, reusing loaded table")
+        return
+
+    if existing is not None:
+        conn.table.droptable(caslib=caslib, name=name, quiet=True)
+    if chunksize:
+        stream_csv_table(conn, path, name, chunksize)
+        conn.table.altertable(name=name, label=label)
+        conn.table.promote(name=name, targetlib=caslib)
+    else:
+        _upload_file(conn, path, {'name': name, 'caslib': caslib, 'promote': True, 'label': label})
+    print(f"✓ Uploaded {name}")
+
+
+def publish_table(conn, name, source_path, caslib=CAS_TABLE_CASLIB):
+    """
+    Promote a table built in this session and label it with the hash of the file it was exported to.
+
+    A later load_csv_table of that file then reuses the table instead of uploading it again.
+    """
+    if not caslib:
+        return
+
+    conn.table.altertable(name=name, label=f'sha256:{file_fingerprint(source_path)}')
+    conn.table.promote(name=name, targetlib=caslib)
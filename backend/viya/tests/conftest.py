@@ -0,0 +1,96 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from backend.viya import core_campaign_metrics, table_loader
+from backend.viya.config import SEGMENTS_OUTPUT_FILE, CAMPAIGNS_FILE, RESULTS_FILE
+
+# Campaign ids run past CAMP_999, where string order stops matching send order
+CAMPAIGN_IDS = [f'CAMP_{number:03d}' for number in range(990, 1014)]
+SEGMENT_COUNT = 12
+
+
+def make_segments(count=SEGMENT_COUNT, seed=0):
+    rng = np.random.default_rng(seed)
+    values = rng.dirichlet(np.ones(4), count)
+    channels = rng.dirichlet(np.ones(3), count)
+    return pd.DataFrame({
+        'segment_id': np.arange(1, count + 1),
+        'language': np.where(np.arange(count) % 2, 'fi', 'en'),
+        'parent_age': rng.integers(22, 45, count),
+        'parent_gender': np.where(np.arange(count) % 3, 'F', 'M'),
+        'baby_count': rng.integers(1, 4, count),
+        'price_sensitivity': rng.random(count),
+        'brand_loyalty': rng.random(count),
+        'engagement_propensity': rng.random(count),
+        'channel_perf_email': channels[:, 0],
+        'channel_perf_push': channels[:, 1],
+        'channel_perf_inapp': channels[:, 2],
+        'values_family': values[:, 0],
+        'values_eco_conscious': values[:, 1],
+        'values_convenience': values[:, 2],
+        'values_quality': values[:, 3],
+    })
+
+
+def make_campaigns(campaign_ids=CAMPAIGN_IDS):
+    number = np.arange(len(campaign_ids))
+    return pd.DataFrame({
+        'campaign_id': campaign_ids,
+        'campaign_type': np.array(['discount', 'premium', 'educational'])[number % 3],
+        'channel': np.array(['email', 'push', 'inapp'])[number // 2 % 3],
+        'message_sentiment': np.array(['urgent', 'friendly', 'informative'])[number // 3 % 3],
+        'value_theme': np.array(['family', 'eco_conscious', 'convenience', 'quality'])[number % 4],
+    })
+
+
+def make_results(campaigns, segments, seed=0):
+    """One result per campaign x segment, in send order."""
+    rng = np.random.default_rng(seed)
+    results = pd.DataFrame({
+        'campaign_id': np.repeat(campaigns['campaign_id'].to_numpy(), len(segments)),
+        'segment_id': np.tile(segments['segment_id'].to_numpy(), len(campaigns)),
+    })
+    results['impressions'] = rng.integers(800, 1200, len(results))
+    results['clicks'] = rng.binomial(results['impressions'], 0.08)
+    results['conversions'] = rng.binomial(results['clicks'], 0.25)
+    return results
+
+
+def make_campaign_metrics(campaigns, segments, seed=0):
+    """A campaign_metrics table as exported by the core phase."""
+    rng = np.random.default_rng(seed)
+    metrics = make_results(campaigns, segments, seed)
+    metrics['engagement_rate'] = metrics['clicks'] / metrics['impressions']
+    metrics['conversion_rate'] = metrics['conversions'] / metrics['impressions']
+    metrics['baseline_engagement'] = 0.08
+    metrics['baseline_conversion'] = 0.02
+    metrics['sales_vs_benchmark'] = np.where(rng.random(len(metrics)) < 0.1, np.nan,
+                                             metrics['conversion_rate'] / 0.02)
+    return metrics
+
+
+@pytest.fixture
+def core_inputs(tmp_path, monkeypatch):
+    """
+    Segments, campaigns and results files for ViyaCampaignAnalytics under tmp_path.
+
+    Returns the campaign results in send order; tests write as many of them to
+    core_inputs.results_path as the scenario needs.
+    """
+    output_dir = tmp_path / 'output'
+    generated_dir = tmp_path / 'generated'
+    output_dir.mkdir()
+    generated_dir.mkdir()
+    monkeypatch.setattr(core_campaign_metrics, 'DATA_DIR_OUTPUT', str(output_dir))
+    monkeypatch.setattr(core_campaign_metrics, 'DATA_DIR_GENERATED', str(generated_dir))
+    monkeypatch.setattr(table_loader.file_fingerprint, '__defaults__', (str(tmp_path / 'fingerprints.json'),))
+
+    segments = make_segments()
+    campaigns = make_campaigns()
+    segments.to_csv(output_dir / SEGMENTS_OUTPUT_FILE, index=False)
+    campaigns.to_csv(generated_dir / CAMPAIGNS_FILE, index=False)
+
+    results = make_results(campaigns, segments)
+    results.attrs['path'] = str(generated_dir / RESULTS_FILE)
+    return results
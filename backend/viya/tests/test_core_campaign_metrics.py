@@ -0,0 +1,96 @@
+import pandas as pd
+import pytest
+
+from backend.viya import core_campaign_metrics
+from backend.viya.config import CAS_TABLE_CASLIB
+from backend.viya.core_campaign_metrics import ViyaCampaignAnalytics
+from backend.viya.rolling_window import SegmentRollingWindow, PATTERN_COLUMNS
+from backend.viya.sqlite_cas import SQLiteCASConnection
+from backend.viya.table_loader import fetch_table, clear_table_cache
+
+from conftest import SEGMENT_COUNT
+
+WINDOW_CAMPAIGNS = 6
+
+# Table: columns identifying a row
+COMPARED_TABLES = {
+    'campaign_results': ['campaign_id', 'segment_id'],
+    'benchmarks': ['language', 'campaign_type'],
+    'campaign_segment_metrics': ['campaign_id', 'segment_id'],
+    'segment_patterns': ['segment_id'],
+    'segments_learned': ['segment_id'],
+}
+
+pytestmark = pytest.mark.skipif(not CAS_TABLE_CASLIB, reason="incremental metrics need CAS_TABLE_CASLIB")
+
+
+@pytest.fixture(autouse=True)
+def short_window(monkeypatch):
+    # Shorter than each segment's history, so runs evict from the window
+    monkeypatch.setattr(core_campaign_metrics, 'ROLLING_WINDOW_CAMPAIGNS', WINDOW_CAMPAIGNS)
+
+
+def run_core(database, incremental):
+    conn = SQLiteCASConnection(database)
+    analytics = ViyaCampaignAnalytics(conn=conn)
+    analytics.load_data()
+    analytics.calculate_metrics(incremental=incremental)
+    analytics.build_campaign_metrics()
+    analytics.derive_segment_attributes()
+
+    tables = {}
+    for name, keys in COMPARED_TABLES.items():
+        table = fetch_table(conn, name)
+        tables[name] = table.sort_values(keys).reset_index(drop=True)[sorted(table.columns)]
+    clear_table_cache(conn)
+    conn.close()
+    return tables
+
+
+def write_results(results, rows, mode='w'):
+    results.iloc[rows].to_csv(results.attrs['path'], mode=mode, header=mode == 'w', index=False)
+
+
+def assert_tables_equal(actual, expected):
+    for name in COMPARED_TABLES:
+        pd.testing.assert_frame_equal(actual[name], expected[name], check_dtype=False, rtol=1e-9, obj=name)
+
+
+def test_incremental_runs_match_full_rebuild(core_inputs, tmp_path, capsys):
+    database = str(tmp_path / 'incremental.db')
+    batches = [slice(0, 8 * SEGMENT_COUNT), slice(8 * SEGMENT_COUNT, 9 * SEGMENT_COUNT),
+               slice(9 * SEGMENT_COUNT, None)]
+    for number, rows in enumerate(batches):
+        write_results(core_inputs, rows, 'w' if number == 0 else 'a')
+        incremental = run_core(database, incremental=True)
+    assert capsys.readouterr().out.count("Adding appended results to saved segment windows") == 2
+
+    unchanged = run_core(database, incremental=True)
+    assert "Segment windows are current" in capsys.readouterr().out
+
+    full = run_core(str(tmp_path / 'full.db'), incremental=False)
+    assert_tables_equal(incremental, full)
+    assert_tables_equal(unchanged, full)
+
+
+def test_rewritten_results_rebuild_in_full(core_inputs, tmp_path):
+    database = str(tmp_path / 'incremental.db')
+    write_results(core_inputs, slice(None))
+    run_core(database, incremental=True)
+
+    # Reordered rows are no longer an append to the watermarked file
+    write_results(core_inputs.iloc[::-1], slice(None))
+    incremental = run_core(database, incremental=True)
+
+    full = run_core(str(tmp_path / 'full.db'), incremental=False)
+    assert_tables_equal(incremental, full)
+
+
+def test_window_matches_local_ring_buffer(core_inputs, tmp_path):
+    write_results(core_inputs, slice(None))
+    tables = run_core(str(tmp_path / 'full.db'), incremental=False)
+
+    window = SegmentRollingWindow(WINDOW_CAMPAIGNS)
+    window.extend(tables['campaign_results'])
+    pd.testing.assert_frame_equal(tables['segment_patterns'][PATTERN_COLUMNS], window.patterns(),
+                                  check_dtype=False, rtol=1e-9)
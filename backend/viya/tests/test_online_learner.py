@@ -0,0 +1,104 @@
+import os
+import signal
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from backend.viya import online_learner
+from backend.viya.online_learner import OnlineSegmentLearner, follow_csv, request_snapshots_on
+from backend.viya.table_io import read_table
+
+from conftest import make_campaigns, make_segments, make_results
+
+HALF_LIFE = 5
+
+
+def learner_inputs():
+    campaigns = make_campaigns()
+    segments = make_segments()
+    # Interleave segments; include rows the learner must skip and a result without impressions
+    results = make_results(campaigns, segments).sample(frac=1, random_state=0).reset_index(drop=True)
+    results.loc[[3, 17], 'campaign_id'] = 'CAMP_UNKNOWN'
+    results.loc[5, 'segment_id'] = 999
+    results.loc[8, ['impressions', 'clicks', 'conversions']] = 0
+    return segments, campaigns, results
+
+
+def assert_learners_equal(actual, expected):
+    for state in ['sums', 'weights', 'maxes']:
+        for name, values in getattr(expected, state).items():
+            np.testing.assert_allclose(getattr(actual, state)[name], values, rtol=1e-12, err_msg=f'{state} {name}')
+    np.testing.assert_array_equal(actual.result_count, expected.result_count)
+    assert actual.skipped == expected.skipped
+
+
+@pytest.mark.parametrize('splits', [[], [50, 51, 200]])
+def test_batch_update_matches_row_by_row(splits):
+    segments, campaigns, results = learner_inputs()
+    batched = OnlineSegmentLearner(segments, campaigns, HALF_LIFE)
+    for start, stop in zip([0] + splits, splits + [len(results)]):
+        batched.update(results.iloc[start:stop])
+
+    row_by_row = OnlineSegmentLearner(segments, campaigns, HALF_LIFE)
+    for position in range(len(results)):
+        row_by_row.update(results.iloc[position:position + 1])
+
+    assert_learners_equal(batched, row_by_row)
+    assert batched.skipped == 3
+    pd.testing.assert_frame_equal(batched.patterns(), row_by_row.patterns(), rtol=1e-12)
+
+
+def test_follow_csv_picks_up_appended_rows(tmp_path):
+    path = tmp_path / 'campaign_results.csv'
+    path.write_text('campaign_id,segment_id\nCAMP_001,1\n')
+    rows = follow_csv(str(path), poll_interval=0)
+
+    assert next(rows).to_dict('records') == [{'campaign_id': 'CAMP_001', 'segment_id': 1}]
+    assert next(rows).empty
+
+    with open(path, 'a') as f:
+        f.write('CAMP_002,2\nCAMP_003,')
+    assert next(rows).to_dict('records') == [{'campaign_id': 'CAMP_002', 'segment_id': 2}]
+    # The row still being written waits for its newline
+    assert next(rows).empty
+
+    with open(path, 'a') as f:
+        f.write('3\n')
+    assert next(rows).to_dict('records') == [{'campaign_id': 'CAMP_003', 'segment_id': 3}]
+
+
+@pytest.fixture
+def restore_sigusr1():
+    handler = signal.getsignal(signal.SIGUSR1)
+    yield
+    signal.signal(signal.SIGUSR1, handler)
+
+
+def test_sigusr1_snapshot_writes_through_export(restore_sigusr1, tmp_path, monkeypatch):
+    segments, campaigns, results = learner_inputs()
+    learner = OnlineSegmentLearner(segments, campaigns, HALF_LIFE)
+    path = str(tmp_path / 'user_segments_enriched.csv')
+
+    exported = []
+    export = online_learner.export_learned_segments
+
+    def record_export(learned, path):
+        exported.append(learner.result_count.sum())
+        return export(learned, path)
+
+    monkeypatch.setattr(online_learner, 'export_learned_segments', record_export)
+
+    def batches():
+        yield results.iloc[:100]
+        os.kill(os.getpid(), signal.SIGUSR1)
+        yield results.iloc[100:200]
+        yield results.iloc[200:]
+
+    learner.run(batches(), snapshot_every=3600, path=path, snapshot_requested=request_snapshots_on())
+
+    # One snapshot on the signal, after the batch it arrived during, and one when batches end
+    assert exported == [200 - 3, len(results) - 3]
+    written = read_table(path)
+    assert written['segment_id'].tolist() == segments['segment_id'].tolist()
+    assert written['engagement_propensity'].between(0.2, 0.9).all()
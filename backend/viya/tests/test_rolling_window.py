@@ -0,0 +1,158 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from backend.viya import local_engine
+from backend.viya.local_engine import LocalCampaignAnalytics, window_state_file
+from backend.viya.rolling_window import (
+    SegmentRollingWindow, PATTERN_MEANS, PATTERN_MAXES, PATTERN_COLUMNS, WINDOW_COLUMNS, campaign_sequence
+)
+
+from conftest import CAMPAIGN_IDS, SEGMENT_COUNT, make_campaigns, make_segments, make_results
+
+CAPACITY = 7
+
+
+def window_results(seed=0):
+    campaigns = make_campaigns()
+    results = make_results(campaigns, make_segments(5), seed).merge(campaigns, on='campaign_id')
+    results['engagement_rate'] = results['clicks'] / results['impressions']
+    results['conversion_rate'] = results['conversions'] / results['impressions']
+    # A missing rate is skipped by the averages, like AVG over NULL
+    results.loc[3, 'conversion_rate'] = np.nan
+    results['send_sequence'] = campaign_sequence(results['campaign_id'])
+    return results
+
+
+def brute_force_patterns(results, capacity):
+    """segment_patterns over each segment's newest capacity results, recomputed from scratch."""
+    recent = results.sort_values('send_sequence', ascending=False).groupby('segment_id').head(capacity)
+    rows = []
+    for segment_id, group in recent.groupby('segment_id'):
+        row = {'segment_id': segment_id, 'campaign_count': len(group)}
+        for name, value_column, filter_column, filter_value in PATTERN_MEANS:
+            selected = group if filter_column is None else group[group[filter_column] == filter_value]
+            row[name] = selected[value_column].mean()
+        for name, channel in PATTERN_MAXES:
+            row[name] = np.where(group['channel'] == channel, group['engagement_rate'], 0.0).max()
+        rows.append(row)
+    return pd.DataFrame(rows)[PATTERN_COLUMNS]
+
+
+def assert_patterns_equal(actual, expected):
+    pd.testing.assert_frame_equal(actual.reset_index(drop=True), expected.reset_index(drop=True),
+                                  check_dtype=False, rtol=1e-12)
+
+
+def test_campaign_sequence_orders_ids_past_999():
+    assert campaign_sequence(['CAMP_999', 'CAMP_1000', 'CAMP_001']).tolist() == [999, 1000, 1]
+
+
+@pytest.mark.parametrize('splits', [[], [40], [13, 70, 71, 200]])
+def test_extend_matches_brute_force_window(splits):
+    results = window_results()
+    window = SegmentRollingWindow(CAPACITY)
+    for start, stop in zip([0] + splits, splits + [len(results)]):
+        window.extend(results.iloc[start:stop])
+
+    assert window.last_sequence == 1013
+    assert_patterns_equal(window.patterns(), brute_force_patterns(results, CAPACITY))
+
+
+def test_extend_skips_campaigns_already_in_window():
+    results = window_results()
+    window = SegmentRollingWindow(CAPACITY)
+    window.extend(results.iloc[:120])
+    window.extend(results)
+    assert_patterns_equal(window.patterns(), brute_force_patterns(results, CAPACITY))
+
+
+def test_add_matches_brute_force_window():
+    results = window_results()
+    window = SegmentRollingWindow(CAPACITY)
+    for row in results.to_dict('records'):
+        window.add(row['segment_id'], row['send_sequence'], **{name: row[name] for name in WINDOW_COLUMNS})
+    assert_patterns_equal(window.patterns(), brute_force_patterns(results, CAPACITY))
+
+
+def test_save_and_load_continue_the_window(tmp_path):
+    results = window_results()
+    path = tmp_path / 'windows.npz'
+    window = SegmentRollingWindow(CAPACITY)
+    window.extend(results[results['campaign_id'].isin(CAMPAIGN_IDS[:12])])
+    window.save(path)
+
+    window = SegmentRollingWindow.load(path)
+    window.extend(results)
+    assert_patterns_equal(window.patterns(), brute_force_patterns(results, CAPACITY))
+
+
+@pytest.fixture
+def local_inputs(core_inputs, tmp_path, monkeypatch):
+    monkeypatch.setattr(local_engine, 'DATA_DIR_OUTPUT', str(tmp_path / 'output'))
+    monkeypatch.setattr(local_engine, 'DATA_DIR_GENERATED', str(tmp_path / 'generated'))
+    monkeypatch.setattr(local_engine, 'ROLLING_WINDOW_CAMPAIGNS', CAPACITY)
+    monkeypatch.setattr(local_engine, 'ROLLING_WINDOW_STATE_FILE', str(tmp_path / 'cache' / 'windows.npz'))
+    return core_inputs
+
+
+def local_patterns(incremental):
+    analytics = LocalCampaignAnalytics()
+    analytics.load_data()
+    analytics.calculate_metrics(incremental=incremental)
+    analytics.build_campaign_metrics()
+    analytics.derive_segment_attributes()
+    return analytics.fetch_table('segment_patterns')
+
+
+def write_local_results(results, mode='w'):
+    results.to_csv(results.attrs['path'], mode=mode, header=mode == 'w', index=False)
+
+
+def test_local_incremental_windows_match_full_rebuild(local_inputs, capsys):
+    for number, rows in enumerate([slice(0, 8 * SEGMENT_COUNT), slice(8 * SEGMENT_COUNT, 9 * SEGMENT_COUNT),
+                                   slice(9 * SEGMENT_COUNT, None)]):
+        write_local_results(local_inputs.iloc[rows], 'w' if number == 0 else 'a')
+        incremental = local_patterns(incremental=True)
+    assert capsys.readouterr().out.count("to saved segment windows") == 2
+    assert local_patterns(incremental=True).equals(incremental)
+    assert "Segment windows are current" in capsys.readouterr().out
+
+    assert_patterns_equal(incremental, local_patterns(incremental=False))
+
+
+def test_local_windows_rebuild_for_rewritten_results(local_inputs, capsys):
+    write_local_results(local_inputs)
+    local_patterns(incremental=True)
+
+    # Different results for the same campaigns, e.g. another market's file written in place
+    changed = local_inputs.copy()
+    changed['conversions'] = changed['conversions'] // 2
+    write_local_results(changed)
+    incremental = local_patterns(incremental=True)
+    assert "was rewritten since the segment windows were saved" in capsys.readouterr().out
+
+    assert_patterns_equal(incremental, local_patterns(incremental=False))
+
+
+def test_local_windows_rebuild_for_late_results(local_inputs, capsys):
+    late = local_inputs['campaign_id'] == CAMPAIGN_IDS[-3]
+    write_local_results(local_inputs[~late])
+    local_patterns(incremental=True)
+
+    # Results of a campaign inside the windows arrive after newer campaigns
+    write_local_results(local_inputs[late], 'a')
+    incremental = local_patterns(incremental=True)
+    assert "include campaigns already in the segment windows" in capsys.readouterr().out
+
+    assert_patterns_equal(incremental, local_patterns(incremental=False))
+
+
+def test_window_state_file_is_kept_per_results_file(local_inputs, tmp_path):
+    write_local_results(local_inputs)
+    local_patterns(incremental=True)
+    assert os.path.exists(window_state_file(local_inputs.attrs['path']))
+    assert window_state_file(str(tmp_path / 'other' / 'campaign_results.csv')) != \
+        window_state_file(local_inputs.attrs['path'])
@@ -0,0 +1,103 @@
+import pandas as pd
+import pytest
+
+from backend.viya.cross_campaign_analysis import CrossCampaignAnalytics
+from backend.viya.pattern_detection import AdvancedCampaignAnalytics
+from backend.viya.rollup_cube import AttributeCube
+from backend.viya.sqlite_cas import SQLiteCASConnection
+from backend.viya.table_loader import fetch_table, clear_table_cache
+
+from conftest import make_campaigns, make_segments, make_campaign_metrics
+
+# The fact-table queries the cube-backed analyses replaced: (output, SQL, columns identifying a row)
+FACT_TABLE_QUERIES = [
+    ('attribute_effectiveness', '''
+        SELECT
+            c.campaign_type,
+            c.channel,
+            c.message_sentiment,
+            c.value_theme,
+            COUNT(*) AS segment_count,
+            AVG(m.conversion_rate) AS avg_conversion,
+            AVG(m.engagement_rate) AS avg_engagement,
+            AVG(m.sales_vs_benchmark) AS avg_vs_benchmark,
+            STDDEV(m.conversion_rate) AS conversion_std,
+            STDDEV(m.conversion_rate) / SQRT(COUNT(*)) AS std_error
+        FROM campaign_metrics m
+        JOIN campaigns c ON m.campaign_id = c.campaign_id
+        GROUP BY c.campaign_type, c.channel, c.message_sentiment, c.value_theme
+    ''', ['campaign_type', 'channel', 'message_sentiment', 'value_theme']),
+    ('interaction_effects', '''
+        SELECT
+            c.campaign_type,
+            c.channel,
+            COUNT(*) AS sample_size,
+            AVG(m.conversion_rate) AS actual_conversion,
+            AVG(m.engagement_rate) AS actual_engagement,
+            tb.type_avg_conversion,
+            cb.channel_avg_conversion,
+            (tb.type_avg_conversion + cb.channel_avg_conversion) / 2 AS expected_conversion,
+            AVG(m.conversion_rate) - ((tb.type_avg_conversion + cb.channel_avg_conversion) / 2) AS interaction_lift,
+            (AVG(m.conversion_rate) - ((tb.type_avg_conversion + cb.channel_avg_conversion) / 2)) /
+                NULLIF(((tb.type_avg_conversion + cb.channel_avg_conversion) / 2), 0) * 100 AS interaction_lift_pct
+        FROM campaign_metrics m
+        JOIN campaigns c ON m.campaign_id = c.campaign_id
+        JOIN (
+            SELECT c.campaign_type, AVG(m.conversion_rate) AS type_avg_conversion
+            FROM campaign_metrics m
+            JOIN campaigns c ON m.campaign_id = c.campaign_id
+            GROUP BY c.campaign_type
+        ) tb ON c.campaign_type = tb.campaign_type
+        JOIN (
+            SELECT c.channel, AVG(m.conversion_rate) AS channel_avg_conversion
+            FROM campaign_metrics m
+            JOIN campaigns c ON m.campaign_id = c.campaign_id
+            GROUP BY c.channel
+        ) cb ON c.channel = cb.channel
+        GROUP BY c.campaign_type, c.channel, tb.type_avg_conversion, cb.channel_avg_conversion
+    ''', ['campaign_type', 'channel']),
+    ('campaign_type_affinity', '''
+        SELECT
+            m.segment_id,
+            AVG(CASE WHEN c.campaign_type = 'educational' THEN m.conversion_rate END) AS edu_conversion,
+            AVG(CASE WHEN c.campaign_type = 'educational' THEN m.engagement_rate END) AS edu_engagement,
+            AVG(CASE WHEN c.campaign_type = 'premium' THEN m.conversion_rate END) AS premium_conversion,
+            AVG(CASE WHEN c.campaign_type = 'discount' THEN m.conversion_rate END) AS discount_conversion,
+            CASE
+                WHEN AVG(CASE WHEN c.campaign_type = 'educational' THEN m.engagement_rate END) > 0.10
+                 AND AVG(CASE WHEN c.campaign_type = 'premium' THEN m.conversion_rate END) > 0.025
+                THEN 'edu_premium_affinity'
+                WHEN AVG(CASE WHEN c.campaign_type = 'discount' THEN m.conversion_rate END) >
+                     AVG(CASE WHEN c.campaign_type = 'premium' THEN m.conversion_rate END) * 1.3
+                THEN 'discount_preference'
+                ELSE 'balanced'
+            END AS response_pattern
+        FROM campaign_metrics m
+        JOIN campaigns c ON m.campaign_id = c.campaign_id
+        GROUP BY m.segment_id
+    ''', ['segment_id']),
+]
+
+
+@pytest.fixture(scope='module')
+def conn():
+    conn = SQLiteCASConnection()
+    campaigns = make_campaigns()
+    conn.upload_frame(make_campaign_metrics(campaigns, make_segments()), casout={'name': 'campaign_metrics'})
+    conn.upload_frame(campaigns, casout={'name': 'campaigns'})
+
+    AttributeCube(conn).build_attribute_cube()
+    patterns = AdvancedCampaignAnalytics(conn=conn)
+    patterns.analyze_attribute_effectiveness()
+    patterns.analyze_interaction_effects()
+    CrossCampaignAnalytics(conn=conn).analyze_campaign_type_affinity()
+    yield conn
+    clear_table_cache(conn)
+    conn.close()
+
+
+@pytest.mark.parametrize('output, query, keys', FACT_TABLE_QUERIES, ids=[query[0] for query in FACT_TABLE_QUERIES])
+def test_cube_backed_analysis_matches_fact_table_query(conn, output, query, keys):
+    expected = conn.execute(query).sort_values(keys).reset_index(drop=True)
+    actual = fetch_table(conn, output).sort_values(keys).reset_index(drop=True)
+    pd.testing.assert_frame_equal(actual[expected.columns], expected, check_dtype=False, rtol=1e-9)
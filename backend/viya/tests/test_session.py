@@ -0,0 +1,98 @@
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+import pytest
+
+from backend.viya import session
+from backend.viya.config import TOKEN_REFRESH_MARGIN
+from backend.viya.session import get_token
+from backend.viya.stub_token_server import start_stub_token_server
+
+CLIENT_ID = 'client'
+CLIENT_SECRET = 'secret'
+CALLERS = 4
+
+
+class Clock:
+    """Stand-in for the time module whose time() the test moves forward."""
+
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def start_server():
+    servers = []
+
+    def start(**kwargs):
+        server = start_stub_token_server(client_id=CLIENT_ID, client_secret=CLIENT_SECRET, **kwargs)
+        servers.append(server)
+        return server, f'http://127.0.0.1:{server.server_port}'
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(session, 'time', clock)
+    return clock
+
+
+def test_cached_token_is_reused_until_refresh_margin(start_server, clock, tmp_path):
+    server, remote = start_server(expires_in=TOKEN_REFRESH_MARGIN + 10)
+    cache_file = str(tmp_path / 'tokens.json')
+
+    assert get_token(remote, CLIENT_ID, CLIENT_SECRET, cache_file) == 'stub-token-1'
+    clock.now += 9
+    assert get_token(remote, CLIENT_ID, CLIENT_SECRET, cache_file) == 'stub-token-1'
+    assert server.request_count == 1
+
+
+def test_token_is_refreshed_after_expiry(start_server, clock, tmp_path):
+    server, remote = start_server(expires_in=TOKEN_REFRESH_MARGIN + 10)
+    cache_file = str(tmp_path / 'tokens.json')
+
+    assert get_token(remote, CLIENT_ID, CLIENT_SECRET, cache_file) == 'stub-token-1'
+    clock.now += 10
+    assert get_token(remote, CLIENT_ID, CLIENT_SECRET, cache_file) == 'stub-token-2'
+    clock.now += TOKEN_REFRESH_MARGIN + 10
+    assert get_token(remote, CLIENT_ID, CLIENT_SECRET, cache_file) == 'stub-token-3'
+    assert server.request_count == 3
+
+
+def test_rejected_credentials_raise(start_server, tmp_path):
+    _, remote = start_server()
+    with pytest.raises(ConnectionError):
+        get_token(remote, CLIENT_ID, 'wrong', str(tmp_path / 'tokens.json'))
+
+
+def test_concurrent_threads_share_one_token_request(start_server, tmp_path):
+    # The delay keeps the first request in flight while the other callers reach the lock
+    server, remote = start_server(delay=0.3)
+    fetch = partial(get_token, remote, CLIENT_ID, CLIENT_SECRET, str(tmp_path / 'tokens.json'))
+
+    with ThreadPoolExecutor(max_workers=CALLERS) as pool:
+        tokens = [future.result() for future in [pool.submit(fetch) for _ in range(CALLERS)]]
+
+    assert tokens == ['stub-token-1'] * CALLERS
+    assert server.request_count == 1
+
+
+def test_concurrent_processes_share_one_token_request(start_server, tmp_path):
+    server, remote = start_server(delay=0.3)
+    fetch = partial(get_token, remote, CLIENT_ID, CLIENT_SECRET, str(tmp_path / 'tokens.json'))
+
+    # Forked callers reach the server running in this process
+    with multiprocessing.get_context('fork').Pool(CALLERS) as pool:
+        tokens = pool.starmap(fetch, [()] * CALLERS)
+
+    assert tokens == ['stub-token-1'] * CALLERS
+    assert server.request_count == 1
@@ -0,0 +1,102 @@
+import pandas as pd
+import pytest
+
+from backend.viya.pattern_detection import AdvancedCampaignAnalytics
+from backend.viya.rollup_cube import AttributeCube
+from backend.viya.scheduler import run_analyses
+from backend.viya.sqlite_cas import SQLiteCASConnection, GLOBAL_SCHEMA
+from backend.viya.table_io import read_table
+from backend.viya.table_loader import export_tables, fetch_table, clear_table_cache
+
+from conftest import make_campaigns, make_segments, make_campaign_metrics
+
+CASLIB = 'CASUSER'
+
+
+@pytest.fixture
+def conn():
+    conn = SQLiteCASConnection()
+    yield conn
+    clear_table_cache(conn)
+    conn.close()
+
+
+def exists(conn, name):
+    return conn.table.tableexists(caslib=CASLIB, name=name)['exists']
+
+
+def global_tables(conn):
+    return set(conn.execute(f"SELECT name FROM {GLOBAL_SCHEMA}.sqlite_master WHERE type = 'table'")['name'])
+
+
+def test_session_tables_are_shared_once_promoted(conn):
+    conn.upload_frame(pd.DataFrame({'a': [1, 2]}), casout={'name': 't', 'label': 'v1'})
+    other = conn.copy()
+    try:
+        assert exists(conn, 't') == 1
+        assert exists(other, 't') == 0
+
+        conn.table.promote(name='t', targetlib=CASLIB)
+        assert exists(conn, 't') == 2
+        assert exists(other, 't') == 2
+        assert other.table_meta('t') == {'label': 'v1', 'promoted': 1}
+        assert other.execute('SELECT a FROM t')['a'].tolist() == [1, 2]
+    finally:
+        other.close()
+
+
+def test_session_table_hides_and_drops_before_global(conn):
+    conn.upload_frame(pd.DataFrame({'a': [1]}), casout={'name': 't', 'promote': True})
+    conn.upload_frame(pd.DataFrame({'a': [2]}), casout={'name': 't'})
+    assert conn.execute('SELECT a FROM t')['a'].tolist() == [2]
+
+    conn.table.droptable(caslib=CASLIB, name='t')
+    assert conn.execute('SELECT a FROM t')['a'].tolist() == [1]
+    conn.table.droptable(caslib=CASLIB, name='t')
+    assert exists(conn, 't') == 0
+    conn.table.droptable(caslib=CASLIB, name='t', quiet=True)
+
+
+def upload_inputs(conn):
+    campaigns = make_campaigns()
+    conn.upload_frame(make_campaign_metrics(campaigns, make_segments()),
+                      casout={'name': 'campaign_metrics', 'promote': True})
+    conn.upload_frame(campaigns, casout={'name': 'campaigns', 'promote': True})
+
+
+def test_concurrent_analyses_promote_their_outputs(conn):
+    upload_inputs(conn)
+    analytics = AdvancedCampaignAnalytics(conn=conn)
+    run_analyses([AttributeCube(conn), analytics], concurrency=2, caslib=CASLIB)
+
+    outputs = ['attribute_cube', 'segment_consistency', 'attribute_effectiveness', 'interaction_effects']
+    assert [exists(conn, name) for name in outputs] == [2] * len(outputs)
+
+    sequential = SQLiteCASConnection()
+    try:
+        upload_inputs(sequential)
+        run_analyses([AttributeCube(sequential), AdvancedCampaignAnalytics(conn=sequential)], concurrency=1,
+                     caslib=CASLIB)
+        for name in outputs:
+            pd.testing.assert_frame_equal(fetch_table(conn, name), fetch_table(sequential, name), obj=name)
+    finally:
+        clear_table_cache(sequential)
+        sequential.close()
+
+
+@pytest.mark.parametrize('extension', ['csv', 'parquet'])
+def test_export_copies_session_tables_and_fetches_promoted_ones(conn, tmp_path, extension):
+    promoted = pd.DataFrame({'segment_id': [1.0, 2.0], 'rate': [0.5, 0.25]})
+    session = pd.DataFrame({'campaign_id': ['CAMP_999', 'CAMP_1000'], 'rate': [0.1, 0.2]})
+    conn.upload_frame(promoted, casout={'name': 'promoted', 'promote': True})
+    conn.upload_frame(session, casout={'name': 'session'})
+    paths = {name: str(tmp_path / f'{name}.{extension}') for name in ('promoted', 'session')}
+
+    rows = export_tables(conn, paths, concurrency=2, caslib=CASLIB)
+
+    assert rows == {'promoted': 2, 'session': 2}
+    pd.testing.assert_frame_equal(read_table(paths['promoted']), promoted)
+    pd.testing.assert_frame_equal(read_table(paths['session']), session, check_dtype=False)
+    # The promoted export copies are gone and the session table stayed private
+    assert global_tables(conn) == {'_cas_tables', 'promoted'}
+    assert exists(conn, 'session') == 1
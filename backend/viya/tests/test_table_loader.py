@@ -0,0 +1,36 @@
+import pandas as pd
+import pytest
+
+from backend.viya.sqlite_cas import SQLiteCASConnection
+from backend.viya.table_loader import fetch_table, clear_table_cache
+
+
+@pytest.fixture
+def conn():
+    conn = SQLiteCASConnection()
+    conn.upload_frame(pd.DataFrame({'a': [1, 2, 3], 'b': [4, 5, 6]}), casout={'name': 't'})
+    yield conn
+    clear_table_cache(conn)
+    conn.close()
+
+
+def test_projected_fetch_is_not_served_for_full_fetch(conn):
+    assert list(fetch_table(conn, 't', ['a']).columns) == ['a']
+    full = fetch_table(conn, 't')
+    assert list(full.columns) == ['a', 'b']
+    assert full['b'].tolist() == [4, 5, 6]
+
+
+def test_full_fetch_serves_projections_from_cache(conn):
+    fetch_table(conn, 't')
+    fetches = len(conn.timings)
+    assert fetch_table(conn, 't', ['B'])['b'].tolist() == [4, 5, 6]
+    assert len(conn.timings) == fetches
+
+
+def test_append_invalidates_cached_projections(conn):
+    fetch_table(conn, 't', ['a'])
+    fetch_table(conn, 't')
+    conn.execute('INSERT INTO t VALUES (7, 8)')
+    assert fetch_table(conn, 't', ['a'])['a'].tolist() == [1, 2, 3, 7]
+    assert fetch_table(conn, 't')['b'].tolist() == [4, 5, 6, 8]
@@ -1,10 +1,28 @@
+"""
+Generate synthetic campaigns and simulated campaign results.
+
+Creates random campaign definitions and simulates impressions, clicks and
+conversions for every campaign x segment pair based on segment attributes.
+"""
+import argparse
+import os
+import sys
+import time
+
 import pandas as pd
 import numpy as np
 
-np.random.seed(42)
+# Scripts run from the repository root as python scripts/<name>.py; table I/O is shared with the analytics
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from backend.viya.table_io import output_path, read_table, write_table_pages  # noqa: E402
+
+RANDOM_SEED = 42
+SEGMENTS_FILE = output_path('data/output/user_segments_enriched.csv')
+CAMPAIGNS_FILE = 'data/generated/campaigns.csv'
+RESULTS_FILE = 'data/generated/campaign_results.csv'
 
-segments = pd.read_csv('data/output/user_segments_enriched.csv')
-print(f"Loaded {len(segments)} segments")
+DEFAULT_CAMPAIGN_COUNT = 50
+BLOCK_ROWS = 1_000_000
 
 campaign_types = ['discount', 'premium', 'educational']
 channels = ['email', 'push', 'inapp']
@@ -12,110 +30,220 @@ message_sentiments = ['urgent', 'friendly', 'informative']
 value_themes = ['family', 'eco_conscious', 'convenience', 'quality']
 offer_types = ['percentage_discount', 'bundle', 'premium', 'none']
 
-campaigns = []
-campaign_id = 1
-
-for i in range(50):
-    campaign_type = np.random.choice(campaign_types)
-
-    if campaign_type == 'discount':
-        offer_type = 'percentage_discount'
-        discount = np.random.choice([10, 15, 20, 25, 30, 40])
-        sentiment = np.random.choice(['urgent', 'friendly'])
-    elif campaign_type == 'premium':
-        offer_type = np.random.choice(['bundle', 'premium'])
-        discount = 0
-        sentiment = 'informative'
-    else:
-        offer_type = 'none'
-        discount = 0
-        sentiment = 'friendly'
-
-    campaigns.append({
-        'campaign_id': f'CAMP_{campaign_id:03d}',
-        'campaign_type': campaign_type,
-        'channel': np.random.choice(channels),
-        'message_sentiment': sentiment,
-        'value_theme': np.random.choice(value_themes),
-        'offer_type': offer_type,
-        'discount_percentage': discount if discount > 0 else None
-    })
-    campaign_id += 1
-
-campaigns_df = pd.DataFrame(campaigns)
-campaigns_df.to_csv('data/generated/campaigns.csv', index=False)
-print(f"\nCreated {len(campaigns_df)} campaigns")
-
-results = []
-
-for _, campaign in campaigns_df.iterrows():
-    for _, segment in segments.iterrows():
-
-        base_impressions = np.random.randint(8000, 12000)
-
-        base_click_rate = 0.08
-        base_conversion_rate = 0.02
-
-        click_multiplier = 1.0
-        conversion_multiplier = 1.0
-
-        if campaign['channel'] == 'email' and segment['channel_perf_email'] > 0.6:
-            click_multiplier *= 1.3
-        elif campaign['channel'] == 'push' and segment['channel_perf_push'] > 0.6:
-            click_multiplier *= 1.3
-        elif campaign['channel'] == 'inapp' and segment['channel_perf_inapp'] > 0.6:
-            click_multiplier *= 1.3
-
-        if campaign['campaign_type'] == 'discount' and segment['price_sensitivity'] > 0.6:
-            conversion_multiplier *= 1.4
-        elif campaign['campaign_type'] == 'premium' and segment['brand_loyalty'] > 0.6:
-            conversion_multiplier *= 1.3
-
-        value_cols = {
-            'family': segment['values_family'],
-            'eco_conscious': segment['values_eco_conscious'],
-            'convenience': segment['values_convenience'],
-            'quality': segment['values_quality']
-        }
-        if campaign['value_theme'] in value_cols:
-            if value_cols[campaign['value_theme']] > 0.4:
-                conversion_multiplier *= 1.25
-
-        if segment['engagement_propensity'] > 0.5:
-            click_multiplier *= 1.2
-
-        actual_click_rate = np.clip(
-            base_click_rate * click_multiplier * np.random.uniform(0.85, 1.15),
-            0.01, 0.4
-        )
-        actual_conversion_rate = np.clip(
-            base_conversion_rate * conversion_multiplier * np.random.uniform(0.8, 1.2),
-            0.001, 0.15
-        )
-
-        clicks = int(base_impressions * actual_click_rate)
-        conversions = int(clicks * (actual_conversion_rate / actual_click_rate))
-
-        results.append({
-            'campaign_id': campaign['campaign_id'],
-            'segment_id': segment['segment_id'],
-            'impressions': base_impressions,
-            'clicks': clicks,
-            'conversions': conversions
+CHANNEL_PERF_COLUMNS = ['channel_perf_email', 'channel_perf_push', 'channel_perf_inapp']
+VALUE_COLUMNS = ['values_family', 'values_eco_conscious', 'values_convenience', 'values_quality']
+
+IMPRESSIONS_MIN = 8000
+IMPRESSIONS_MAX = 12000
+BASE_CLICK_RATE = 0.08
+BASE_CONVERSION_RATE = 0.02
+
+
+def generate_campaigns(count):
+    """Create random campaign definitions."""
+    campaigns = []
+    campaign_id = 1
+
+    for i in range(count):
+        campaign_type = np.random.choice(campaign_types)
+
+        if campaign_type == 'discount':
+            offer_type = 'percentage_discount'
+            discount = np.random.choice([10, 15, 20, 25, 30, 40])
+            sentiment = np.random.choice(['urgent', 'friendly'])
+        elif campaign_type == 'premium':
+            offer_type = np.random.choice(['bundle', 'premium'])
+            discount = 0
+            sentiment = 'informative'
+        else:
+            offer_type = 'none'
+            discount = 0
+            sentiment = 'friendly'
+
+        campaigns.append({
+            'campaign_id': f'CAMP_{campaign_id:03d}',
+            'campaign_type': campaign_type,
+            'channel': np.random.choice(channels),
+            'message_sentiment': sentiment,
+            'value_theme': np.random.choice(value_themes),
+            'offer_type': offer_type,
+            'discount_percentage': discount if discount > 0 else None
         })
+        campaign_id += 1
+
+    return pd.DataFrame(campaigns)
+
+
+def simulate_results(campaigns_df, segments):
+    """
+    Simulate results for a block of campaigns against all segments.
+
+    Broadcasts the per-pair multiplier rules over a (campaigns x segments) grid and
+    returns rows in campaign-major order, matching the original nested loop.
+    """
+    n_campaigns, n_segments = len(campaigns_df), len(segments)
+    shape = (n_campaigns, n_segments)
+
+    channel_idx = campaigns_df['channel'].map(channels.index).to_numpy()
+    theme_idx = campaigns_df['value_theme'].map(value_themes.index).to_numpy()
+    campaign_type = campaigns_df['campaign_type'].to_numpy()[:, None]
+
+    channel_perf = segments[CHANNEL_PERF_COLUMNS].to_numpy().T[channel_idx]
+    theme_value = segments[VALUE_COLUMNS].to_numpy().T[theme_idx]
+    price_sensitivity = segments['price_sensitivity'].to_numpy()[None, :]
+    brand_loyalty = segments['brand_loyalty'].to_numpy()[None, :]
+    engagement = segments['engagement_propensity'].to_numpy()[None, :]
+
+    base_impressions = np.random.randint(IMPRESSIONS_MIN, IMPRESSIONS_MAX, shape)
+
+    click_multiplier = np.where(channel_perf > 0.6, 1.3, 1.0)
+    click_multiplier = click_multiplier * np.where(engagement > 0.5, 1.2, 1.0)
+
+    conversion_multiplier = np.select(
+        [(campaign_type == 'discount') & (price_sensitivity > 0.6),
+         (campaign_type == 'premium') & (brand_loyalty > 0.6)],
+        [1.4, 1.3],
+        1.0
+    )
+    conversion_multiplier = conversion_multiplier * np.where(theme_value > 0.4, 1.25, 1.0)
+
+    actual_click_rate = np.clip(
+        BASE_CLICK_RATE * click_multiplier * np.random.uniform(0.85, 1.15, shape),
+        0.01, 0.4
+    )
+    actual_conversion_rate = np.clip(
+        BASE_CONVERSION_RATE * conversion_multiplier * np.random.uniform(0.8, 1.2, shape),
+        0.001, 0.15
+    )
+
+    clicks = (base_impressions * actual_click_rate).astype(np.int64)
+    conversions = (clicks * (actual_conversion_rate / actual_click_rate)).astype(np.int64)
+
+    return pd.DataFrame({
+        'campaign_id': np.repeat(campaigns_df['campaign_id'].to_numpy(), n_segments),
+        'segment_id': np.tile(segments['segment_id'].to_numpy(), n_campaigns),
+        'impressions': base_impressions.ravel(),
+        'clicks': clicks.ravel(),
+        'conversions': conversions.ravel()
+    })
 
-results_df = pd.DataFrame(results)
-results_df.to_csv('data/generated/campaign_results.csv', index=False)
-print(f"Created {len(results_df)} campaign results")
-
-print("\nCampaign type distribution:")
-print(campaigns_df['campaign_type'].value_counts())
 
-print("\nSample campaigns:")
-print(campaigns_df.head())
+def iter_result_blocks(campaigns_df, segments, block_rows):
+    """
+    Yield simulated results in blocks of at most block_rows rows.
 
-print("\nSample results:")
-print(results_df.head(10))
+    Several campaigns share a block when all segments fit; otherwise each campaign
+    is split into segment slices. Either way rows stay in campaign-major order.
+    """
+    n_segments = len(segments)
+    if n_segments == 0:
+        return
 
-print("\nResults statistics:")
-print(results_df[['impressions', 'clicks', 'conversions']].describe())
+    if n_segments <= block_rows:
+        campaigns_per_block = block_rows // n_segments
+        for start in range(0, len(campaigns_df), campaigns_per_block):
+            yield simulate_results(campaigns_df.iloc[start:start + campaigns_per_block], segments)
+    else:
+        for i in range(len(campaigns_df)):
+            for start in range(0, n_segments, block_rows):
+                yield simulate_results(campaigns_df.iloc[i:i + 1], segments.iloc[start:start + block_rows])
+
+
+def write_results(blocks, filepath):
+    """
+    Append result blocks to a CSV, or Parquet for a .parquet path, as they are produced.
+
+    Only one block is held in memory at a time. Returns the first rows written
+    and running statistics for the summary.
+    """
+    sample = None
+    stats = None
+    total_rows = 0
+    start_time = time.perf_counter()
+
+    def tracked(blocks):
+        nonlocal sample, stats, total_rows
+        for block_number, block in enumerate(blocks, 1):
+            yield block
+
+            numeric = block[['impressions', 'clicks', 'conversions']]
+            block_stats = pd.DataFrame({'count': numeric.count(), 'sum': numeric.sum(),
+                                        'min': numeric.min(), 'max': numeric.max()})
+            if stats is None:
+                sample = block.head(10)
+                stats = block_stats
+            else:
+                stats = pd.DataFrame({'count': stats['count'] + block_stats['count'],
+                                      'sum': stats['sum'] + block_stats['sum'],
+                                      'min': np.minimum(stats['min'], block_stats['min']),
+                                      'max': np.maximum(stats['max'], block_stats['max'])})
+
+            total_rows += len(block)
+            elapsed = time.perf_counter() - start_time
+            print(f"  block {block_number}: {total_rows:,} rows written, {total_rows / elapsed:,.0f} rows/sec")
+
+    write_table_pages(tracked(blocks), filepath)
+
+    if stats is not None:
+        stats['mean'] = stats['sum'] / stats['count']
+        stats = stats[['count', 'mean', 'min', 'max']]
+
+    elapsed = time.perf_counter() - start_time
+    return total_rows, elapsed, sample, stats
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Generate synthetic campaigns and campaign results")
+    parser.add_argument('--campaigns', type=int, default=DEFAULT_CAMPAIGN_COUNT,
+                        help="Number of campaigns to generate")
+    parser.add_argument('--segments', type=int, default=None,
+                        help="Number of segments to simulate (default: all segments in the input file)")
+    parser.add_argument('--block-rows', type=int, default=BLOCK_ROWS,
+                        help="Maximum result rows simulated and held in memory at once")
+    parser.add_argument('--format', choices=['csv', 'parquet'], default='csv',
+                        help="Output format for campaign results (parquet requires pyarrow)")
+    parser.add_argument('--output', default=None,
+                        help=f"Results output path (default: {RESULTS_FILE}, or .parquet for --format parquet)")
+    return parser.parse_args()
+
+
+def main():
+    """Main execution flow."""
+    args = parse_args()
+    np.random.seed(RANDOM_SEED)
+
+    segments = read_table(SEGMENTS_FILE)
+    if args.segments is not None:
+        if args.segments > len(segments):
+            raise SystemExit(f"Requested {args.segments} segments but {SEGMENTS_FILE} has only {len(segments)}")
+        segments = segments.head(args.segments)
+    print(f"Loaded {len(segments)} segments")
+
+    campaigns_df = generate_campaigns(args.campaigns)
+    campaigns_df.to_csv(CAMPAIGNS_FILE, index=False)
+    print(f"\nCreated {len(campaigns_df)} campaigns")
+
+    results_path = args.output or output_path(RESULTS_FILE, args.format)
+
+    print(f"\nSimulating results into {results_path}...")
+    blocks = iter_result_blocks(campaigns_df, segments, args.block_rows)
+    total_rows, elapsed, sample, stats = write_results(blocks, results_path)
+    rate = total_rows / elapsed if elapsed > 0 else 0
+    print(f"Created {total_rows} campaign results in {elapsed:.1f}s ({rate:,.0f} rows/sec)")
+
+    print("\nCampaign type distribution:")
+    print(campaigns_df['campaign_type'].value_counts())
+
+    print("\nSample campaigns:")
+    print(campaigns_df.head())
+
+    if sample is not None:
+        print("\nSample results:")
+        print(sample)
+
+        print("\nResults statistics:")
+        print(stats)
+
+
+if __name__ == "__main__":
+    main()
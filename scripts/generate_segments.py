@@ -3,13 +3,31 @@ Generate enriched user segments from base segment data.
 
 Creates mock demographic and behavioral attributes for each segment
 based on their event history and characteristics.
+
+By default the whole frame is enriched in one process from the global NumPy seed.
+With --chunk-size, --workers or --segments the frame is split into chunks that are
+enriched in a process pool, each with its own generator spawned from a
+SeedSequence, so the output depends only on the seed and chunk size.
 """
+import argparse
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
 import pandas as pd
 import numpy as np
 
+from event_log import read_event_log, event_features
+
+# Scripts run from the repository root as python scripts/<name>.py; table I/O is shared with the analytics
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from backend.viya.table_io import output_path, write_table  # noqa: E402
+
 RANDOM_SEED = 42
 INPUT_FILE = 'data/input/user_segments.csv'
-OUTPUT_FILE = 'data/output/user_segments_enriched.csv'
+# CSV, or Parquet with the analytics OUTPUT_FORMAT setting
+OUTPUT_FILE = output_path('data/output/user_segments_enriched.csv')
+DEFAULT_CHUNK_SIZE = 50_000
 
 COLUMNS_TO_DROP = ['events_array', 'registration', 'sourceId',
                    'parent_allergies', 'MPN', 'baby_dob_1']
@@ -56,48 +74,78 @@ def clean_segments(df):
     return df
 
 
-def add_demographics(df):
+def add_event_features(df, filepath):
+    """Join recency, frequency and per-event-type counts decoded from events_array."""
+    features = event_features(read_event_log(filepath))
+    print(f"Added {len(features.columns) - 1} event features")
+    return df.merge(features, on='segment_id', how='left')
+
+
+def synthesize_segments(df, count, seed_sequence):
+    """
+    Grow cleaned base segments to count rows by resampling existing rows.
+
+    Synthetic rows get new segment ids following the largest existing one.
+    """
+    extra = count - len(df)
+    if extra <= 0:
+        return df
+
+    rng = np.random.default_rng(seed_sequence)
+    synthetic = df.iloc[rng.integers(0, len(df), extra)].reset_index(drop=True)
+    synthetic['segment_id'] = np.arange(df['segment_id'].max() + 1, df['segment_id'].max() + 1 + extra)
+    print(f"Synthesized {extra} segments from {len(df)} base segments")
+    return pd.concat([df, synthetic], ignore_index=True)
+
+
+def add_demographics(df, rng=np.random):
     """Add demographic attributes."""
-    df['parent_age'] = np.random.randint(AGE_MIN, AGE_MAX, len(df))
-    df['parent_gender'] = np.random.choice(['M', 'F'], len(df), p=GENDER_PROBABILITIES)
-    df['baby_count'] = np.random.choice([1, 2, 3], len(df), p=BABY_COUNT_PROBABILITIES)
+    df['parent_age'] = rng.randint(AGE_MIN, AGE_MAX, len(df))
+    df['parent_gender'] = rng.choice(['M', 'F'], len(df), p=GENDER_PROBABILITIES)
+    df['baby_count'] = rng.choice([1, 2, 3], len(df), p=BABY_COUNT_PROBABILITIES)
     return df
 
 
-def add_behavioral_attributes(df):
-    """Add behavioral propensity scores."""
-    event_normalized = df['event_count'] / df['event_count'].max()
+def add_behavioral_attributes(df, rng=np.random, event_max=None):
+    """
+    Add behavioral propensity scores.
+
+    event_max normalizes event counts; pass the full-frame maximum when enriching a chunk.
+    """
+    if event_max is None:
+        event_max = df['event_count'].max()
+    event_normalized = df['event_count'] / event_max
     df['engagement_propensity'] = np.clip(
-        event_normalized * ENGAGEMENT_WEIGHT + np.random.normal(0, ENGAGEMENT_NOISE_STD, len(df)),
+        event_normalized * ENGAGEMENT_WEIGHT + rng.normal(0, ENGAGEMENT_NOISE_STD, len(df)),
         CLIP_MIN, CLIP_MAX
     )
 
     baby_age_normalized = np.abs(df['baby_age_week_1']) / WEEKS_PER_YEAR
     df['price_sensitivity'] = np.clip(
-        PRICE_BASE + np.random.normal(0, PRICE_NOISE_STD, len(df)) - (baby_age_normalized * BABY_AGE_IMPACT),
+        PRICE_BASE + rng.normal(0, PRICE_NOISE_STD, len(df)) - (baby_age_normalized * BABY_AGE_IMPACT),
         VALUE_MIN, CLIP_MAX
     )
 
     df['brand_loyalty'] = np.clip(
-        df['engagement_propensity'] * LOYALTY_WEIGHT + np.random.normal(0, LOYALTY_NOISE_STD, len(df)),
+        df['engagement_propensity'] * LOYALTY_WEIGHT + rng.normal(0, LOYALTY_NOISE_STD, len(df)),
         CLIP_MIN, CLIP_MAX
     )
 
     return df
 
 
-def add_channel_preferences(df):
+def add_channel_preferences(df, rng=np.random):
     """Add channel performance scores."""
-    channel_scores = np.random.dirichlet(alpha=CHANNEL_ALPHA, size=len(df))
+    channel_scores = rng.dirichlet(alpha=CHANNEL_ALPHA, size=len(df))
     df['channel_perf_email'] = np.clip(channel_scores[:, 0] * CHANNEL_SCALE, VALUE_MIN, CLIP_MAX)
     df['channel_perf_push'] = np.clip(channel_scores[:, 1] * CHANNEL_SCALE, VALUE_MIN, CLIP_MAX)
     df['channel_perf_inapp'] = np.clip(channel_scores[:, 2] * CHANNEL_SCALE, VALUE_MIN, CLIP_MAX)
     return df
 
 
-def add_value_preferences(df):
+def add_value_preferences(df, rng=np.random):
     """Add value theme preferences."""
-    value_profiles = np.random.dirichlet(alpha=VALUE_ALPHA, size=len(df))
+    value_profiles = rng.dirichlet(alpha=VALUE_ALPHA, size=len(df))
     df['values_family'] = value_profiles[:, 0]
     df['values_eco_conscious'] = value_profiles[:, 1]
     df['values_convenience'] = value_profiles[:, 2]
@@ -105,24 +153,65 @@ def add_value_preferences(df):
     return df
 
 
-def add_engagement_metrics(df):
+def add_engagement_metrics(df, rng=np.random):
     """Add engagement-related metrics."""
     df['contact_frequency_tolerance'] = np.clip(
-        df['engagement_propensity'] * CONTACT_FREQ_WEIGHT + np.random.normal(0, CONTACT_FREQ_NOISE_STD, len(df)),
+        df['engagement_propensity'] * CONTACT_FREQ_WEIGHT + rng.normal(0, CONTACT_FREQ_NOISE_STD, len(df)),
         CLIP_MIN, CLIP_MAX
     )
 
     df['content_engagement_rate'] = np.clip(
-        df['engagement_propensity'] * CONTENT_ENG_WEIGHT + np.random.normal(0, CONTENT_ENG_NOISE_STD, len(df)),
+        df['engagement_propensity'] * CONTENT_ENG_WEIGHT + rng.normal(0, CONTENT_ENG_NOISE_STD, len(df)),
         CLIP_MIN, CLIP_MAX
     )
 
     return df
 
 
+def enrich_segments(df, rng=np.random, event_max=None):
+    """Apply every enrichment step in order."""
+    df = add_demographics(df, rng)
+    df = add_behavioral_attributes(df, rng, event_max)
+    df = add_channel_preferences(df, rng)
+    df = add_value_preferences(df, rng)
+    df = add_engagement_metrics(df, rng)
+    return df
+
+
+def _enrich_chunk(task):
+    """Process pool entry point: enrich one chunk with its own seeded generator."""
+    chunk, seed_sequence, event_max = task
+    rng = np.random.RandomState(np.random.MT19937(seed_sequence))
+    return enrich_segments(chunk.copy(), rng, event_max)
+
+
+def enrich_segments_parallel(df, seed_sequence, chunk_size, workers):
+    """
+    Enrich fixed-size chunks in a process pool and concatenate them in order.
+
+    Each chunk draws from a generator spawned from seed_sequence by chunk index, so
+    the result depends only on the seed and chunk size, never on the worker count.
+    """
+    event_max = df['event_count'].max()
+    starts = range(0, len(df), chunk_size)
+    tasks = [
+        (df.iloc[start:start + chunk_size], child, event_max)
+        for start, child in zip(starts, seed_sequence.spawn(len(starts)))
+    ]
+    print(f"Enriching {len(df)} segments in {len(tasks)} chunks of {chunk_size} with {workers} workers")
+
+    if workers <= 1:
+        chunks = [_enrich_chunk(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            chunks = list(executor.map(_enrich_chunk, tasks))
+
+    return pd.concat(chunks, ignore_index=True)
+
+
 def save_segments(df, filepath):
-    """Save enriched segments to CSV."""
-    df.to_csv(filepath, index=False)
+    """Save enriched segments to CSV, or Parquet for a .parquet path."""
+    write_table(df, filepath)
     print(f"\nEnrichment complete!")
     print(f"Saved to {filepath}")
 
@@ -147,17 +236,36 @@ def print_summary(df):
     print(df[key_metrics].describe())
 
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="Generate enriched user segments")
+    parser.add_argument('--segments', type=int, default=None,
+                        help="Synthesize base segments up to this count when the input has fewer")
+    parser.add_argument('--chunk-size', type=int, default=None,
+                        help=f"Segments per seeded chunk (default when chunking: {DEFAULT_CHUNK_SIZE})")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="Processes used to enrich chunks; does not affect the output")
+    parser.add_argument('--event-features', action='store_true',
+                        help="Add recency, frequency and per-event-type counts decoded from events_array")
+    return parser.parse_args()
+
+
 def main():
     """Main execution flow."""
-    np.random.seed(RANDOM_SEED)
+    args = parse_args()
 
     df = load_segments(INPUT_FILE)
     df = clean_segments(df)
-    df = add_demographics(df)
-    df = add_behavioral_attributes(df)
-    df = add_channel_preferences(df)
-    df = add_value_preferences(df)
-    df = add_engagement_metrics(df)
+    if args.event_features:
+        df = add_event_features(df, INPUT_FILE)
+
+    if args.segments is None and args.chunk_size is None and args.workers <= 1:
+        np.random.seed(RANDOM_SEED)
+        df = enrich_segments(df)
+    else:
+        synthesis_seed, chunk_seed = np.random.SeedSequence(RANDOM_SEED).spawn(2)
+        if args.segments is not None:
+            df = synthesize_segments(df, args.segments, synthesis_seed)
+        df = enrich_segments_parallel(df, chunk_seed, args.chunk_size or DEFAULT_CHUNK_SIZE, args.workers)
 
     save_segments(df, OUTPUT_FILE)
     print_summary(df)